@@ -4,9 +4,13 @@ Add tasks to the asycnio loop.
 import asyncio
 import logging
 
-from ws_client import ws_listen
-from ws_client import ws_minder
+from metrics.http_server import start_metrics_server
+from .bounded_queue import BoundedQueue
+from .consensus import ConsensusTracker
+from .missed_validations import MissedValidationMonitor
+from ws_client.ws_minder import ConnectionSupervisor
 from .process_data import DataProcessor
+from .workers import WorkerPool
 from .ws_server import WsServer
 
 async def spawn_workers(settings):
@@ -15,37 +19,30 @@ async def spawn_workers(settings):
 
     :param settings: Configuration file
     '''
-    ws_servers = []
-
     # Create queues for websocket messages
-    queue_receive = asyncio.Queue(maxsize=0)
-    queue_send = asyncio.Queue(maxsize=0)
+    queue_receive = BoundedQueue(settings.QUEUE_MAX_SIZE, settings.QUEUE_OVERFLOW_POLICY, 'receive')
+    queue_send = BoundedQueue(settings.QUEUE_MAX_SIZE, settings.QUEUE_OVERFLOW_POLICY, 'send')
     logging.info("Adding initial asyncio tasks to the loop.")
-    for url in settings.URLS:
-        ws_servers.append(
-            {
-                #'task': asyncio.create_task(
-                'task': asyncio.ensure_future(
-                    ws_listen.websocket_subscribe(
-                        url, settings.WS_SUBSCRIPTION_COMMAND, queue_receive
-                    )
-                ),
-                'url': url,
-                'retry_count': 0,
-            }
+    if settings.AGGREGATOR_WORKERS > 0:
+        # Worker processes own the websocket connections
+        WorkerPool(queue_receive, settings).start()
+    else:
+        # Reconnects dropped websocket connections to the remote servers
+        ConnectionSupervisor(settings.URLS, queue_receive, settings, settings.RAW_FRAMES).start()
+    consensus = ConsensusTracker(settings.CONSENSUS_WINDOW) if settings.CONSENSUS_WINDOW else None
+    if consensus and settings.MISSED_VALIDATIONS:
+        MissedValidationMonitor(
+            consensus, queue_send, settings.MISSED_VALIDATION_GRACE, settings.MISSED_VALIDATION_KEYS
         )
     #asyncio.create_task(
     asyncio.ensure_future(
-        DataProcessor(queue_receive, queue_send, settings).process_data()
+        DataProcessor(queue_receive, queue_send, settings, consensus).process_data()
     )
     #asyncio.create_task(
     asyncio.ensure_future(
         WsServer().start_outgoing_server(queue_send, settings)
     )
-    #asyncio.create_task(
-    asyncio.ensure_future(
-        ws_minder.mind_tasks(ws_servers, queue_receive, settings)
-    )
+    await start_metrics_server(settings)
     logging.info("Initial asyncio task list is running.")
 
 def start_loop(settings):
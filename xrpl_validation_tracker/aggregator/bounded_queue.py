@@ -0,0 +1,109 @@
+'''
+Bounded queue for passing messages between pipeline stages. When the queue is full, its
+overflow policy either blocks the producer, so backpressure reaches the websocket
+connections, or drops messages, so a stalled consumer can't exhaust memory.
+'''
+import asyncio
+
+from metrics.registry import REGISTRY
+from ws_client.frame_scan import RawMessage
+
+QUEUE_OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_by_type')
+
+# Messages with a lower priority are dropped first by the 'drop_by_type' policy.
+TYPE_PRIORITY = {'ledgerClosed': 2, 'validationsMissed': 2, 'manifestReceived': 2, 'validationReceived': 1}
+
+def message_type(message):
+    '''
+    :param message: Decoded message or RawMessage
+    :returns: The message's type, or None
+    :rtype: str
+    '''
+    if isinstance(message, RawMessage):
+        return message.type
+    return message.get('type') if isinstance(message, dict) else None
+
+class BoundedQueue(asyncio.Queue):
+    '''
+    asyncio.Queue with an overflow policy.
+
+    :param int maxsize: Maximum number of messages in the queue (0 is unbounded)
+    :param str policy: What to do when the queue is full - see QUEUE_OVERFLOW_POLICIES
+    :param str name: Name used in the dropped message metrics
+    '''
+    def __init__(self, maxsize=0, policy='block', name='queue'):
+        super().__init__(maxsize=maxsize)
+        self.policy = policy
+        self.name = name
+        self.dropped = {}
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        # Number of queued messages of each priority, so 'drop_by_type' only scans
+        # the queue for a type that is present.
+        self.priority_counts = [0] * (max(TYPE_PRIORITY.values()) + 1)
+
+    def _put(self, item):
+        super()._put(item)
+        self.priority_counts[TYPE_PRIORITY.get(message_type(item), 0)] += 1
+
+    def _get(self):
+        item = super()._get()
+        self.priority_counts[TYPE_PRIORITY.get(message_type(item), 0)] -= 1
+        return item
+
+    def count_drop(self, message):
+        '''
+        :param message: The dropped message
+        '''
+        kind = message_type(message) or 'other'
+        counter = self.dropped.get(kind)
+        if counter is None:
+            counter = self.dropped[kind] = REGISTRY.counter(
+                'xrpl_queue_dropped_total', "Messages dropped from full queues, by queue and message type.",
+                queue=self.name, type=kind
+            )
+        counter.inc()
+
+    def drop_lowest_priority(self, item):
+        '''
+        Remove the oldest queued message with the lowest priority, unless the new message's
+        priority is lower still.
+
+        :param item: Message being added
+        :returns: True if the new message should be added
+        :rtype: bool
+        '''
+        priority = TYPE_PRIORITY.get(message_type(item), 0)
+        lowest = next(i for i, count in enumerate(self.priority_counts) if count)
+        if priority < lowest:
+            self.count_drop(item)
+            return False
+        for index, queued in enumerate(self._queue):
+            if TYPE_PRIORITY.get(message_type(queued), 0) == lowest:
+                del self._queue[index]
+                self.priority_counts[lowest] -= 1
+                self.count_drop(queued)
+                return True
+        return True
+
+    def put_nowait(self, item):
+        '''
+        Add a message. If the queue is full, drop a message according to the policy,
+        or raise asyncio.QueueFull if the policy is 'block'.
+        '''
+        if self.full() and self.policy != 'block':
+            if self.policy == 'drop_oldest':
+                self.count_drop(self.get_nowait())
+            elif not self.drop_lowest_priority(item):
+                return
+        super().put_nowait(item)
+
+    async def put(self, item):
+        '''
+        Add a message, waiting for space if the policy is 'block'.
+        '''
+        if self.policy == 'block':
+            await super().put(item)
+        else:
+            self.put_nowait(item)
@@ -0,0 +1,336 @@
+'''
+Track which validators validated which ledgers, for a rolling window of recent ledger
+sequences, from the aggregator's deduplicated stream.
+
+Each validator is assigned a bit, and each ledger hash keeps an integer bitmap of the
+validators that validated it. Counts and agreement totals are updated as validations
+arrive, so queries never scan the window or touch the database. Bits of validators that
+haven't validated a ledger in the window are reused, so the tracker doesn't grow with
+every key it has seen.
+'''
+import heapq
+import logging
+
+from metrics.registry import REGISTRY
+from ws_client.frame_scan import RawMessage, scan_ledger, scan_validator_key
+
+FORK_COUNT = REGISTRY.counter('xrpl_consensus_forks_total', "Ledger sequences validated with more than one hash.")
+
+def as_bytes(ledger_hash):
+    '''
+    :param ledger_hash: Hash as bytes or hex
+    :rtype: bytes
+    '''
+    return ledger_hash if isinstance(ledger_hash, bytes) else bytes.fromhex(ledger_hash)
+
+class LedgerVotes:
+    '''
+    Validations for one ledger sequence.
+    '''
+    __slots__ = ('bitmaps', 'counts', 'validators', 'canonical', 'closed')
+
+    def __init__(self):
+        self.bitmaps = {} # Validators that validated each hash
+        self.counts = {} # Number of validators that validated each hash
+        self.validators = 0 # Bitmap of validators that validated any hash
+        self.canonical = None # Hash reported by ledgerClosed, else the hash with the most validations
+        self.closed = False # Whether canonical came from a ledgerClosed message
+
+class ConsensusTracker:
+    '''
+    Rolling window of validations for recent ledger sequences.
+
+    :param int window: Number of recent ledger sequences to keep
+    '''
+    def __init__(self, window):
+        self.window = window
+        self.ledgers = {}
+        self.validator_bits = {}
+        self.validator_keys = []
+        # Number of ledgers in the window where each validator validated the canonical hash.
+        self.agreements = []
+        # Newest ledger sequence each validator validated.
+        self.last_validated = []
+        # Bits no longer assigned to a validator, and bits that are never reused.
+        self.free_bits = []
+        self.pinned = set()
+        self.canonical_count = 0
+        self.forks = set()
+        self.newest = None
+        # Called with the sequence and hash of each ledger when its ledgerClosed message arrives.
+        self.ledger_listeners = []
+        REGISTRY.gauge('xrpl_consensus_ledgers', "Ledger sequences in the consensus window.", lambda: len(self.ledgers))
+        REGISTRY.gauge('xrpl_consensus_validators', "Validators seen by the consensus tracker.", lambda: len(self.validator_bits))
+
+    def validator_bit(self, key):
+        '''
+        :param str key: Master key (or ephemeral key, if the master key is unknown)
+        :returns: Bit index assigned to the validator
+        :rtype: int
+        '''
+        bit = self.validator_bits.get(key)
+        if bit is not None:
+            return bit
+        if self.free_bits:
+            # Reuse the lowest free bit, to keep bitmaps small.
+            bit = heapq.heappop(self.free_bits)
+            self.validator_keys[bit] = key
+            self.last_validated[bit] = 0
+        else:
+            bit = len(self.validator_keys)
+            self.validator_keys.append(key)
+            self.agreements.append(0)
+            self.last_validated.append(0)
+        self.validator_bits[key] = bit
+        return bit
+
+    def pin(self, key):
+        '''
+        Assign a validator a bit that is kept even when the validator is inactive.
+
+        :param str key: Master key
+        :returns: Bit index assigned to the validator
+        :rtype: int
+        '''
+        bit = self.validator_bit(key)
+        self.pinned.add(bit)
+        return bit
+
+    def keys(self, bitmap):
+        '''
+        :param int bitmap: Validator bitmap
+        :returns: Keys of the validators in the bitmap
+        :rtype: list
+        '''
+        keys = []
+        bit = 0
+        while bitmap:
+            if bitmap & 1:
+                keys.append(self.validator_keys[bit])
+            bitmap >>= 1
+            bit += 1
+        return keys
+
+    def credit(self, bitmap, amount):
+        '''
+        Add amount to the agreement count of each validator in a bitmap.
+
+        :param int bitmap: Validator bitmap
+        :param int amount: 1 or -1
+        '''
+        bit = 0
+        while bitmap:
+            if bitmap & 1:
+                self.agreements[bit] += amount
+            bitmap >>= 1
+            bit += 1
+
+    def set_canonical(self, votes, ledger_hash):
+        '''
+        Change a sequence's canonical hash, moving agreement credit to the hash's validators.
+
+        :param LedgerVotes votes: The sequence's validations
+        :param bytes ledger_hash: New canonical hash
+        '''
+        if votes.canonical == ledger_hash:
+            return
+        if votes.canonical is None:
+            self.canonical_count += 1
+        else:
+            self.credit(votes.bitmaps.get(votes.canonical, 0), -1)
+        votes.canonical = ledger_hash
+        self.credit(votes.bitmaps.get(ledger_hash, 0), 1)
+
+    def get_votes(self, sequence):
+        '''
+        :param int sequence: Ledger sequence
+        :returns: The sequence's validations, or None if it is older than the window
+        :rtype: LedgerVotes
+        '''
+        votes = self.ledgers.get(sequence)
+        if votes is not None:
+            return votes
+        if self.newest is not None and sequence <= self.newest - self.window:
+            return None
+        votes = self.ledgers[sequence] = LedgerVotes()
+        if self.newest is None or sequence > self.newest:
+            self.newest = sequence
+            self.evict()
+        return votes
+
+    def evict(self):
+        '''
+        Remove sequences that have left the window.
+        '''
+        oldest = self.newest - self.window
+        for sequence in [i for i in self.ledgers if i <= oldest]:
+            votes = self.ledgers.pop(sequence)
+            if votes.canonical is not None:
+                self.credit(votes.bitmaps.get(votes.canonical, 0), -1)
+                self.canonical_count -= 1
+            self.forks.discard(sequence)
+
+        # A validator whose newest validation left the window has no bits set in any
+        # remaining bitmap, so its bit can be reassigned.
+        for bit, sequence in enumerate(self.last_validated):
+            if sequence <= oldest and self.validator_keys[bit] is not None and bit not in self.pinned:
+                del self.validator_bits[self.validator_keys[bit]]
+                self.validator_keys[bit] = None
+                self.agreements[bit] = 0
+                heapq.heappush(self.free_bits, bit)
+
+    def add_validation(self, sequence, ledger_hash, key):
+        '''
+        :param int sequence: Ledger sequence
+        :param bytes ledger_hash: Validated ledger hash
+        :param str key: Validator's master key
+        '''
+        votes = self.get_votes(sequence)
+        if votes is None:
+            return
+        index = self.validator_bit(key)
+        bit = 1 << index
+        bitmap = votes.bitmaps.get(ledger_hash, 0)
+        if bitmap & bit:
+            return
+        votes.bitmaps[ledger_hash] = bitmap | bit
+        votes.counts[ledger_hash] = votes.counts.get(ledger_hash, 0) + 1
+        votes.validators |= bit
+        if sequence > self.last_validated[index]:
+            self.last_validated[index] = sequence
+        if len(votes.bitmaps) == 2 and sequence not in self.forks:
+            self.forks.add(sequence)
+            FORK_COUNT.inc()
+            logging.warning(f"Validators disagree on the hash of ledger: {sequence}.")
+        if votes.canonical == ledger_hash:
+            self.agreements[index] += 1
+        elif not votes.closed and (
+                votes.canonical is None or votes.counts[ledger_hash] > votes.counts[votes.canonical]
+        ):
+            self.set_canonical(votes, ledger_hash)
+
+    def add_ledger(self, sequence, ledger_hash):
+        '''
+        :param int sequence: Ledger sequence
+        :param bytes ledger_hash: Hash from a ledgerClosed message
+        '''
+        votes = self.get_votes(sequence)
+        if votes is None:
+            return
+        newly_closed = not votes.closed
+        votes.closed = True
+        self.set_canonical(votes, ledger_hash)
+        if newly_closed:
+            for listener in self.ledger_listeners:
+                listener(sequence, ledger_hash)
+
+    def add(self, message):
+        '''
+        Add a deduplicated validationReceived or ledgerClosed message. Raw frames are
+        scanned for the fields the tracker needs, rather than decoded.
+
+        :param message: Decoded message or RawMessage
+        '''
+        try:
+            if isinstance(message, RawMessage):
+                self.add_frame(message)
+            elif message['type'] == 'validationReceived':
+                self.add_validation(
+                    int(message['ledger_index']),
+                    as_bytes(message['ledger_hash']),
+                    message.get('master_key') or message['validation_public_key'],
+                )
+            elif message['type'] == 'ledgerClosed':
+                self.add_ledger(int(message['ledger_index']), as_bytes(message['ledger_hash']))
+        except (KeyError, ValueError, TypeError) as error:
+            logging.info(f"Unable to add a message to the consensus tracker. Error: {error}.")
+
+    def add_frame(self, message):
+        '''
+        :param RawMessage message: Deduplicated frame
+        '''
+        if message.type not in ('validationReceived', 'ledgerClosed'):
+            return
+        ledger = scan_ledger(message.frame)
+        if ledger is None:
+            raise ValueError(f"No ledger in {message.type} frame")
+        if message.type == 'ledgerClosed':
+            self.add_ledger(*ledger)
+            return
+        key = scan_validator_key(message.frame)
+        if key is None:
+            raise ValueError("No validator key in validationReceived frame")
+        self.add_validation(*ledger, key)
+
+    def validated(self, key, sequence):
+        '''
+        :param str key: Validator's master key
+        :param int sequence: Ledger sequence
+        :returns: Hash the validator validated, or None
+        :rtype: bytes
+        '''
+        votes = self.ledgers.get(sequence)
+        bit = self.validator_bits.get(key)
+        if votes is None or bit is None or not votes.validators >> bit & 1:
+            return None
+        return next(i for i, bitmap in votes.bitmaps.items() if bitmap >> bit & 1)
+
+    def validators(self, sequence, ledger_hash=None):
+        '''
+        :param int sequence: Ledger sequence
+        :param bytes ledger_hash: Hash, or None for the canonical hash
+        :returns: Bitmap of the validators that validated the hash
+        :rtype: int
+        '''
+        votes = self.ledgers.get(sequence)
+        if votes is None:
+            return 0
+        return votes.bitmaps.get(ledger_hash or votes.canonical, 0)
+
+    def active_validators(self):
+        '''
+        :returns: Bitmap of the validators that validated any ledger in the window
+        :rtype: int
+        '''
+        if self.newest is None:
+            return 0
+        oldest = self.newest - self.window
+        bitmap = 0
+        for bit, sequence in enumerate(self.last_validated):
+            if sequence > oldest:
+                bitmap |= 1 << bit
+        return bitmap
+
+    def ledger_agreement(self, sequence):
+        '''
+        :param int sequence: Ledger sequence
+        :returns: Fraction of validators for the sequence that validated the canonical hash,
+            or None if the sequence has no validations
+        :rtype: float
+        '''
+        votes = self.ledgers.get(sequence)
+        if votes is None or votes.canonical is None:
+            return None
+        total = sum(votes.counts.values())
+        return votes.counts.get(votes.canonical, 0) / total if total else None
+
+    def agreement(self, key):
+        '''
+        :param str key: Validator's master key
+        :returns: Fraction of ledgers in the window where the validator validated the
+            canonical hash, or None if the validator hasn't been seen
+        :rtype: float
+        '''
+        bit = self.validator_bits.get(key)
+        if bit is None or not self.canonical_count:
+            return None
+        return self.agreements[bit] / self.canonical_count
+
+    def hashes(self, sequence):
+        '''
+        :param int sequence: Ledger sequence
+        :returns: Number of validators for each hash validated for the sequence
+        :rtype: dict
+        '''
+        votes = self.ledgers.get(sequence)
+        return dict(votes.counts) if votes else {}
@@ -0,0 +1,38 @@
+'''
+Bounded cache of message keys that were already passed on, used to avoid
+sending or writing duplicate messages.
+'''
+from collections import OrderedDict
+
+class DedupCache:
+    '''
+    Insertion-ordered set with a fixed capacity. Lookups are O(1) and, once the
+    capacity is reached, each new key evicts the oldest key in O(1).
+
+    :param int max_length: Maximum number of keys to retain
+    '''
+    def __init__(self, max_length):
+        self.max_length = max(int(max_length), 1)
+        # OrderedDict, rather than dict, so evicting the oldest key doesn't need to
+        # scan past the slots of previously deleted keys.
+        self.keys = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key):
+        '''
+        Track a key. Returns False if the key was already tracked.
+
+        :param key: Unique, hashable message key
+        :rtype: bool
+        '''
+        if key in self.keys:
+            return False
+        self.keys[key] = None
+        if len(self.keys) > self.max_length:
+            self.keys.popitem(last=False)
+        return True
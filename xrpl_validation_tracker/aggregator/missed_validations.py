@@ -0,0 +1,71 @@
+'''
+Report validators that didn't validate each closed ledger. A 'validationsMissed' message
+is added to the outgoing stream a grace period after each ledgerClosed message, computed
+from the ConsensusTracker's bitmaps rather than database queries.
+'''
+import asyncio
+import logging
+
+from metrics.registry import REGISTRY
+
+MISSED_COUNT = REGISTRY.counter('xrpl_validations_missed_total', "Expected validations that weren't received.")
+
+class MissedValidationMonitor:
+    '''
+    Add a validationsMissed message to the outgoing queue for each closed ledger.
+
+    :param ConsensusTracker consensus: Tracker holding recent validations
+    :param asyncio.queues.Queue queue_send: Queue for outgoing websocket messages
+    :param float grace: Seconds to wait for validations after a ledger closes
+    :param list keys: Master keys of the validators expected to validate every ledger. If
+        empty, every validator that validated a ledger in the consensus window is expected.
+    '''
+    def __init__(self, consensus, queue_send, grace, keys):
+        self.consensus = consensus
+        self.queue_send = queue_send
+        self.grace = grace
+        self.watched = 0
+        for key in keys:
+            self.watched |= 1 << consensus.pin(key)
+        consensus.ledger_listeners.append(self.ledger_closed)
+
+    def ledger_closed(self, sequence, ledger_hash):
+        '''
+        Schedule a report for a ledger that just closed.
+
+        :param int sequence: Ledger sequence
+        :param bytes ledger_hash: Ledger hash
+        '''
+        asyncio.ensure_future(self.report(sequence, ledger_hash))
+
+    def expected(self):
+        '''
+        :returns: Bitmap of the validators expected to validate each ledger
+        :rtype: int
+        '''
+        return self.watched or self.consensus.active_validators()
+
+    async def report(self, sequence, ledger_hash):
+        '''
+        Wait for the grace period, then add the ledger's missed validations to the outgoing queue.
+
+        :param int sequence: Ledger sequence
+        :param bytes ledger_hash: Ledger hash
+        '''
+        await asyncio.sleep(self.grace)
+        votes = self.consensus.ledgers.get(sequence)
+        if votes is None:
+            # The ledger left the consensus window during the grace period
+            return
+        expected = self.expected()
+        missed = self.consensus.keys(expected & ~votes.validators)
+        if missed:
+            MISSED_COUNT.inc(len(missed))
+            logging.info(f"{len(missed)} validators missed ledger: {sequence}.")
+        await self.queue_send.put({
+            'type': 'validationsMissed',
+            'ledger_index': sequence,
+            'ledger_hash': ledger_hash,
+            'validators_expected': bin(expected).count('1'),
+            'validators_missed': missed,
+        })
@@ -6,6 +6,13 @@ Novel messages are transferred to the outbound queue.
 import asyncio
 import logging
 
+from metrics.registry import REGISTRY
+from ws_client.frame_scan import RawMessage, strip_node_specific_fields
+from .dedup import DedupCache
+
+# Message types that are deduplicated and passed on
+UNIQUE_TYPES = ('validationReceived', 'ledgerClosed', 'manifestReceived')
+
 class DataProcessor:
     '''
     Pass unique messages from the receiving queue into the send queue.
@@ -13,35 +20,49 @@ class DataProcessor:
     :param asyncio.queues.Queue queue_receive: Queue for incoming websocket messages
     :param asyncio.queues.Queue queue_send: Queue for outgoing websocket messages
     :param settings: settings file
+    :param ConsensusTracker consensus: Tracker to add unique messages to, or None
     '''
-    def __init__(self, queue_receive, queue_send, settings):
+    def __init__(self, queue_receive, queue_send, settings, consensus=None):
         self.queue_receive = queue_receive
         self.queue_send = queue_send
         self.settings = settings
+        self.consensus = consensus
         self.queue_r_max = 0
         self.queue_s_max = 0
-        # Change sent_message_tracking to a set?
-        self.sent_message_tracking = []
-
-    async def prune_sent_tracking(self):
-        '''
-        Cull the sent message tracking lists.
-        '''
-        if len(self.sent_message_tracking) >= self.settings.SENT_MESSAGES_MAX_LENGTH:
-            half_list = self.settings.SENT_MESSAGES_MAX_LENGTH / 2
-            logging.info(f"Sent message list >= {self.settings.SENT_MESSAGES_MAX_LENGTH} items. Deleting {half_list} items.")
-            del self.sent_message_tracking[0:int(half_list)]
+        self.sent_message_tracking = DedupCache(settings.SENT_MESSAGES_MAX_LENGTH)
+        self.unique_count = REGISTRY.counter(
+            'xrpl_dedup_messages_total', "Messages checked for duplicates, by result.", result='unique'
+        )
+        self.duplicate_count = REGISTRY.counter(
+            'xrpl_dedup_messages_total', "Messages checked for duplicates, by result.", result='duplicate'
+        )
+        REGISTRY.gauge(
+            'xrpl_dedup_cache_size', "Keys held by the duplicate message filter.",
+            lambda: len(self.sent_message_tracking)
+        )
+        REGISTRY.gauge(
+            'xrpl_queue_depth', "Messages waiting in each queue.",
+            queue_receive.qsize, queue='receive'
+        )
+        REGISTRY.gauge(
+            'xrpl_queue_depth', "Messages waiting in each queue.",
+            queue_send.qsize, queue='send'
+        )
 
     async def add_message_to_queue(self, message, unique_key):
         '''
         Pass unique messages to queue_send.
 
         :param dict message: Message from a remote websocket server
-        :param str unique_key: Unique key used to avoid adding duplicate messages to the outbound queue.
+        :param unique_key: Unique key used to avoid adding duplicate messages to the outbound queue.
         '''
-        if message[unique_key] not in set(self.sent_message_tracking):
+        if self.sent_message_tracking.add(unique_key):
+            self.unique_count.inc()
+            if self.consensus:
+                self.consensus.add(message)
             await self.queue_send.put(message)
-            self.sent_message_tracking.append(message[unique_key])
+        else:
+            self.duplicate_count.inc()
 
     async def send_outgoing_messages(self, message):
         '''
@@ -50,12 +71,33 @@ class DataProcessor:
         :param dict message: Message from a remote websocket server
         '''
         if message['type'] == 'validationReceived':
-            await self.add_message_to_queue(message, 'signature')
+            await self.add_message_to_queue(message, message['signature'])
         elif message['type'] == 'ledgerClosed':
-            await self.add_message_to_queue(message, 'ledger_hash')
+            await self.add_message_to_queue(message, message['ledger_hash'])
+        elif message['type'] == 'manifestReceived':
+            await self.add_message_to_queue(message, (message['master_key'], message['seq']))
         elif message['type'] == "response":
             pass
 
+    async def send_raw_message(self, message):
+        '''
+        Pass unique frames to queue_send without decoding them. Only ledgerClosed frames
+        that pass deduplication are decoded, to remove node specific fields.
+
+        :param RawMessage message: Frame from a remote websocket server
+        '''
+        if message.type in UNIQUE_TYPES and message.key is not None:
+            if self.sent_message_tracking.add(message.key):
+                self.unique_count.inc()
+                message = strip_node_specific_fields(message)
+                if message is None:
+                    return
+                if self.consensus:
+                    self.consensus.add(message)
+                await self.queue_send.put(message)
+            else:
+                self.duplicate_count.inc()
+
     async def remove_node_specific_fields(self, message):
         '''
         Removed fields that are specific to individual nodes, rather than the ledger generally.
@@ -85,18 +127,24 @@ class DataProcessor:
         '''
         Process data fed from websocket connections into the queue.
         '''
-        # To-do: clean out queue_send, in case a client isn't connected
-
         while True:
             try:
                 message = await self.queue_receive.get()
                 await self.log_record_queue_size()
+                if isinstance(message, RawMessage):
+                    await self.send_raw_message(message)
+                    continue
                 message = await self.remove_node_specific_fields(message)
                 if 'type' in message:
                     await self.send_outgoing_messages(message)
-                await self.prune_sent_tracking()
             except KeyError:
                 # Ignore unexpected response messages
                 continue
             except KeyboardInterrupt:
                 break
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                # One bad message mustn't stop messages from being forwarded.
+                logging.warning(f"Unable to process a message. Error: {error}.")
+                continue
@@ -0,0 +1,191 @@
+'''
+Spread websocket connections to remote servers across worker processes. Each worker owns
+a subset of settings.URLS, scans the frames it receives, and drops duplicates between its
+own connections. The remaining frames are sent in batches over a pipe to the main
+aggregator process, which removes duplicates between workers and serves clients.
+'''
+import asyncio
+import importlib
+import logging
+import multiprocessing
+
+from ws_client.ws_minder import ConnectionSupervisor, backoff_delay
+from metrics.registry import REGISTRY
+from ws_client.frame_scan import strip_node_specific_fields
+from .dedup import DedupCache
+
+FORWARD_BATCH_SIZE = 500 # Maximum number of messages sent over the pipe at once
+# Workers are spawned rather than forked, so they don't inherit the main process's sockets.
+CONTEXT = multiprocessing.get_context('spawn')
+
+def prefilter(messages, cache):
+    '''
+    Keep unique validation and ledger frames, removing node specific fields.
+
+    :param list messages: RawMessages received from remote servers
+    :param DedupCache cache: Keys already forwarded by this worker
+    :returns: Messages to forward
+    :rtype: list
+    '''
+    stripped = [
+        strip_node_specific_fields(message) for message in messages
+        if message.key is not None and cache.add(message.key)
+    ]
+    return [i for i in stripped if i is not None]
+
+async def forward_messages(queue, connection, cache):
+    '''
+    Batch messages from the worker's connections and send them to the main process.
+
+    :param asyncio.queues.Queue queue: Queue for incoming websocket messages
+    :param connection: Pipe to the main process
+    :param DedupCache cache: Keys already forwarded by this worker
+    '''
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            messages = [await queue.get()]
+            while not queue.empty() and len(messages) < FORWARD_BATCH_SIZE:
+                messages.append(queue.get_nowait())
+            batch = prefilter(messages, cache)
+            if batch:
+                # Writes block while the pipe is full, so send from a thread to keep
+                # keepalive pings and the stale connection check running.
+                await loop.run_in_executor(None, connection.send, batch)
+        except KeyboardInterrupt:
+            break
+
+async def spawn_worker_tasks(urls, connection, settings):
+    '''
+    Subscribe to a worker's share of the remote servers.
+
+    :param list urls: URLs this worker connects to
+    :param connection: Pipe to the main process
+    :param settings: Configuration file
+    '''
+    queue = asyncio.Queue(maxsize=settings.QUEUE_MAX_SIZE)
+    ConnectionSupervisor(urls, queue, settings, True).start()
+    asyncio.ensure_future(
+        forward_messages(queue, connection, DedupCache(settings.SENT_MESSAGES_MAX_LENGTH))
+    )
+
+def run_worker(urls, connection, settings_name):
+    '''
+    Entry point for worker processes.
+
+    :param list urls: URLs this worker connects to
+    :param connection: Pipe to the main process
+    :param str settings_name: Name of the settings module to import
+    '''
+    settings = importlib.import_module(settings_name)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(spawn_worker_tasks(urls, connection, settings))
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+class WorkerPool:
+    '''
+    Start worker processes and pass the messages they forward into queue_receive. Workers
+    that exit are restarted, with the same backoff as websocket connections.
+
+    :param asyncio.queues.Queue queue_receive: Queue for incoming websocket messages
+    :param settings: Configuration file
+    '''
+    def __init__(self, queue_receive, settings):
+        self.queue_receive = queue_receive
+        self.settings = settings
+        self.worker_count = min(settings.AGGREGATOR_WORKERS, len(settings.URLS))
+        self.workers = {}
+        self.restarts = {}
+        self.forwarded = {}
+
+    def start_worker(self, worker_id):
+        '''
+        Start a worker process and listen to its pipe.
+
+        :param int worker_id: Worker number
+        '''
+        urls = self.settings.URLS[worker_id::self.worker_count]
+        receiver, sender = CONTEXT.Pipe(duplex=False)
+        process = CONTEXT.Process(
+            target=run_worker,
+            args=(urls, sender, self.settings.__name__),
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        asyncio.get_event_loop().add_reader(receiver.fileno(), self.receive_messages, worker_id)
+        self.workers[worker_id] = (process, receiver)
+        self.forwarded[worker_id] = REGISTRY.counter(
+            'xrpl_worker_messages_forwarded_total', "Messages forwarded by each aggregator worker.",
+            worker=worker_id
+        )
+        logging.info(f"Started aggregator worker: {worker_id} with: {len(urls)} websocket connections.")
+
+    def receive_messages(self, worker_id):
+        '''
+        Read a batch of messages from a worker's pipe into queue_receive.
+
+        :param int worker_id: Worker number
+        '''
+        process, receiver = self.workers[worker_id]
+        try:
+            batch = receiver.recv()
+        except (EOFError, OSError):
+            asyncio.get_event_loop().remove_reader(receiver.fileno())
+            receiver.close()
+            self.restart_worker(worker_id)
+            return
+        # The worker is delivering messages, so reset its restart backoff.
+        self.restarts[worker_id] = 0
+        self.forwarded[worker_id].inc(len(batch))
+        for index, message in enumerate(batch):
+            try:
+                self.queue_receive.put_nowait(message)
+            except asyncio.QueueFull:
+                # Stop reading the pipe until the queue has room. The worker's sends then
+                # wait on its full pipe, its queue fills, and it stops reading from its
+                # websocket connections.
+                asyncio.get_event_loop().remove_reader(receiver.fileno())
+                asyncio.ensure_future(self.resume_worker(worker_id, batch[index:]))
+                return
+
+    async def resume_worker(self, worker_id, messages):
+        '''
+        Wait for room in queue_receive, then resume reading a worker's pipe.
+
+        :param int worker_id: Worker number
+        :param list messages: Messages from the worker that have not been queued yet
+        '''
+        for message in messages:
+            await self.queue_receive.put(message)
+        receiver = self.workers[worker_id][1]
+        if not receiver.closed:
+            asyncio.get_event_loop().add_reader(receiver.fileno(), self.receive_messages, worker_id)
+
+    def restart_worker(self, worker_id):
+        '''
+        Schedule a replacement for a worker process that has exited.
+
+        :param int worker_id: Worker number
+        '''
+        process = self.workers[worker_id][0]
+        self.restarts[worker_id] = self.restarts.get(worker_id, 0) + 1
+        REGISTRY.counter(
+            'xrpl_worker_restarts_total', "Restarts of each aggregator worker.", worker=worker_id
+        ).inc()
+        delay = backoff_delay(
+            self.restarts[worker_id] - 1, self.settings.WS_BACKOFF_MIN, self.settings.WS_BACKOFF_MAX
+        )
+        logging.warning(f"Aggregator worker: {worker_id} with PID: {process.pid} stopped. Restarting in: {delay:.2f} seconds.")
+        asyncio.get_event_loop().call_later(delay, self.start_worker, worker_id)
+
+    def start(self):
+        '''
+        Start every worker.
+        '''
+        for worker_id in range(self.worker_count):
+            self.start_worker(worker_id)
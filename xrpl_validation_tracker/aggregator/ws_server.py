@@ -1,72 +1,377 @@
 '''
 Listen for messages in the queue, then dispatch them to connected websocket clients.
+
+Clients choose streams with rippled style commands, optionally limiting validations and
+manifests to a list of validator keys:
+`{"command": "subscribe", "streams": ["validations"], "validators": ["nH..."]}`
 '''
 import asyncio
 import logging
 import json
-import time
+from collections import deque
 import websockets
-from websockets.protocol import State
+
+from metrics.registry import REGISTRY
+from ws_client.encoding import encode_message
+from ws_client.frame_scan import RawMessage, scan_ledger_index, scan_validator_keys
+
+SLOW_CLIENT_POLICIES = ('drop_oldest', 'disconnect', 'coalesce')
+
+# Message type sent for each stream clients can subscribe to.
+STREAM_TYPES = {
+    'validations': 'validationReceived',
+    'ledger': 'ledgerClosed',
+    'validations_missed': 'validationsMissed',
+    'manifests': 'manifestReceived',
+}
+# Message types that a client's validator keys filter.
+VALIDATOR_TYPES = ('validationReceived', 'manifestReceived')
+
+BROADCAST_COUNT = REGISTRY.counter('xrpl_ws_server_messages_total', "Messages broadcast to websocket clients.")
+DROPPED_COUNT = REGISTRY.counter('xrpl_ws_server_dropped_total', "Messages dropped for slow websocket clients.")
+DISCONNECT_COUNT = REGISTRY.counter('xrpl_ws_server_slow_disconnects_total', "Websocket clients disconnected for being too slow.")
+
+class ClientBuffer:
+    '''
+    Bounded buffer of serialized messages waiting to be sent to one client.
+
+    :param ws_client: Websocket client connection
+    :param int max_length: Maximum number of messages to buffer
+    :param str policy: What to do when the buffer is full - see SLOW_CLIENT_POLICIES
+    '''
+    def __init__(self, ws_client, max_length, policy):
+        self.ws_client = ws_client
+        self.max_length = max_length
+        self.policy = policy
+        self.messages = deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.streams = set() # Message types the client is subscribed to
+        self.validators = set() # Validator keys the client receives validations from
+        self.commanded = False # Whether the client has sent a subscription command
+        self.ledger_entry = None # Newest buffered ledgerClosed (type, data) entry
+        self.closed_index = 0 # Newest ledger_index of the ledgerClosed messages put in the buffer
+
+    def put(self, message_type, data):
+        '''
+        Add a message to the buffer, applying the slow client policy if the buffer is full.
+
+        :param str message_type: Value of the message's 'type' field
+        :param str data: Serialized message
+        :returns: False if the client should be disconnected
+        :rtype: bool
+        '''
+        if self.policy == 'coalesce' and message_type == 'ledgerClosed':
+            self.closed_index = max(self.closed_index, scan_ledger_index(data) or 0)
+        if len(self.messages) >= self.max_length:
+            if self.policy == 'disconnect':
+                return False
+            if self.policy != 'coalesce' or not self.coalesce(message_type):
+                if self.messages.popleft() is self.ledger_entry:
+                    self.ledger_entry = None
+            self.dropped += 1
+            DROPPED_COUNT.inc()
+        entry = (message_type, data)
+        self.messages.append(entry)
+        if message_type == 'ledgerClosed':
+            self.ledger_entry = entry
+        self.ready.set()
+        return True
+
+    def coalesce(self, message_type):
+        '''
+        Make room by removing a buffered message that is superseded: the buffered
+        ledgerClosed message if another one is arriving, otherwise the oldest validation
+        for a ledger that has already closed.
+
+        :param str message_type: Type of the message that needs room
+        :returns: False if no buffered message is superseded
+        :rtype: bool
+        '''
+        if message_type == 'ledgerClosed' and self.ledger_entry:
+            # Search from the newest message, as the ledgerClosed message is usually recent.
+            for index in range(len(self.messages) - 1, -1, -1):
+                if self.messages[index] is self.ledger_entry:
+                    del self.messages[index]
+                    self.ledger_entry = None
+                    return True
+        # Validations are buffered roughly in ledger order, so only the oldest one is checked.
+        for index, (buffered_type, data) in enumerate(self.messages):
+            if buffered_type == 'validationReceived':
+                sequence = scan_ledger_index(data)
+                if sequence is None or sequence > self.closed_index:
+                    return False
+                del self.messages[index]
+                return True
+        return False
+
+    def pop(self):
+        '''
+        :returns: The oldest serialized message in the buffer
+        :rtype: str
+        '''
+        entry = self.messages.popleft()
+        if entry is self.ledger_entry:
+            self.ledger_entry = None
+        return entry[1]
+
+def message_validator_keys(message):
+    '''
+    :param message: Decoded validationReceived or manifestReceived message, or RawMessage
+    :returns: The message's master and ephemeral keys
+    :rtype: list
+    '''
+    if isinstance(message, RawMessage):
+        return scan_validator_keys(message.frame)
+    return [message[i] for i in ('master_key', 'validation_public_key') if i in message]
+
+def command_response(command, error=None):
+    '''
+    :param dict command: Command sent by a client
+    :param str error: rippled style error code, or None if the command succeeded
+    :returns: Serialized response
+    :rtype: str
+    '''
+    if error:
+        response = {'type': 'response', 'status': 'error', 'error': error}
+    else:
+        response = {'type': 'response', 'status': 'success', 'result': {}}
+    if isinstance(command, dict) and 'id' in command:
+        response['id'] = command['id']
+    return json.dumps(response)
 
 class WsServer:
     '''
-    Websocket server.
+    Websocket server. Each message from the outgoing queue is looked up in an index of
+    subscriptions, serialized once (raw frames are forwarded as received), then copied
+    into a buffer for every subscribed client. Each client's connection handler drains its
+    own buffer, so a slow client can't delay delivery to other clients.
     '''
     def __init__(self):
-        self.clients = set()
-        self.disconnected_clients = []
+        self.clients = {}
+        # Clients subscribed to every message of each type. Clients with validator keys
+        # are only indexed by key for VALIDATOR_TYPES.
+        self.stream_clients = {i: set() for i in STREAM_TYPES.values()}
+        # Clients filtering validations and manifests by each validator key
+        self.validator_clients = {}
         self.queue_send = None
+        self.settings = None
+        REGISTRY.gauge('xrpl_ws_server_clients', "Connected websocket clients.", lambda: len(self.clients))
 
-    async def remove_clients(self):
+    def disconnect_client(self, ws_client):
+        '''
+        Close the connection to a client that can't keep up with the outgoing stream. The
+        client is removed right away, so it's only disconnected once.
+
+        :param ws_client: Websocket client connection
         '''
-        Remove clients who are no longer connected from the self.clients set.
+        client = self.clients.pop(ws_client, None)
+        if client is None:
+            return
+        logging.warning(f"Disconnecting WS client: {ws_client.remote_address[0]}, as its send buffer is full.")
+        DISCONNECT_COUNT.inc()
+        # Wake the client's connection handler so it exits.
+        client.ready.set()
+        asyncio.ensure_future(ws_client.close(code=1008, reason="Send buffer full."))
 
-        :param list client: Client(s) that are disconnected
+    def index_streams(self, client):
         '''
+        Add a client to the stream_clients of the streams it receives in full.
+
+        :param ClientBuffer client: Client whose subscriptions changed
+        '''
+        for message_type, clients in self.stream_clients.items():
+            if message_type in client.streams and not (client.validators and message_type in VALIDATOR_TYPES):
+                clients.add(client)
+            else:
+                clients.discard(client)
+
+    def subscribe(self, client, streams, validators):
+        '''
+        :param ClientBuffer client: Subscribing client
+        :param list streams: Stream names
+        :param list validators: Validator keys
+        '''
+        client.streams.update(STREAM_TYPES[i] for i in streams)
+        for key in validators:
+            client.validators.add(key)
+            self.validator_clients.setdefault(key, set()).add(client)
+        self.index_streams(client)
+
+    def unsubscribe(self, client, streams, validators):
+        '''
+        :param ClientBuffer client: Unsubscribing client
+        :param list streams: Stream names
+        :param list validators: Validator keys
+        '''
+        client.streams.difference_update(STREAM_TYPES[i] for i in streams)
+        for key in validators:
+            client.validators.discard(key)
+            clients = self.validator_clients.get(key)
+            if clients is not None:
+                clients.discard(client)
+                if not clients:
+                    del self.validator_clients[key]
+        self.index_streams(client)
+
+    def remove_subscriptions(self, client):
+        '''
+        :param ClientBuffer client: Disconnected client
+        '''
+        self.unsubscribe(
+            client,
+            [i for i, message_type in STREAM_TYPES.items() if message_type in client.streams],
+            list(client.validators),
+        )
+
+    def handle_command(self, client, command):
+        '''
+        Apply a subscribe or unsubscribe command. A client's first command replaces the
+        subscription it was given when it connected.
+
+        :param ClientBuffer client: Client that sent the command
+        :param dict command: Decoded command
+        :returns: rippled style error code, or None if the command succeeded
+        :rtype: str
+        '''
+        if not isinstance(command, dict) or command.get('command') not in ('subscribe', 'unsubscribe'):
+            return 'unknownCmd'
+        streams = command.get('streams', [])
+        validators = command.get('validators', [])
+        if not isinstance(streams, list) or not isinstance(validators, list):
+            return 'invalidParams'
+        if any(not isinstance(i, str) for i in validators):
+            return 'invalidParams'
+        if any(i not in STREAM_TYPES for i in streams):
+            return 'unknownStream'
+        current = client.validators if client.commanded else set()
+        if command['command'] == 'subscribe' and len(current | set(validators)) > self.settings.WS_MAX_VALIDATOR_KEYS:
+            return 'tooManyValidators'
+        if not client.commanded:
+            client.commanded = True
+            self.remove_subscriptions(client)
+        if command['command'] == 'subscribe':
+            self.subscribe(client, streams, validators)
+        else:
+            self.unsubscribe(client, streams, validators)
+        return None
+
+    async def receive_commands(self, client):
+        '''
+        Listen for subscription commands from a client and reply to each.
+
+        :param ClientBuffer client: Client to listen to
+        '''
+        ws_client = client.ws_client
         try:
-            logging.info(f"Attempting to remove: {len(self.disconnected_clients)} disconnected clients from the list of connected clients.")
-            self.clients = set(self.clients) - set(self.disconnected_clients)
-            logging.info(f"There are: {len(self.clients)} clients in the WS server connected clients list.")
-        except KeyError as error:
-            logging.warning(f"Error removing disconnected WS client: {error}.")
-        self.disconnected_clients = []
+            async for data in ws_client:
+                try:
+                    command = json.loads(data)
+                except ValueError:
+                    command, error = None, 'jsonInvalid'
+                else:
+                    error = self.handle_command(client, command)
+                if not client.put('response', command_response(command, error)):
+                    self.disconnect_client(ws_client)
+                    break
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            # Wake the client's connection handler so it exits.
+            self.clients.pop(ws_client, None)
+            client.ready.set()
+
+    def recipients(self, message_type, message):
+        '''
+        :param str message_type: Value of the message's 'type' field
+        :param message: Decoded message or RawMessage
+        :returns: Clients subscribed to the message
+        '''
+        clients = self.stream_clients.get(message_type)
+        if clients is None:
+            # Messages outside the subscribable streams go to every client
+            return list(self.clients.values())
+        if message_type in VALIDATOR_TYPES and self.validator_clients:
+            matched = set()
+            for key in message_validator_keys(message):
+                matched.update(
+                    i for i in self.validator_clients.get(key, ()) if message_type in i.streams
+                )
+            if matched:
+                return clients | matched
+        return clients
+
+    async def broadcast(self):
+        '''
+        Listen for messages in the outgoing queue, then copy them into the client buffers.
+        '''
+        while True:
+            message = await self.queue_send.get()
+            if not self.clients:
+                continue
+            if isinstance(message, RawMessage):
+                message_type = message.type
+            else:
+                message_type = message.get('type')
+            clients = self.recipients(message_type, message)
+            if not clients:
+                continue
+            BROADCAST_COUNT.inc()
+            if isinstance(message, RawMessage):
+                # Forward frames as they were received
+                outgoing_message = message.frame
+            else:
+                outgoing_message = json.dumps(encode_message(message))
+            for client in clients:
+                if not client.put(message_type, outgoing_message):
+                    self.disconnect_client(client.ws_client)
 
     async def outgoing_server(self, ws_client):
         '''
-        Listen for messages in the outgoing queue, then dispatch
-        them to connected clients.
+        Register a client, then send it messages as they are added to its buffer.
 
         :param ws_client: Websocket client connection
         '''
+        client = ClientBuffer(
+            ws_client,
+            self.settings.WS_CLIENT_BUFFER_SIZE,
+            self.settings.WS_SLOW_CLIENT_POLICY
+        )
+        self.clients[ws_client] = client
+        if self.settings.WS_SEND_ALL_BY_DEFAULT:
+            self.subscribe(client, list(STREAM_TYPES), [])
+        receiver = asyncio.ensure_future(self.receive_commands(client))
+        logging.info(f"A new user with IP: {ws_client.remote_address[0]} connected to the WS server.")
+        logging.info(f"There are: {len(self.clients)} clients connected to the WS server.")
         try:
-            self.clients.add(ws_client)
-            logging.info(f"A new user with IP: {ws_client.remote_address[0]} connected to the WS server.")
-            logging.info(f"There are: {len(self.clients)} clients connected to the WS server.")
-            while True:
-                outgoing_message = json.dumps(await self.queue_send.get())
-                if self.clients:
-                    for client in self.clients:
-                        if client.state == State.OPEN:
-                            await client.send(outgoing_message)
-                        elif client.state != State.OPEN:
-                            self.disconnected_clients.append(client)
-                if self.disconnected_clients:
-                        await self.remove_clients()
+            while ws_client in self.clients:
+                await client.ready.wait()
+                while client.messages:
+                    await ws_client.send(client.pop())
+                client.ready.clear()
         except (
                 AttributeError,
                 ConnectionResetError,
-                websockets.exceptions.ConnectionClosedError,
+                websockets.exceptions.ConnectionClosed,
         ) as error:
             logging.info(f"WS connection with client address: {ws_client.remote_address[0]} and connection object {ws_client} closed with: {error}.")
         finally:
-            self.disconnected_clients.append(ws_client)
+            receiver.cancel()
+            self.clients.pop(ws_client, None)
+            self.remove_subscriptions(client)
+            if client.dropped:
+                logging.warning(f"Dropped: {client.dropped} messages for WS client: {ws_client.remote_address[0]}, as it was too slow.")
+            logging.info(f"There are: {len(self.clients)} clients connected to the WS server.")
 
     async def start_outgoing_server(self, queue_send, settings):
         '''
         Start listening for client connections.
 
         :param asyncio.queues.Queue queue_send: Queue for outgoing websocket messages
+        :param settings: Configuration file
         '''
         self.queue_send = queue_send
+        self.settings = settings
+        asyncio.ensure_future(self.broadcast())
         logging.info(f"Starting the websocket server on IP: {settings.SERVER_IP}:{settings.SERVER_PORT}.")
         await websockets.serve(self.outgoing_server, settings.SERVER_IP, settings.SERVER_PORT)
@@ -7,3 +7,22 @@ def check_aggregator_settings(settings):
     for i in settings.URLS:
         assert (isinstance(i['ssl_verify'], bool)), "ssl_verify type must be a boolean."
         assert (isinstance(i['url'], str)), "URLs must be strings."
+    assert (isinstance(settings.WS_CLIENT_BUFFER_SIZE, int) and settings.WS_CLIENT_BUFFER_SIZE > 0), "WS_CLIENT_BUFFER_SIZE must be a positive integer."
+    assert (settings.WS_SLOW_CLIENT_POLICY in ('drop_oldest', 'disconnect', 'coalesce')), "WS_SLOW_CLIENT_POLICY must be 'drop_oldest', 'disconnect', or 'coalesce'."
+    assert (isinstance(settings.WS_SEND_ALL_BY_DEFAULT, bool)), "WS_SEND_ALL_BY_DEFAULT must be a boolean."
+    assert (isinstance(settings.WS_MAX_VALIDATOR_KEYS, int) and settings.WS_MAX_VALIDATOR_KEYS >= 0), "WS_MAX_VALIDATOR_KEYS must be an integer >= 0."
+    assert (isinstance(settings.RAW_FRAMES, bool)), "RAW_FRAMES must be a boolean."
+    assert (isinstance(settings.AGGREGATOR_WORKERS, int) and settings.AGGREGATOR_WORKERS >= 0), "AGGREGATOR_WORKERS must be a non-negative integer."
+    assert (isinstance(settings.WS_BACKOFF_MIN, (int, float)) and settings.WS_BACKOFF_MIN > 0), "WS_BACKOFF_MIN must be a positive number."
+    assert (isinstance(settings.WS_BACKOFF_MAX, (int, float)) and settings.WS_BACKOFF_MAX >= settings.WS_BACKOFF_MIN), "WS_BACKOFF_MAX must be a number >= WS_BACKOFF_MIN."
+    assert (isinstance(settings.WS_STALE_TIMEOUT, (int, float)) and settings.WS_STALE_TIMEOUT >= 0), "WS_STALE_TIMEOUT must be a number >= 0."
+    assert (isinstance(settings.METRICS_ENABLED, bool)), "METRICS_ENABLED must be a boolean."
+    assert (isinstance(settings.METRICS_IP, str)), "METRICS_IP must be a string."
+    assert (isinstance(settings.METRICS_PORT, int) and 0 < settings.METRICS_PORT < 65536), "METRICS_PORT must be a valid port number."
+    assert (isinstance(settings.QUEUE_MAX_SIZE, int) and settings.QUEUE_MAX_SIZE >= 0), "QUEUE_MAX_SIZE must be an integer >= 0."
+    assert (settings.QUEUE_OVERFLOW_POLICY in ('block', 'drop_oldest', 'drop_by_type')), "QUEUE_OVERFLOW_POLICY must be 'block', 'drop_oldest', or 'drop_by_type'."
+    assert (isinstance(settings.CONSENSUS_WINDOW, int) and settings.CONSENSUS_WINDOW >= 0), "CONSENSUS_WINDOW must be an integer >= 0."
+    assert (isinstance(settings.MISSED_VALIDATIONS, bool)), "MISSED_VALIDATIONS must be a boolean."
+    assert (not settings.MISSED_VALIDATIONS or settings.CONSENSUS_WINDOW > 0), "MISSED_VALIDATIONS requires CONSENSUS_WINDOW > 0."
+    assert (isinstance(settings.MISSED_VALIDATION_GRACE, (int, float)) and settings.MISSED_VALIDATION_GRACE >= 0), "MISSED_VALIDATION_GRACE must be a number >= 0."
+    assert (isinstance(settings.MISSED_VALIDATION_KEYS, list)), "MISSED_VALIDATION_KEYS must be a list."
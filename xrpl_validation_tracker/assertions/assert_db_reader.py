@@ -0,0 +1,15 @@
+def check_db_reader_settings(settings):
+    '''
+    Ensure the proper settings are available to run the db_reader module.
+
+    :param settings: Configuration file
+    '''
+    assert (isinstance(settings.DATABASE_LOCATION, str)), "DATABASE_LOCATION must be a string."
+    assert (isinstance(settings.DB_READER_THREADS, int) and settings.DB_READER_THREADS > 0), "DB_READER_THREADS must be a positive integer."
+    assert (isinstance(settings.SERVER_IP, str)), "SERVER_IP must be a string."
+    assert (isinstance(settings.SERVER_PORT, int) and 0 < settings.SERVER_PORT < 65536), "SERVER_PORT must be a valid port number."
+    assert (isinstance(settings.CACHE_TTL, (int, float)) and settings.CACHE_TTL >= 0), "CACHE_TTL must be a number >= 0."
+    assert (isinstance(settings.CACHE_MAX_ENTRIES, int) and settings.CACHE_MAX_ENTRIES > 0), "CACHE_MAX_ENTRIES must be a positive integer."
+    assert (isinstance(settings.METRICS_ENABLED, bool)), "METRICS_ENABLED must be a boolean."
+    assert (isinstance(settings.METRICS_IP, str)), "METRICS_IP must be a string."
+    assert (isinstance(settings.METRICS_PORT, int) and 0 < settings.METRICS_PORT < 65536), "METRICS_PORT must be a valid port number."
@@ -7,3 +7,27 @@ def check_db_writer_settings(settings):
     for i in settings.URLS:
         assert (isinstance(i['ssl_verify'], bool)), "ssl_verify type must be a boolean."
         assert (isinstance(i['url'], str)), "URLs must be strings."
+    assert (isinstance(settings.DB_BATCH_SIZE, int) and settings.DB_BATCH_SIZE > 0), "DB_BATCH_SIZE must be a positive integer."
+    assert (isinstance(settings.DB_BATCH_LATENCY, (int, float)) and settings.DB_BATCH_LATENCY >= 0), "DB_BATCH_LATENCY must be a number >= 0."
+    assert (isinstance(settings.LEDGER_ID_CACHE_SIZE, int) and settings.LEDGER_ID_CACHE_SIZE > 0), "LEDGER_ID_CACHE_SIZE must be a positive integer."
+    assert (isinstance(settings.AGGREGATE_LEDGER_WINDOW, int) and settings.AGGREGATE_LEDGER_WINDOW > 0), "AGGREGATE_LEDGER_WINDOW must be a positive integer."
+    assert (isinstance(settings.DB_WRITER_QUEUE_SIZE, int) and settings.DB_WRITER_QUEUE_SIZE > 0), "DB_WRITER_QUEUE_SIZE must be a positive integer."
+    assert (settings.DB_SYNCHRONOUS in ('OFF', 'NORMAL', 'FULL')), "DB_SYNCHRONOUS must be 'OFF', 'NORMAL', or 'FULL'."
+    assert (isinstance(settings.DB_CACHE_SIZE, int) and settings.DB_CACHE_SIZE > 0), "DB_CACHE_SIZE must be a positive integer."
+    assert (isinstance(settings.DB_MMAP_SIZE, int) and settings.DB_MMAP_SIZE >= 0), "DB_MMAP_SIZE must be an integer >= 0."
+    assert (settings.DB_BACKEND in ('sqlite', 'postgresql')), "DB_BACKEND must be 'sqlite' or 'postgresql'."
+    assert (isinstance(settings.POSTGRES_POOL_SIZE, int) and settings.POSTGRES_POOL_SIZE > 0), "POSTGRES_POOL_SIZE must be a positive integer."
+    assert (isinstance(settings.PARTITION_LEDGERS, int) and settings.PARTITION_LEDGERS >= 0), "PARTITION_LEDGERS must be an integer >= 0."
+    assert (isinstance(settings.PARTITIONS_HOT, int) and 0 < settings.PARTITIONS_HOT <= 8), "PARTITIONS_HOT must be an integer from 1 to 8."
+    assert (isinstance(settings.ARCHIVE_COLD_PARTITIONS, bool)), "ARCHIVE_COLD_PARTITIONS must be a boolean."
+    assert (isinstance(settings.WS_BACKOFF_MIN, (int, float)) and settings.WS_BACKOFF_MIN > 0), "WS_BACKOFF_MIN must be a positive number."
+    assert (isinstance(settings.WS_BACKOFF_MAX, (int, float)) and settings.WS_BACKOFF_MAX >= settings.WS_BACKOFF_MIN), "WS_BACKOFF_MAX must be a number >= WS_BACKOFF_MIN."
+    assert (isinstance(settings.WS_STALE_TIMEOUT, (int, float)) and settings.WS_STALE_TIMEOUT >= 0), "WS_STALE_TIMEOUT must be a number >= 0."
+    assert (isinstance(settings.METRICS_ENABLED, bool)), "METRICS_ENABLED must be a boolean."
+    assert (isinstance(settings.METRICS_IP, str)), "METRICS_IP must be a string."
+    assert (isinstance(settings.METRICS_PORT, int) and 0 < settings.METRICS_PORT < 65536), "METRICS_PORT must be a valid port number."
+    assert (isinstance(settings.QUEUE_MAX_SIZE, int) and settings.QUEUE_MAX_SIZE >= 0), "QUEUE_MAX_SIZE must be an integer >= 0."
+    assert (settings.QUEUE_OVERFLOW_POLICY in ('block', 'drop_oldest', 'drop_by_type')), "QUEUE_OVERFLOW_POLICY must be 'block', 'drop_oldest', or 'drop_by_type'."
+    assert (isinstance(settings.KEY_EVENTS_ENABLED, bool)), "KEY_EVENTS_ENABLED must be a boolean."
+    assert (isinstance(settings.KEY_EVENTS_IP, str)), "KEY_EVENTS_IP must be a string."
+    assert (isinstance(settings.KEY_EVENTS_PORT, int) and 0 < settings.KEY_EVENTS_PORT < 65536), "KEY_EVENTS_PORT must be a valid port number."
@@ -5,5 +5,29 @@ Check the assertions for supplemental_settings.
 def check_supplemental(settings):
     '''
     Check assertions for supplemental_settings.
+
+    :param settings: Configuration file
     '''
-    pass
+    assert (settings.DB_BACKEND in ('sqlite', 'postgresql')), "DB_BACKEND must be 'sqlite' or 'postgresql'."
+    assert (isinstance(settings.POSTGRES_POOL_SIZE, int) and settings.POSTGRES_POOL_SIZE > 0), "POSTGRES_POOL_SIZE must be a positive integer."
+    assert (isinstance(settings.METRICS_ENABLED, bool)), "METRICS_ENABLED must be a boolean."
+    assert (isinstance(settings.METRICS_IP, str)), "METRICS_IP must be a string."
+    assert (isinstance(settings.METRICS_PORT, int) and 0 < settings.METRICS_PORT < 65536), "METRICS_PORT must be a valid port number."
+    assert (isinstance(settings.HTTP_TIMEOUT, (int, float)) and settings.HTTP_TIMEOUT > 0), "HTTP_TIMEOUT must be a positive number."
+    assert (isinstance(settings.HTTP_CONNECTIONS, int) and settings.HTTP_CONNECTIONS > 0), "HTTP_CONNECTIONS must be a positive integer."
+    assert (isinstance(settings.HTTP_CONNECTIONS_PER_HOST, int) and settings.HTTP_CONNECTIONS_PER_HOST >= 0), "HTTP_CONNECTIONS_PER_HOST must be an integer >= 0."
+    assert (isinstance(settings.DNS_CACHE_SECONDS, (int, float)) and settings.DNS_CACHE_SECONDS >= 0), "DNS_CACHE_SECONDS must be a number >= 0."
+    assert (isinstance(settings.MAX_CONCURRENT_LOOKUPS, int) and settings.MAX_CONCURRENT_LOOKUPS > 0), "MAX_CONCURRENT_LOOKUPS must be a positive integer."
+    assert (settings.MANIFEST_QUERY_WS), "MANIFEST_QUERY_WS must list at least one server."
+    assert (isinstance(settings.SLEEP_CYCLE, (int, float)) and settings.SLEEP_CYCLE > 0), "SLEEP_CYCLE must be a positive number."
+    assert (isinstance(settings.NEW_KEY_INTERVAL, (int, float)) and settings.NEW_KEY_INTERVAL > 0), "NEW_KEY_INTERVAL must be a positive number."
+    assert (isinstance(settings.TOML_TTL, (int, float)) and settings.TOML_TTL >= 0), "TOML_TTL must be a number >= 0."
+    assert (isinstance(settings.KEY_MAX_AGE, (int, float)) and settings.KEY_MAX_AGE > 0), "KEY_MAX_AGE must be a positive number."
+    assert (isinstance(settings.KEY_EVENTS_ENABLED, bool)), "KEY_EVENTS_ENABLED must be a boolean."
+    assert (isinstance(settings.KEY_EVENTS_IP, str)), "KEY_EVENTS_IP must be a string."
+    assert (isinstance(settings.KEY_EVENTS_PORT, int) and 0 < settings.KEY_EVENTS_PORT < 65536), "KEY_EVENTS_PORT must be a valid port number."
+    assert (isinstance(settings.KEY_EVENT_DELAY, (int, float)) and settings.KEY_EVENT_DELAY >= 0), "KEY_EVENT_DELAY must be a number >= 0."
+    assert (isinstance(settings.MANIFESTS_FROM_DB, bool)), "MANIFESTS_FROM_DB must be a boolean."
+    assert (isinstance(settings.VERIFY_SIGNATURES, bool)), "VERIFY_SIGNATURES must be a boolean."
+    assert (isinstance(settings.VERIFY_PROCESSES, int) and settings.VERIFY_PROCESSES > 0), "VERIFY_PROCESSES must be a positive integer."
+    assert (isinstance(settings.VERIFIED_CACHE_SIZE, int) and settings.VERIFIED_CACHE_SIZE > 0), "VERIFIED_CACHE_SIZE must be a positive integer."
@@ -0,0 +1,55 @@
+'''
+Replay a validation stream into a fresh database at several batch sizes.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.bench_db_writer [recording.jsonl]`
+'''
+import os
+import sys
+import tempfile
+import time
+
+from db_writer.id_cache import IdCache
+from db_writer.sqlite_connection import create_db_connection
+from db_writer.sqlite_writer import write_batch
+from .stream import decoded, load_stream, synthetic_stream
+
+BATCH_SIZES = [1, 10, 100, 1000]
+LEDGERS = 300
+VALIDATORS = 35
+
+def replay(messages, batch_size, cache=None):
+    '''
+    Write messages into a new database.
+
+    :param list messages: Stream to replay
+    :param int batch_size: Number of messages per transaction
+    :param IdCache cache: Optional cache of known ids
+    :returns: Messages per second
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        connection = create_db_connection(os.path.join(directory, 'bench.sqlite3'))
+        time_start = time.perf_counter()
+        for i in range(0, len(messages), batch_size):
+            write_batch(messages[i:i + batch_size], connection, cache)
+        elapsed = time.perf_counter() - time_start
+        connection.close()
+    return len(messages) / elapsed
+
+def main():
+    '''
+    Print throughput for each batch size.
+    '''
+    if len(sys.argv) > 1:
+        messages = load_stream(sys.argv[1])
+    else:
+        messages = synthetic_stream(LEDGERS, VALIDATORS)
+    messages = decoded(messages)
+    print(f"Replaying {len(messages)} messages.")
+    for batch_size in BATCH_SIZES:
+        rate = replay(messages, batch_size)
+        rate_cached = replay(messages, batch_size, IdCache(2000))
+        print(f"Batch size {batch_size:>5}: {rate:,.0f} messages/sec, {rate_cached:,.0f} messages/sec with the id cache")
+
+if __name__ == '__main__':
+    main()
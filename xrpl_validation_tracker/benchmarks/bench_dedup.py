@@ -0,0 +1,69 @@
+'''
+Micro-benchmark for the DataProcessor duplicate message filter.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.bench_dedup`
+'''
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+from aggregator.process_data import DataProcessor
+
+TRACKED_KEYS = [10000, 100000, 1000000]
+UNIQUE_MESSAGES = 50000
+COPIES_PER_MESSAGE = 5 # Number of upstream nodes relaying each validation
+
+class NullQueue:
+    '''
+    Stand-in for queue_send that discards messages.
+    '''
+    async def put(self, message):
+        pass
+
+def make_messages(count, copies):
+    '''
+    Build validation messages, each repeated as if received from several nodes.
+
+    :param int count: Number of unique messages
+    :param int copies: Number of times each message is received
+    '''
+    messages = []
+    for _ in range(count):
+        # Signatures are converted to bytes when messages are received.
+        message = {'type': 'validationReceived', 'signature': os.urandom(72)}
+        messages.extend([message] * copies)
+    return messages
+
+async def run(tracked_keys, messages):
+    '''
+    Time how long a DataProcessor takes to filter messages once its tracking
+    cache is full.
+
+    :param int tracked_keys: SENT_MESSAGES_MAX_LENGTH
+    :param list messages: Messages to filter
+    :returns: Messages per second
+    '''
+    settings = SimpleNamespace(SENT_MESSAGES_MAX_LENGTH=tracked_keys)
+    processor = DataProcessor(None, NullQueue(), settings)
+    for i in range(tracked_keys):
+        processor.sent_message_tracking.add(i)
+
+    time_start = time.perf_counter()
+    for message in messages:
+        await processor.send_outgoing_messages(message)
+    return len(messages) / (time.perf_counter() - time_start)
+
+def main():
+    '''
+    Print throughput for each cache size.
+    '''
+    messages = make_messages(UNIQUE_MESSAGES, COPIES_PER_MESSAGE)
+    print(f"{len(messages)} messages, {UNIQUE_MESSAGES} unique.")
+    for tracked_keys in TRACKED_KEYS:
+        rate = asyncio.get_event_loop().run_until_complete(run(tracked_keys, messages))
+        print(f"{tracked_keys:>9} tracked keys: {rate:,.0f} messages/sec")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+'''
+Measure the memory used per dedup cache entry and the database space used per stored
+validation, with hashes and signatures as hex strings and as bytes.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.bench_encoding [recording.jsonl]`
+'''
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from aggregator.dedup import DedupCache
+from db_writer.sqlite_connection import create_db_connection
+from db_writer.sqlite_writer import write_batch
+from .stream import decoded, load_stream, synthetic_stream
+
+LEDGERS = 2000
+VALIDATORS = 35
+BATCH_SIZE = 1000
+
+def dedup_entry_size(keys, copy):
+    '''
+    :param list keys: Keys to add to a DedupCache
+    :param copy: Function returning a new copy of a key, so the keys' memory is traced
+    :returns: Bytes allocated per cached key, including the key
+    :rtype: float
+    '''
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keys = [copy(key) for key in keys]
+    cache = DedupCache(len(keys))
+    for key in keys:
+        cache.add(key)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(keys)
+
+def validation_size(messages):
+    '''
+    :param list messages: Stream to write into a new database
+    :returns: Database bytes per stored validation
+    :rtype: float
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        location = os.path.join(directory, 'bench.sqlite3')
+        connection = create_db_connection(location)
+        for i in range(0, len(messages), BATCH_SIZE):
+            write_batch(messages[i:i + BATCH_SIZE], connection)
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        connection.execute("VACUUM;")
+        count = connection.execute("SELECT Count(*) FROM validation_stream;").fetchone()[0]
+        connection.close()
+        return os.path.getsize(location) / count
+
+def main():
+    '''
+    Print sizes for both encodings.
+    '''
+    if len(sys.argv) > 1:
+        messages = load_stream(sys.argv[1])
+    else:
+        messages = synthetic_stream(LEDGERS, VALIDATORS)
+    messages_binary = decoded(messages)
+
+    signatures_hex = [i['signature'] for i in messages if 'signature' in i]
+    signatures_binary = [i['signature'] for i in messages_binary if 'signature' in i]
+    size_hex = dedup_entry_size(signatures_hex, lambda key: key.encode().decode())
+    size_binary = dedup_entry_size(signatures_binary, lambda key: bytes(bytearray(key)))
+    print(f"Dedup cache entry: {size_hex:.0f} bytes as hex, {size_binary:.0f} bytes as binary")
+    print(f"Stored validation: {validation_size(messages):.1f} bytes as hex, "
+          f"{validation_size(messages_binary):.1f} bytes as binary")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Compare the aggregator's throughput when it decodes and re-encodes every message with
+forwarding raw frames. Each message is received once from each of several nodes, as
+when the aggregator subscribes to multiple servers.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.bench_frames [recording.jsonl]`
+'''
+import json
+import sys
+import time
+
+from aggregator.dedup import DedupCache
+from ws_client.encoding import decode_message, encode_message
+from ws_client.frame_scan import scan_frame, strip_node_specific_fields
+from .stream import load_stream, synthetic_stream
+
+LEDGERS = 2000
+VALIDATORS = 35
+NODES = 5
+UNIQUE_KEYS = {'validationReceived': 'signature', 'ledgerClosed': 'ledger_hash'}
+
+def decoded_path(frames, cache_size):
+    '''
+    Decode, deduplicate, and re-encode frames, as the aggregator does without RAW_FRAMES.
+
+    :param list frames: JSON text of each received message
+    :param int cache_size: Dedup cache size
+    :returns: Frames to send to clients
+    :rtype: list
+    '''
+    cache = DedupCache(cache_size)
+    outgoing = []
+    for frame in frames:
+        message = decode_message(json.loads(frame))
+        if message.get('type') == 'ledgerClosed':
+            message.pop('validated_ledgers', None)
+        unique_key = UNIQUE_KEYS.get(message.get('type'))
+        if unique_key and cache.add(message[unique_key]):
+            outgoing.append(json.dumps(encode_message(message)))
+    return outgoing
+
+def raw_path(frames, cache_size):
+    '''
+    Scan and deduplicate frames, forwarding them as received.
+
+    :param list frames: JSON text of each received message
+    :param int cache_size: Dedup cache size
+    :returns: Frames to send to clients
+    :rtype: list
+    '''
+    cache = DedupCache(cache_size)
+    outgoing = []
+    for frame in frames:
+        message = scan_frame(frame)
+        if message.type in UNIQUE_KEYS and message.key is not None and cache.add(message.key):
+            outgoing.append(strip_node_specific_fields(message).frame)
+    return outgoing
+
+def main():
+    '''
+    Print messages/sec for both paths.
+    '''
+    if len(sys.argv) > 1:
+        messages = load_stream(sys.argv[1])
+    else:
+        messages = synthetic_stream(LEDGERS, VALIDATORS)
+    frames = [json.dumps(message) for message in messages for _ in range(NODES)]
+
+    for name, path in (('decode/re-encode', decoded_path), ('raw frames', raw_path)):
+        start = time.perf_counter()
+        outgoing = path(frames, len(messages))
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(frames) / elapsed:,.0f} messages/sec, {len(outgoing)} forwarded")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+'''
+Drive the aggregator, db_writer, and duplicate filter end to end with a replayed stream,
+reporting messages/sec, p50 and p99 latency, and peak memory use.
+
+Each stream is replayed from several fake rippled servers (benchmarks.replay_server), so
+every message is received once per node. The aggregator and db_writer run in their own
+processes with their normal settings, pointed at the replay servers.
+
+    * aggregator: latency is the time from a replay server sending a message until a
+      client of the aggregator receives it.
+    * db_writer: latency is the time from a replay server sending a validation until its
+      row is committed, as seen by polling the database every POLL_INTERVAL.
+    * dedup: the aggregator's frame scan and duplicate filter, run in this process.
+      Latency is the time to process each message.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.bench_pipeline [recording] --nodes 5 --speed 0`
+'''
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sqlite3
+import tempfile
+import time
+import types
+
+import websockets
+
+from aggregator.dedup import DedupCache
+from ws_client.frame_scan import scan_frame, strip_node_specific_fields
+from .recording import read_recording, synthetic_recording
+from .replay_server import start_replay_servers
+
+HOST = '127.0.0.1'
+REPLAY_PORT = 16006
+AGGREGATOR_PORT = 16100
+IDLE_TIMEOUT = 10 # Seconds without progress before a stage is considered finished
+POLL_INTERVAL = 0.01 # Seconds between checks for newly committed validations
+STAGES = ('aggregator', 'db_writer', 'dedup')
+
+def module_settings(settings_name, overrides):
+    '''
+    :param str settings_name: Settings module to start from
+    :param dict overrides: Settings to replace
+    :returns: Copy of the settings module with the overrides applied
+    '''
+    settings = types.SimpleNamespace(**vars(importlib.import_module(settings_name)))
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    return settings
+
+def run_module(settings_name, tasks_name, overrides):
+    '''
+    Process entry point: run a module's asyncio tasks with modified settings.
+
+    :param str settings_name: Settings module to start from
+    :param str tasks_name: Module with the spawn_workers coroutine
+    :param dict overrides: Settings to replace
+    '''
+    logging.basicConfig(level=logging.CRITICAL)
+    settings = module_settings(settings_name, overrides)
+    spawn_workers = importlib.import_module(tasks_name).spawn_workers
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(spawn_workers(settings))
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+def start_module(settings_name, tasks_name, overrides):
+    '''
+    :returns: The process running the module
+    :rtype: multiprocessing.Process
+    '''
+    process = multiprocessing.get_context('fork').Process(
+        target=run_module, args=(settings_name, tasks_name, overrides), daemon=True
+    )
+    process.start()
+    return process
+
+def peak_rss(pid=None):
+    '''
+    :param int pid: Process to measure, or None for this process
+    :returns: Peak resident memory in bytes
+    :rtype: int
+    '''
+    if pid:
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def percentile(values, fraction):
+    '''
+    :param list values: Measurements
+    :param float fraction: Percentile as a fraction, for example 0.99
+    :returns: The value at the percentile, or None if there are no values
+    '''
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))]
+
+async def wait_for_subscribers(replay_servers, timeout=30):
+    '''
+    Wait until every replay server has a subscriber.
+
+    :param list replay_servers: ReplayServers
+    :param float timeout: Seconds to wait
+    '''
+    deadline = time.monotonic() + timeout
+    while any(server.subscribed < 1 for server in replay_servers):
+        if time.monotonic() > deadline:
+            raise TimeoutError("The module didn't connect to every replay server.")
+        await asyncio.sleep(0.05)
+
+async def connect(url, timeout=30):
+    '''
+    Connect to a websocket server, retrying until it is listening.
+
+    :param str url: Server address
+    :param float timeout: Seconds to keep trying
+    '''
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await websockets.connect(url, max_size=None)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+async def bench_aggregator(frames, nodes, speed):
+    '''
+    :param list frames: (offset, frame) tuples to replay
+    :param int nodes: Number of replay servers
+    :param float speed: Replay speed multiplier
+    :returns: Messages/sec, latencies in seconds, and peak RSS of the aggregator
+    :rtype: tuple
+    '''
+    expected = len({scan_frame(frame).key for _, frame in frames} - {None})
+    sent = {}
+
+    def on_send(frame):
+        key = scan_frame(frame).key
+        if key is not None and key not in sent:
+            sent[key] = time.perf_counter()
+
+    start = asyncio.Event()
+    replay_servers, ws_servers = await start_replay_servers(
+        frames, nodes, HOST, REPLAY_PORT, speed, start, on_send
+    )
+    process = start_module('settings_aggregator', 'aggregator.asyncio_tasks', {
+        'URLS': [{'url': f"ws://{HOST}:{REPLAY_PORT + i}", 'ssl_verify': False} for i in range(nodes)],
+        'SERVER_IP': HOST,
+        'SERVER_PORT': AGGREGATOR_PORT,
+        'AGGREGATOR_WORKERS': 0,
+        'METRICS_ENABLED': False,
+        'WS_STALE_TIMEOUT': 0,
+        'WS_CLIENT_BUFFER_SIZE': len(frames),
+    })
+    received = {}
+    try:
+        await wait_for_subscribers(replay_servers)
+        client = await connect(f"ws://{HOST}:{AGGREGATOR_PORT}")
+        time_start = time.perf_counter()
+        start.set()
+        while len(received) < expected:
+            try:
+                frame = await asyncio.wait_for(client.recv(), IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                break
+            received.setdefault(scan_frame(frame).key, time.perf_counter())
+        elapsed = max(received.values(), default=time_start) - time_start
+        await client.close()
+        rss = peak_rss(process.pid)
+    finally:
+        process.terminate()
+        for server in ws_servers:
+            server.close()
+    latencies = [received[key] - sent[key] for key in received if key in sent]
+    return nodes * len(frames) / elapsed if elapsed else 0, latencies, rss
+
+def committed_validations(location):
+    '''
+    :param str location: Database location
+    :returns: (ledger_hash, ephemeral_key) of each committed validation
+    :rtype: list
+    '''
+    connection = sqlite3.connect(location)
+    try:
+        return connection.execute(
+            '''SELECT ledgers.hash, ephemeral_keys.ephemeral_key
+            FROM validation_stream AS v
+            JOIN ledgers ON ledgers.rowid = v.ledger_hash
+            JOIN ephemeral_keys ON ephemeral_keys.rowid = v.ephemeral_key'''
+        ).fetchall()
+    finally:
+        connection.close()
+
+async def bench_db_writer(frames, nodes, speed):
+    '''
+    :param list frames: (offset, frame) tuples to replay
+    :param int nodes: Number of replay servers
+    :param float speed: Replay speed multiplier
+    :returns: Messages/sec, latencies in seconds, and peak RSS of the db_writer
+    :rtype: tuple
+    '''
+    expected = len({
+        message.key for message in (scan_frame(frame) for _, frame in frames)
+        if message.type == 'validationReceived'
+    } - {None})
+    sent = {}
+
+    def on_send(frame):
+        if scan_frame(frame).type != 'validationReceived':
+            return
+        message = json.loads(frame)
+        key = (bytes.fromhex(message['ledger_hash']), message['validation_public_key'])
+        if key not in sent:
+            sent[key] = time.perf_counter()
+
+    start = asyncio.Event()
+    replay_servers, ws_servers = await start_replay_servers(
+        frames, nodes, HOST, REPLAY_PORT, speed, start, on_send
+    )
+    committed = {}
+    with tempfile.TemporaryDirectory() as directory:
+        location = os.path.join(directory, 'bench.sqlite3')
+        process = start_module('settings_db_writer', 'db_writer.db_asyncio_tasks', {
+            'URLS': [{'url': f"ws://{HOST}:{REPLAY_PORT + i}", 'ssl_verify': False} for i in range(nodes)],
+            'DB_BACKEND': 'sqlite',
+            'DATABASE_LOCATION': location,
+            'PARTITION_LEDGERS': 0,
+            'METRICS_ENABLED': False,
+            'WS_STALE_TIMEOUT': 0,
+        })
+        try:
+            await wait_for_subscribers(replay_servers)
+            time_start = time.perf_counter()
+            start.set()
+            time_progress = time_start
+            while len(committed) < expected and time.perf_counter() - time_progress < IDLE_TIMEOUT:
+                await asyncio.sleep(POLL_INTERVAL)
+                try:
+                    rows = committed_validations(location)
+                except sqlite3.Error:
+                    continue
+                now = time.perf_counter()
+                for row in rows:
+                    if row not in committed:
+                        committed[row] = now
+                        time_progress = now
+            elapsed = time_progress - time_start
+            rss = peak_rss(process.pid)
+        finally:
+            process.terminate()
+            for server in ws_servers:
+                server.close()
+    latencies = [committed[key] - sent[key] for key in committed if key in sent]
+    return nodes * len(frames) / elapsed if elapsed else 0, latencies, rss
+
+def bench_dedup(frames, nodes):
+    '''
+    :param list frames: (offset, frame) tuples to replay
+    :param int nodes: Number of times each frame is received
+    :returns: Messages/sec, latencies in seconds, and peak RSS of this process
+    :rtype: tuple
+    '''
+    cache = DedupCache(len(frames))
+    latencies = []
+    time_start = time.perf_counter()
+    for _, frame in frames:
+        for _ in range(nodes):
+            message_start = time.perf_counter()
+            message = scan_frame(frame)
+            if message.key is not None and cache.add(message.key):
+                strip_node_specific_fields(message)
+            latencies.append(time.perf_counter() - message_start)
+    elapsed = time.perf_counter() - time_start
+    return nodes * len(frames) / elapsed, latencies, peak_rss()
+
+def report(stage, rate, p50, p99, rss):
+    '''
+    Print one stage's results.
+    '''
+    p50 = f"{p50 * 1000:.3f} ms" if p50 is not None else "n/a"
+    p99 = f"{p99 * 1000:.3f} ms" if p99 is not None else "n/a"
+    print(f"{stage}: {rate:,.0f} messages/sec, p50 {p50}, p99 {p99}, peak RSS {rss / 2 ** 20:.0f} MiB")
+
+def main():
+    '''
+    Parse arguments and run each stage.
+    '''
+    parser = argparse.ArgumentParser(description="Benchmark the tracker with a replayed stream.")
+    parser.add_argument("recording", nargs='?', help="Recording to replay. A stream is generated if omitted.")
+    parser.add_argument("--nodes", type=int, default=5, help="Number of replay servers.")
+    parser.add_argument("--speed", type=float, default=0, help="Replay speed multiplier. 0 replays as fast as possible.")
+    parser.add_argument("--ledgers", type=int, default=300, help="Ledgers to generate if no recording is given.")
+    parser.add_argument("--validators", type=int, default=35, help="Validators to generate if no recording is given.")
+    parser.add_argument("--stages", default=','.join(STAGES), help="Comma separated stages to run.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    if args.recording:
+        frames = read_recording(args.recording)
+    else:
+        frames = synthetic_recording(args.ledgers, args.validators)
+    print(f"Replaying: {len(frames)} frames from: {args.nodes} nodes at speed: {args.speed or 'max'}.")
+
+    loop = asyncio.get_event_loop()
+    stages = args.stages.split(',')
+    if 'aggregator' in stages:
+        rate, latencies, rss = loop.run_until_complete(bench_aggregator(frames, args.nodes, args.speed))
+        report('aggregator', rate, percentile(latencies, 0.5), percentile(latencies, 0.99), rss)
+    if 'db_writer' in stages:
+        rate, latencies, rss = loop.run_until_complete(bench_db_writer(frames, args.nodes, args.speed))
+        report('db_writer', rate, percentile(latencies, 0.5), percentile(latencies, 0.99), rss)
+    if 'dedup' in stages:
+        rate, latencies, rss = bench_dedup(frames, args.nodes)
+        report('dedup', rate, percentile(latencies, 0.5), percentile(latencies, 0.99), rss)
+
+if __name__ == '__main__':
+    main()
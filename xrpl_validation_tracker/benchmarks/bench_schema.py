@@ -0,0 +1,152 @@
+'''
+Compare the original (version 0) database schema with the current schema: insert rate
+and typical queries, before and after migrating.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.bench_schema [recording.jsonl]`
+'''
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from db_writer.sqlite_connection import create_db_connection
+from db_writer.sqlite_writer import RIPPLED_TIME_OFFSET, write_batch
+from .stream import decoded, load_stream, synthetic_stream
+
+LEDGERS = 3000
+VALIDATORS = 35
+BATCH_SIZE = 1000
+QUERY_REPEATS = 20
+
+# Tables used by the version 0 schema. Tables that didn't change are created by
+# create_db_connection when the database is migrated.
+SCHEMA_V0 = (
+    """CREATE TABLE validation_stream (
+        id TEXT PRIMARY KEY UNIQUE,
+        ledger_hash TEXT NOT NULL,
+        ephemeral_key TEXT NOT NULL,
+        master_key TEXT NOT NULL,
+        signing_time INT NOT NULL,
+        partial_validation BOOLEAN NOT NULL
+    );""",
+    "CREATE TABLE ephemeral_keys (ephemeral_key TEXT PRIMARY KEY UNIQUE, master_key INT);",
+    """CREATE TABLE master_keys (
+        master_key TEXT PRIMARY KEY UNIQUE, domain TEXT, dunl BOOLEAN, network TEXT,
+        server_country TEXT, owner_country TEXT, toml_verified BOOLEAN
+    );""",
+    """CREATE TABLE ledgers (
+        hash TEXT PRIMARY KEY UNIQUE, sequence INT NOT NULL, signing_time INT, txn_count INT,
+        fee_base INT, fee_ref INT, reserve_base INT, reserve_inc INT, chain TEXT
+    );""",
+)
+
+QUERIES = {
+    'validation count': "SELECT Count(*) FROM validation_stream;",
+    'ledger by sequence': "SELECT txn_count FROM ledgers WHERE sequence IS ?;",
+    'validations by master key': "SELECT Count(*) FROM validation_stream WHERE master_key = ?;",
+    'validations in the last hour': "SELECT Count(*) FROM validation_stream WHERE signing_time > ?;",
+}
+
+def write_v0(messages, connection):
+    '''
+    Write messages the way the version 0 db_writer did: one row and one commit at a time.
+
+    :param list messages: Stream to write
+    :param connection: Connection to a version 0 database
+    '''
+    def get_id(table, column, value, extra=()):
+        row = connection.execute(f"SELECT rowid FROM {table} WHERE {column}=?", (value,)).fetchone()
+        if row:
+            return row[0]
+        columns = ','.join((column,) + tuple(i[0] for i in extra))
+        cursor = connection.execute(
+            f"INSERT INTO {table}({columns}) VALUES({','.join('?' * (len(extra) + 1))})",
+            (value,) + tuple(i[1] for i in extra)
+        )
+        connection.commit()
+        return cursor.lastrowid
+
+    for message in messages:
+        if message['type'] != 'validationReceived':
+            continue
+        ledger_id = get_id('ledgers', 'hash', message['ledger_hash'], (
+            ('sequence', message['ledger_index']), ('signing_time', message['signing_time'])
+        ))
+        ephemeral_key_id = get_id('ephemeral_keys', 'ephemeral_key', message['validation_public_key'])
+        master_key_id = get_id('master_keys', 'master_key', message['master_key'])
+        identifier = str(ephemeral_key_id) + '+' + str(ledger_id)
+        if not connection.execute("SELECT rowid FROM validation_stream WHERE id=?", (identifier,)).fetchall():
+            connection.execute(
+                "INSERT INTO validation_stream VALUES(?,?,?,?,?,?)",
+                (identifier, ledger_id, ephemeral_key_id, master_key_id,
+                 message['signing_time'] + RIPPLED_TIME_OFFSET, str(not message['full']))
+            )
+            connection.commit()
+
+def time_queries(connection, messages):
+    '''
+    :returns: Average milliseconds per query, keyed by query name
+    :rtype: dict
+    '''
+    last_time = max(i['signing_time'] for i in messages if 'signing_time' in i) + RIPPLED_TIME_OFFSET
+    parameters = {
+        'validation count': (),
+        'ledger by sequence': (messages[len(messages) // 2]['ledger_index'],),
+        'validations by master key': (3,),
+        'validations in the last hour': (last_time - 3600,),
+    }
+    results = {}
+    for name, query in QUERIES.items():
+        time_start = time.perf_counter()
+        for _ in range(QUERY_REPEATS):
+            connection.execute(query, parameters[name]).fetchall()
+        results[name] = (time.perf_counter() - time_start) * 1000 / QUERY_REPEATS
+    return results
+
+def main():
+    '''
+    Print insert rates, query times, and database sizes for both schemas.
+    '''
+    if len(sys.argv) > 1:
+        messages = load_stream(sys.argv[1])
+    else:
+        messages = synthetic_stream(LEDGERS, VALIDATORS)
+    print(f"Writing {len(messages)} messages.")
+
+    with tempfile.TemporaryDirectory() as directory:
+        location_v0 = os.path.join(directory, 'v0.sqlite3')
+        location = os.path.join(directory, 'current.sqlite3')
+
+        connection = sqlite3.connect(location_v0)
+        for table in SCHEMA_V0:
+            connection.execute(table)
+        time_start = time.perf_counter()
+        write_v0(messages, connection)
+        print(f"Version 0 schema: {len(messages) / (time.perf_counter() - time_start):,.0f} messages/sec")
+        queries_v0 = time_queries(connection, messages)
+        connection.close()
+        size_v0 = os.path.getsize(location_v0)
+
+        connection = create_db_connection(location)
+        messages_binary = decoded(messages)
+        time_start = time.perf_counter()
+        for i in range(0, len(messages_binary), BATCH_SIZE):
+            write_batch(messages_binary[i:i + BATCH_SIZE], connection)
+        print(f"Current schema: {len(messages) / (time.perf_counter() - time_start):,.0f} messages/sec")
+        queries = time_queries(connection, messages)
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        connection.close()
+        size = os.path.getsize(location)
+
+        time_start = time.perf_counter()
+        create_db_connection(location_v0).close()
+        print(f"Migrated the version 0 database in {time.perf_counter() - time_start:.2f} seconds.")
+
+        for name in QUERIES:
+            print(f"{name:>30}: {queries_v0[name]:8.3f} ms before, {queries[name]:8.3f} ms after")
+        print(f"{'database size':>30}: {size_v0:>8,} bytes before, {size:>8,} bytes after")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+'''
+Benchmark manifest signature verification: verifications/sec in the event loop's
+process, in the SignatureVerifier process pool, and for manifests that are already
+in its verified cache. Before timing, verify_signature is checked against signatures made
+by the XRP Ledger's reference key pair library, so the benchmark doesn't only check
+signatures from its own signers.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.bench_signatures`
+
+A published UNL saved from its publisher can be checked first, to confirm that manifests
+and blobs signed by rippled's tools are accepted:
+`curl -o vl.json https://vl.xrplf.org && python3 -m benchmarks.bench_signatures vl.json`
+'''
+import asyncio
+import base64
+import json
+import sys
+import time
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.asymmetric.utils import Prehashed
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+from aggregator.dedup import DedupCache
+from db_writer.manifests import (
+    MASTER_SIGNATURE,
+    PUBLIC_KEY,
+    SEQUENCE,
+    SIGNATURE,
+    SIGNING_PUB_KEY,
+    serialize_manifest,
+)
+from supplemental_data.signatures import (
+    MANIFEST_PREFIX,
+    SignatureVerifier,
+    sha512_half,
+    verify_manifest,
+    verify_signature,
+    verify_unl_blobs,
+)
+
+MANIFESTS = 2000 # Half signed with ed25519 keys, and half with secp256k1 keys
+PROCESS_COUNTS = (1, 2, 4)
+
+# (key type, public key, signature) of REFERENCE_MESSAGE, from the ripple-keypairs test fixtures
+REFERENCE_MESSAGE = b'test message'
+REFERENCE_SIGNATURES = (
+    (
+        'ed25519',
+        'ED01FA53FA5A7E77798F882ECE20B1ABC00BB358A9E55A202D0D0676BD0CE37A63',
+        'CB199E1BFD4E3DAA105E4832EEDFA36413E1F44205E4EFB9E27E826044C21E3E'
+        '2E848BBC8195E8959BADF887599B7310AD1B7047EF11B682E0D068F73749750E',
+    ),
+    (
+        'secp256k1',
+        '030D58EB48B4420B1F7B9DF55087E0E29FEF0E8468F9A6825B01CA2C361042D435',
+        '30440220583A91C95E54E6A651C47BEC22744E0B101E2C4060E7B08F6341657DAD9BC3EE'
+        '02207D1489C7395DB0188D3A56A977ECBA54B36FA9371B40319655B1B4429E33EF2D',
+    ),
+)
+
+class Ed25519Signer:
+    '''
+    Generated ed25519 key pair.
+    '''
+    def __init__(self):
+        self.key = Ed25519PrivateKey.generate()
+        self.public_key = b'\xed' + self.key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+
+    def sign(self, data):
+        return self.key.sign(data)
+
+class Secp256k1Signer:
+    '''
+    Generated secp256k1 key pair.
+    '''
+    def __init__(self):
+        self.key = ec.generate_private_key(ec.SECP256K1())
+        self.public_key = self.key.public_key().public_bytes(Encoding.X962, PublicFormat.CompressedPoint)
+
+    def sign(self, data):
+        return self.key.sign(sha512_half(data), ec.ECDSA(Prehashed(hashes.SHA256())))
+
+def check_reference_signatures():
+    '''
+    Check that verify_signature accepts the reference signatures, and rejects them for
+    any other message.
+    '''
+    for key_type, public_key, signature in REFERENCE_SIGNATURES:
+        public_key, signature = bytes.fromhex(public_key), bytes.fromhex(signature)
+        assert verify_signature(public_key, signature, REFERENCE_MESSAGE), f"Rejected the reference {key_type} signature"
+        assert not verify_signature(public_key, signature, REFERENCE_MESSAGE + b'.'), f"Accepted a {key_type} signature for the wrong message"
+
+def check_published_unl(path):
+    '''
+    Check that a published UNL's publisher manifest, blob signatures, and validator
+    manifests are all accepted.
+
+    :param str path: File holding the UNL, as served by its publisher
+    '''
+    with open(path) as unl_file:
+        unl = json.load(unl_file)
+    errors, validator_manifests = verify_unl_blobs(unl)
+    assert not errors, f"Rejected the published UNL: {', '.join(errors)}"
+    rejected = [i for i in validator_manifests if not verify_manifest(base64.b64decode(i))]
+    assert not rejected, f"Rejected: {len(rejected)} of: {len(validator_manifests)} validator manifests"
+    print(f"Published UNL verified, with: {len(validator_manifests)} validator manifests")
+
+def make_manifest(master, ephemeral, sequence):
+    '''
+    :param master: Master key signer
+    :param ephemeral: Ephemeral key signer
+    :param int sequence: Manifest sequence
+    :returns: Base64 encoded manifest
+    :rtype: str
+    '''
+    fields = {
+        SEQUENCE: sequence,
+        PUBLIC_KEY: master.public_key,
+        SIGNING_PUB_KEY: ephemeral.public_key,
+    }
+    data = MANIFEST_PREFIX + serialize_manifest(fields)
+    fields[SIGNATURE] = ephemeral.sign(data)
+    fields[MASTER_SIGNATURE] = master.sign(data)
+    return base64.b64encode(serialize_manifest(fields)).decode()
+
+def make_manifests(count):
+    '''
+    :param int count: Number of manifests
+    :rtype: list
+    '''
+    signers = (Ed25519Signer, Secp256k1Signer)
+    return [
+        make_manifest(signers[i % 2](), signers[i % 2](), i + 1)
+        for i in range(count)
+    ]
+
+async def pooled(manifests, processes):
+    '''
+    :param list manifests: Base64 encoded manifests
+    :param int processes: Number of worker processes
+    :returns: Seconds to verify the manifests, then to verify them again from the cache
+    :rtype: tuple
+    '''
+    verifier = SignatureVerifier(processes, len(manifests))
+    # Start the worker processes before timing.
+    await verifier.verify_manifests(manifests[:processes])
+    verifier.verified = DedupCache(len(manifests))
+    start = time.perf_counter()
+    results = await verifier.verify_manifests(manifests)
+    elapsed = time.perf_counter() - start
+    assert all(results)
+    start = time.perf_counter()
+    await verifier.verify_manifests(manifests)
+    cached = time.perf_counter() - start
+    verifier.close()
+    return elapsed, cached
+
+def main():
+    check_reference_signatures()
+    print(f"Reference signatures verified: {', '.join(i[0] for i in REFERENCE_SIGNATURES)}")
+    if len(sys.argv) > 1:
+        check_published_unl(sys.argv[1])
+    manifests = make_manifests(MANIFESTS)
+    start = time.perf_counter()
+    assert all(verify_manifest(base64.b64decode(i)) for i in manifests)
+    elapsed = time.perf_counter() - start
+    print(f"{MANIFESTS} manifests, 2 signatures each")
+    print(f"{'Mode':<24}{'Manifests/sec':>16}")
+    print(f"{'Event loop process':<24}{MANIFESTS / elapsed:>16,.0f}")
+    loop = asyncio.get_event_loop()
+    for processes in PROCESS_COUNTS:
+        elapsed, cached = loop.run_until_complete(pooled(manifests, processes))
+        print(f"{f'Pool, {processes} processes':<24}{MANIFESTS / elapsed:>16,.0f}")
+    print(f"{'Cached':<24}{MANIFESTS / cached:>16,.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+'''
+Compare the aggregator's throughput in a single process with sharding its connections
+across worker processes. Each node's stream is replayed from memory, so the results
+measure frame scanning, deduplication, and pipe transfer rather than network I/O.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.bench_workers [recording.jsonl]`
+'''
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from aggregator.dedup import DedupCache
+from aggregator.workers import FORWARD_BATCH_SIZE, prefilter
+from ws_client.frame_scan import scan_frame
+from .stream import load_stream, synthetic_stream
+
+LEDGERS = 2000
+VALIDATORS = 35
+NODES = 20
+WORKER_COUNTS = (1, 2, 4, 8)
+
+def replay_nodes(frames, node_count, connection, start):
+    '''
+    Worker process: scan and prefilter each node's frames, then send them to the main process.
+
+    :param list frames: JSON text of each message in the stream
+    :param int node_count: Number of nodes this worker is connected to
+    :param connection: Pipe to the main process
+    :param start: Event set when timing begins
+    '''
+    cache = DedupCache(len(frames))
+    start.wait()
+    # Interleave the nodes' streams, as messages arrive from each node at about the same time.
+    for i in range(0, len(frames), FORWARD_BATCH_SIZE):
+        messages = [
+            scan_frame(frame)
+            for frame in frames[i:i + FORWARD_BATCH_SIZE]
+            for _ in range(node_count)
+        ]
+        batch = prefilter(messages, cache)
+        if batch:
+            connection.send(batch)
+    connection.send(None)
+
+def single_process(frames):
+    '''
+    :param list frames: JSON text of each message in the stream
+    :returns: Elapsed seconds and number of unique messages
+    :rtype: tuple
+    '''
+    cache = DedupCache(len(frames))
+    start = time.perf_counter()
+    forwarded = 0
+    for frame in frames:
+        for _ in range(NODES):
+            forwarded += len(prefilter([scan_frame(frame)], cache))
+    return time.perf_counter() - start, forwarded
+
+def sharded(frames, worker_count):
+    '''
+    :param list frames: JSON text of each message in the stream
+    :param int worker_count: Number of worker processes
+    :returns: Elapsed seconds and number of unique messages
+    :rtype: tuple
+    '''
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    receivers = []
+    processes = []
+    for worker_id in range(worker_count):
+        receiver, sender = context.Pipe(duplex=False)
+        node_count = len(range(worker_id, NODES, worker_count))
+        process = context.Process(target=replay_nodes, args=(frames, node_count, sender, start))
+        process.start()
+        sender.close()
+        receivers.append(receiver)
+        processes.append(process)
+
+    cache = DedupCache(len(frames))
+    forwarded = 0
+    begin = time.perf_counter()
+    start.set()
+    while receivers:
+        for receiver in multiprocessing.connection.wait(receivers):
+            batch = receiver.recv()
+            if batch is None:
+                receivers.remove(receiver)
+                continue
+            for message in batch:
+                if cache.add(message.key):
+                    forwarded += 1
+    elapsed = time.perf_counter() - begin
+    for process in processes:
+        process.join()
+    return elapsed, forwarded
+
+def main():
+    '''
+    Print messages/sec for the single process mode and each worker count.
+    '''
+    if len(sys.argv) > 1:
+        messages = load_stream(sys.argv[1])
+    else:
+        messages = synthetic_stream(LEDGERS, VALIDATORS)
+    frames = [json.dumps(message) for message in messages]
+    received = len(frames) * NODES
+    print(f"{NODES} nodes, {received} messages received, {os.cpu_count()} CPUs")
+
+    elapsed, forwarded = single_process(frames)
+    print(f"single process: {received / elapsed:,.0f} messages/sec, {forwarded} forwarded")
+    for worker_count in WORKER_COUNTS:
+        elapsed, forwarded = sharded(frames, worker_count)
+        print(f"{worker_count} workers: {received / elapsed:,.0f} messages/sec, {forwarded} forwarded")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+'''
+Record frames from a websocket server for replay with benchmarks.replay_server.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.recorder wss://xrplcluster.com recording.xvtr --seconds 600`
+'''
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from ws_client.ws_listen import create_ws_object
+from .recording import RecordingWriter
+
+SUBSCRIPTION_COMMAND = {"command": "subscribe", "streams": ["validations", "ledger"]}
+
+async def record(url, path, seconds, subscription_command=None):
+    '''
+    Subscribe to a websocket server and write the frames it sends into a recording.
+
+    :param dict url: URL and SSL certificate verification settings
+    :param str path: Recording location
+    :param float seconds: How long to record
+    :param dict subscription_command: Command to send after connecting
+    :returns: Number of frames recorded
+    :rtype: int
+    '''
+    websocket_connection = await create_ws_object(url)
+    if not websocket_connection:
+        return 0
+    with RecordingWriter(path) as recording:
+        async with websocket_connection as ws:
+            await ws.send(json.dumps(subscription_command or SUBSCRIPTION_COMMAND))
+            start = time.monotonic()
+            while True:
+                remaining = start + seconds - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    frame = await asyncio.wait_for(ws.recv(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                recording.write(time.monotonic() - start, frame)
+        return recording.count
+
+def main():
+    '''
+    Parse arguments and record.
+    '''
+    parser = argparse.ArgumentParser(description="Record frames from a websocket server.")
+    parser.add_argument("url", help="Websocket server to subscribe to.")
+    parser.add_argument("output", help="Recording location.")
+    parser.add_argument("--seconds", type=float, default=600, help="How long to record.")
+    parser.add_argument("--no-verify", action="store_true", help="Skip TLS certificate verification.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    url = {'url': args.url, 'ssl_verify': not args.no_verify}
+    count = asyncio.get_event_loop().run_until_complete(record(url, args.output, args.seconds))
+    print(f"Recorded: {count} frames to: {args.output}.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+'''
+Compact recordings of websocket frames with their arrival times.
+
+A recording is a gzip stream holding a header, then one record per frame:
+    * Header: magic b'XVTR' and a format version.
+    * Record: microseconds since the recording started and the frame's length, followed
+      by the frame as UTF-8.
+'''
+import gzip
+import json
+import struct
+
+from .stream import load_stream, synthetic_stream
+
+MAGIC = b'XVTR'
+VERSION = 1
+HEADER = struct.Struct('<4sH')
+RECORD = struct.Struct('<QI')
+LEDGER_INTERVAL = 3.9 # Seconds between ledgers in generated recordings
+
+class RecordingWriter:
+    '''
+    Write frames into a recording.
+
+    :param str path: Recording location
+    '''
+    def __init__(self, path):
+        self.file = gzip.open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.count = 0
+
+    def write(self, offset, frame):
+        '''
+        :param float offset: Seconds since the recording started
+        :param str frame: Frame as received
+        '''
+        data = frame.encode()
+        self.file.write(RECORD.pack(int(offset * 1000000), len(data)))
+        self.file.write(data)
+        self.count += 1
+
+    def close(self):
+        '''
+        Finish the gzip stream.
+        '''
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def read_recording(path):
+    '''
+    Load a recording. Files with one JSON message per line are also accepted, with every
+    frame at offset 0.
+
+    :param str path: Recording location
+    :returns: (offset, frame) tuples, with offset in seconds
+    :rtype: list
+    '''
+    if path.endswith('.jsonl'):
+        return [(0.0, json.dumps(message)) for message in load_stream(path)]
+    frames = []
+    with gzip.open(path, 'rb') as recording:
+        magic, version = HEADER.unpack(recording.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} recording.")
+        while True:
+            record = recording.read(RECORD.size)
+            if len(record) < RECORD.size:
+                break
+            offset, length = RECORD.unpack(record)
+            frames.append((offset / 1000000, recording.read(length).decode()))
+    return frames
+
+def synthetic_recording(ledger_count, validator_count):
+    '''
+    Generate a recording of a validation and ledger subscription, with each ledger's
+    validations spread over the first second after it closes.
+
+    :param int ledger_count: Number of ledgers to close
+    :param int validator_count: Number of validators validating each ledger
+    :returns: (offset, frame) tuples, with offset in seconds
+    :rtype: list
+    '''
+    frames = []
+    ledger = 0
+    position = 0
+    for message in synthetic_stream(ledger_count, validator_count):
+        offset = ledger * LEDGER_INTERVAL + position / validator_count
+        frames.append((offset, json.dumps(message)))
+        position += 1
+        if message['type'] == 'ledgerClosed':
+            ledger += 1
+            position = 0
+    return frames
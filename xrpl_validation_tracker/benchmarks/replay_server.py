@@ -0,0 +1,113 @@
+'''
+Fake rippled websocket servers that replay a recording to each client that subscribes.
+Several servers can replay the same recording, so clients receive each message once
+from every node, as when subscribing to multiple rippled servers.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m benchmarks.replay_server recording.xvtr --nodes 5 --speed 10`
+'''
+import argparse
+import asyncio
+import logging
+
+import websockets
+
+from .recording import read_recording, synthetic_recording
+
+class ReplayServer:
+    '''
+    Replay frames to clients.
+
+    :param list frames: (offset, frame) tuples to replay
+    :param float speed: Replay speed multiplier. 1 is real time, 0 is as fast as possible.
+    :param asyncio.Event start: Wait for this event before replaying, or None to start immediately
+    :param on_send: Called with each frame after it is sent, or None
+    '''
+    def __init__(self, frames, speed=1, start=None, on_send=None):
+        self.frames = frames
+        self.speed = speed
+        self.start = start
+        self.on_send = on_send
+        self.subscribed = 0
+
+    async def replay(self, ws_client, path=None):
+        '''
+        Wait for a subscription command, then send every frame and keep the connection
+        open until the client closes it.
+
+        :param ws_client: Websocket client connection
+        :param str path: Request path, passed by older versions of websockets
+        '''
+        try:
+            await ws_client.recv()
+            self.subscribed += 1
+            if self.start:
+                await self.start.wait()
+            loop = asyncio.get_event_loop()
+            time_start = loop.time()
+            for offset, frame in self.frames:
+                if self.speed:
+                    delay = time_start + offset / self.speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await ws_client.send(frame)
+                if self.on_send:
+                    self.on_send(frame)
+            await ws_client.wait_closed()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.subscribed -= 1
+
+async def start_replay_servers(frames, node_count, host, port, speed=1, start=None, on_send=None):
+    '''
+    Start one replay server per node, on consecutive ports.
+
+    :param list frames: (offset, frame) tuples to replay
+    :param int node_count: Number of servers
+    :param str host: IP to listen on
+    :param int port: Port of the first server
+    :param float speed: Replay speed multiplier. 1 is real time, 0 is as fast as possible.
+    :param asyncio.Event start: Wait for this event before replaying, or None to start immediately
+    :param on_send: Called with each frame after it is sent, or None
+    :returns: ReplayServers and the websocket servers serving them
+    :rtype: tuple
+    '''
+    replay_servers = [ReplayServer(frames, speed, start, on_send) for _ in range(node_count)]
+    ws_servers = [
+        await websockets.serve(server.replay, host, port + i, max_size=None)
+        for i, server in enumerate(replay_servers)
+    ]
+    return replay_servers, ws_servers
+
+def main():
+    '''
+    Parse arguments and serve the recording until interrupted.
+    '''
+    parser = argparse.ArgumentParser(description="Replay a recording from fake rippled servers.")
+    parser.add_argument("recording", nargs='?', help="Recording to replay. A stream is generated if omitted.")
+    parser.add_argument("--nodes", type=int, default=1, help="Number of servers.")
+    parser.add_argument("--host", default='127.0.0.1', help="IP to listen on.")
+    parser.add_argument("--port", type=int, default=6006, help="Port of the first server.")
+    parser.add_argument("--speed", type=float, default=1, help="Replay speed multiplier. 0 replays as fast as possible.")
+    parser.add_argument("--ledgers", type=int, default=1000, help="Ledgers to generate if no recording is given.")
+    parser.add_argument("--validators", type=int, default=35, help="Validators to generate if no recording is given.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.recording:
+        frames = read_recording(args.recording)
+    else:
+        frames = synthetic_recording(args.ledgers, args.validators)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(
+        start_replay_servers(frames, args.nodes, args.host, args.port, args.speed)
+    )
+    print(f"Replaying: {len(frames)} frames from: {args.nodes} servers on ports: {args.port}-{args.port + args.nodes - 1}.")
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
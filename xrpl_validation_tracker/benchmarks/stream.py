@@ -0,0 +1,73 @@
+'''
+Validation and ledger stream messages for benchmarks, either loaded from a
+recording or generated.
+'''
+import json
+import os
+import random
+
+from ws_client.encoding import decode_message
+
+LEDGER_START = 70000000
+SIGNING_TIME_START = 750000000
+
+def load_stream(path):
+    '''
+    Load a recorded stream, stored as one JSON message per line.
+
+    :param str path: Recording location
+    :rtype: list
+    '''
+    with open(path) as recording:
+        return [json.loads(line) for line in recording if line.strip()]
+
+def synthetic_stream(ledger_count, validator_count):
+    '''
+    Generate the messages a validation and ledger subscription would produce.
+
+    :param int ledger_count: Number of ledgers to close
+    :param int validator_count: Number of validators validating each ledger
+    :rtype: list
+    '''
+    validators = [
+        ('n9' + os.urandom(25).hex()[:50], 'nH' + os.urandom(25).hex()[:50])
+        for _ in range(validator_count)
+    ]
+    messages = []
+    for i in range(ledger_count):
+        ledger_hash = os.urandom(32).hex().upper()
+        signing_time = SIGNING_TIME_START + i * 4
+        for ephemeral_key, master_key in random.sample(validators, len(validators)):
+            messages.append({
+                'type': 'validationReceived',
+                'ledger_hash': ledger_hash,
+                'ledger_index': str(LEDGER_START + i),
+                'signing_time': signing_time,
+                'validation_public_key': ephemeral_key,
+                'master_key': master_key,
+                'signature': os.urandom(72).hex().upper(),
+                'full': True,
+                'flags': 2147483649,
+            })
+        messages.append({
+            'type': 'ledgerClosed',
+            'ledger_hash': ledger_hash,
+            'ledger_index': LEDGER_START + i,
+            'ledger_time': signing_time,
+            'txn_count': random.randint(0, 200),
+            'fee_base': 10,
+            'fee_ref': 10,
+            'reserve_base': 10000000,
+            'reserve_inc': 2000000,
+            'validated_ledgers': f"32570-{LEDGER_START + i}",
+        })
+    return messages
+
+def decoded(messages):
+    '''
+    Copy messages, converting their hashes and signatures to bytes as ws_listen does.
+
+    :param list messages: Messages as received from a websocket server
+    :rtype: list
+    '''
+    return [decode_message(dict(message)) for message in messages]
@@ -0,0 +1,197 @@
+'''
+HTTP API modeled on the XRP Ledger Data API v2. Each response is serialized once and
+held in a ResponseCache, and queries run on a pool of threads with their own read-only
+database connections, so the event loop never waits on the database.
+'''
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from metrics.registry import REGISTRY
+from . import queries
+from .response_cache import ResponseCache
+
+HASH_PATTERN = re.compile(r'^[0-9A-Fa-f]{64}$')
+MAX_SEQUENCE_DIGITS = 10 # Ledger sequences are 32 bit unsigned integers
+
+def validators_response(connection):
+    '''
+    :param connection: Connection to the SQL database
+    :rtype: dict
+    '''
+    rows = queries.validators(connection)
+    return {'count': len(rows), 'validators': rows}
+
+def validator_response(connection, master_key):
+    '''
+    :param connection: Connection to the SQL database
+    :param str master_key: Validator's master key
+    :returns: The validator, or None
+    :rtype: dict
+    '''
+    rows = queries.validators(connection, master_key)
+    return rows[0] if rows else None
+
+def ledger_response(connection, identifier):
+    '''
+    :param connection: Connection to the SQL database
+    :param identifier: Ledger hash as bytes, or sequence
+    :returns: The ledger, or None
+    :rtype: dict
+    '''
+    if isinstance(identifier, bytes):
+        ledger = queries.ledger_by_hash(connection, identifier)
+    else:
+        ledger = queries.ledger_by_sequence(connection, identifier)
+    return {'ledger': ledger} if ledger else None
+
+def validations_response(connection, ledger_hash):
+    '''
+    :param connection: Connection to the SQL database
+    :param bytes ledger_hash: Ledger hash
+    :returns: The ledger's validations, or None if the ledger isn't in the database
+    :rtype: dict
+    '''
+    rows = queries.ledger_validations(connection, ledger_hash)
+    if rows is None:
+        return None
+    return {'ledger_hash': ledger_hash.hex().upper(), 'count': len(rows), 'validations': rows}
+
+class DatabaseUnavailable(Exception):
+    '''
+    The database couldn't be queried.
+    '''
+
+class DataApi:
+    '''
+    Answer API requests from the db_writer database.
+
+    :param settings: Configuration file
+    '''
+    def __init__(self, settings):
+        self.settings = settings
+        self.executor = ThreadPoolExecutor(max_workers=settings.DB_READER_THREADS)
+        self.local = threading.local()
+        self.cache = ResponseCache(settings.CACHE_TTL, settings.CACHE_MAX_ENTRIES)
+        self.request_seconds = {}
+
+    def connect(self):
+        '''
+        :returns: The current thread's database connection
+        '''
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = queries.create_read_connection(self.settings.DATABASE_LOCATION)
+        return connection
+
+    def run_query(self, function, *args):
+        '''
+        Run a query function with the current thread's connection.
+        '''
+        try:
+            return function(self.connect(), *args)
+        except sqlite3.Error as error:
+            logging.warning(f"Unable to query the database. Error: {error}.")
+            self.local.connection = None
+            raise DatabaseUnavailable(str(error))
+
+    async def respond(self, key, function, *args):
+        '''
+        Return a cached response, or run a query on a worker thread and cache its response.
+
+        :param tuple key: Request identifier
+        :param function: Query function returning a response dict, or None if not found
+        :rtype: web.Response
+        '''
+        async def query():
+            result = await asyncio.get_event_loop().run_in_executor(
+                self.executor, self.run_query, function, *args
+            )
+            if result is None:
+                return 404, json.dumps({'result': 'error', 'message': "Not found."})
+            return 200, json.dumps(dict(result, result='success'))
+
+        try:
+            status, body = await self.cache.get(key, query)
+        except DatabaseUnavailable:
+            status, body = 503, json.dumps({'result': 'error', 'message': "Database unavailable."})
+        return web.Response(status=status, text=body, content_type='application/json')
+
+    @staticmethod
+    def bad_request(message):
+        '''
+        :param str message: Reason the request is invalid
+        :rtype: web.Response
+        '''
+        return web.json_response({'result': 'error', 'message': message}, status=400)
+
+    async def get_validators(self, request):
+        '''
+        GET /v2/network/validators
+        '''
+        return await self.respond(('validators',), validators_response)
+
+    async def get_validator(self, request):
+        '''
+        GET /v2/network/validators/{master_key}
+        '''
+        master_key = request.match_info['master_key']
+        return await self.respond(('validator', master_key), validator_response, master_key)
+
+    async def get_ledger(self, request):
+        '''
+        GET /v2/ledgers/{ledger_identifier}, where the identifier is a hash or sequence.
+        '''
+        identifier = request.match_info['ledger_identifier']
+        if HASH_PATTERN.match(identifier):
+            value = bytes.fromhex(identifier)
+        elif identifier.isdigit() and len(identifier) <= MAX_SEQUENCE_DIGITS:
+            value = int(identifier)
+        else:
+            return self.bad_request("Ledger identifier must be a hash or sequence.")
+        return await self.respond(('ledger', value), ledger_response, value)
+
+    async def get_ledger_validations(self, request):
+        '''
+        GET /v2/ledgers/{ledger_hash}/validations
+        '''
+        identifier = request.match_info['ledger_hash']
+        if not HASH_PATTERN.match(identifier):
+            return self.bad_request("Ledger hash must be 64 hex characters.")
+        ledger_hash = bytes.fromhex(identifier)
+        return await self.respond(('validations', ledger_hash), validations_response, ledger_hash)
+
+    @web.middleware
+    async def time_requests(self, request, handler):
+        '''
+        Record how long each route takes to answer.
+        '''
+        route = request.match_info.route.resource
+        name = route.canonical if route else 'unmatched'
+        histogram = self.request_seconds.get(name)
+        if histogram is None:
+            histogram = self.request_seconds[name] = REGISTRY.histogram(
+                'xrpl_db_reader_request_seconds', "Time to answer API requests, by route.", route=name
+            )
+        start = asyncio.get_event_loop().time()
+        try:
+            return await handler(request)
+        finally:
+            histogram.observe(asyncio.get_event_loop().time() - start)
+
+    def create_app(self):
+        '''
+        :rtype: web.Application
+        '''
+        app = web.Application(middlewares=[self.time_requests])
+        app.router.add_get('/v2/network/validators', self.get_validators)
+        app.router.add_get('/v2/network/validators/{master_key}', self.get_validator)
+        app.router.add_get('/v2/ledgers/{ledger_identifier}', self.get_ledger)
+        app.router.add_get('/v2/ledgers/{ledger_hash}/validations', self.get_ledger_validations)
+        return app
@@ -0,0 +1,171 @@
+'''
+Read-only queries against the db_writer's SQLite database. Agreement scores are summed
+from the hourly aggregate tables the db_writer maintains, so their cost depends on the
+number of validators and hours in the period, not on the size of validation_stream.
+'''
+import sqlite3
+import time
+
+from db_writer.aggregates import HOUR
+from db_writer.partitions import iter_validations
+from db_writer.sqlite_writer import RIPPLED_TIME_OFFSET
+
+# Agreement periods, in hours, keyed by the suffix of their response field.
+AGREEMENT_PERIODS = {'1h': 1, '24h': 24, '30day': 720}
+
+VALIDATOR_FIELDS = (
+    'master_key',
+    'domain',
+    'dunl',
+    'network',
+    'server_country',
+    'owner_country',
+    'toml_verified',
+)
+LEDGER_FIELDS = (
+    'ledger_hash',
+    'ledger_index',
+    'signing_time',
+    'txn_count',
+    'fee_base',
+    'fee_ref',
+    'reserve_base',
+    'reserve_inc',
+)
+
+def create_read_connection(db_location):
+    '''
+    Open a read-only connection to the database.
+
+    :param str db_location: Database location
+    :returns: Database connection
+    '''
+    connection = sqlite3.connect(f"file:{db_location}?mode=ro", uri=True)
+    connection.execute("PRAGMA busy_timeout=5000;")
+    return connection
+
+def first_hour(hours):
+    '''
+    :param int hours: Number of hourly buckets in the period, including the current hour
+    :returns: Oldest hour in the period
+    :rtype: int
+    '''
+    return int(time.time() // HOUR) - hours + 1
+
+def agreement(connection, hours, master_key=None):
+    '''
+    Score validators by the fraction of closed ledgers in a period they validated.
+
+    :param connection: Connection to the SQL database
+    :param int hours: Length of the period
+    :param str master_key: Validator to score, or None for every validator
+    :returns: Data API v2 style agreement objects, keyed by master key
+    :rtype: dict
+    '''
+    start = first_hour(hours)
+    total, hours_recorded = connection.execute(
+        "SELECT IFNULL(SUM(ledgers), 0), COUNT(*) FROM ledger_hourly WHERE hour >= ?",
+        (start,)
+    ).fetchone()
+    sql = '''SELECT master_keys.master_key, SUM(v.agreed)
+        FROM validator_hourly AS v
+        JOIN master_keys ON master_keys.rowid = v.master_key
+        WHERE v.hour >= ?'''
+    parameters = [start]
+    if master_key is not None:
+        sql += " AND master_keys.master_key = ?"
+        parameters.append(master_key)
+    scores = {}
+    for key, agreed in connection.execute(sql + " GROUP BY v.master_key", parameters):
+        scores[key] = {
+            'missed': total - agreed,
+            'total': total,
+            'score': f"{agreed / total:.5f}" if total else None,
+            'incomplete': hours_recorded < hours,
+        }
+    return scores
+
+def validators(connection, master_key=None):
+    '''
+    :param connection: Connection to the SQL database
+    :param str master_key: Validator to return, or None for every validator
+    :returns: Validators with their agreement scores for each period
+    :rtype: list
+    '''
+    sql = f"SELECT {', '.join(VALIDATOR_FIELDS)} FROM master_keys"
+    parameters = []
+    if master_key is not None:
+        sql += " WHERE master_key = ?"
+        parameters.append(master_key)
+    rows = [dict(zip(VALIDATOR_FIELDS, row)) for row in connection.execute(sql, parameters)]
+    for period, hours in AGREEMENT_PERIODS.items():
+        scores = agreement(connection, hours, master_key)
+        for row in rows:
+            row[f"agreement_{period}"] = scores.get(row['master_key'])
+    return rows
+
+def format_ledger(row):
+    '''
+    :param tuple row: Row with the columns in LEDGER_FIELDS
+    :rtype: dict
+    '''
+    ledger = dict(zip(LEDGER_FIELDS, row))
+    ledger['ledger_hash'] = ledger['ledger_hash'].hex().upper()
+    # Ledgers are stored with the signing time of their first validation, in the Ripple
+    # epoch. Validations are stored in UNIX time.
+    if ledger['signing_time'] is not None:
+        ledger['signing_time'] += RIPPLED_TIME_OFFSET
+    # Only ledgers from the ledger stream have a transaction count.
+    ledger['closed'] = ledger['txn_count'] is not None
+    return ledger
+
+def ledger_by_hash(connection, ledger_hash):
+    '''
+    :param connection: Connection to the SQL database
+    :param bytes ledger_hash: Ledger hash
+    :returns: The ledger, or None
+    :rtype: dict
+    '''
+    row = connection.execute(
+        '''SELECT hash, sequence, signing_time, txn_count, fee_base, fee_ref, reserve_base, reserve_inc
+        FROM ledgers WHERE hash = ?''',
+        (ledger_hash,)
+    ).fetchone()
+    return format_ledger(row) if row else None
+
+def ledger_by_sequence(connection, sequence):
+    '''
+    Find a ledger by sequence. If validators validated more than one hash for the
+    sequence, the closed ledger is returned.
+
+    :param connection: Connection to the SQL database
+    :param int sequence: Ledger sequence
+    :returns: The ledger, or None
+    :rtype: dict
+    '''
+    row = connection.execute(
+        '''SELECT hash, sequence, signing_time, txn_count, fee_base, fee_ref, reserve_base, reserve_inc
+        FROM ledgers WHERE sequence = ?
+        ORDER BY txn_count IS NULL LIMIT 1''',
+        (sequence,)
+    ).fetchone()
+    return format_ledger(row) if row else None
+
+def ledger_validations(connection, ledger_hash):
+    '''
+    :param connection: Connection to the SQL database
+    :param bytes ledger_hash: Ledger hash
+    :returns: Validations of the ledger, or None if the ledger isn't in the database
+    :rtype: list
+    '''
+    ledger = connection.execute("SELECT sequence FROM ledgers WHERE hash = ?", (ledger_hash,)).fetchone()
+    if not ledger:
+        return None
+    return [
+        {
+            'master_key': row[2],
+            'ephemeral_key': row[3],
+            'signing_time': row[4],
+            'partial': bool(row[5]),
+        } for row in iter_validations(connection, ledger[0], ledger[0]) if row[1] == ledger_hash
+    ]
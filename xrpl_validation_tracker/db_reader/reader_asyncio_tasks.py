@@ -0,0 +1,40 @@
+'''
+Compile and run asyncio tasks.
+'''
+import asyncio
+import logging
+
+from aiohttp import web
+
+from metrics.http_server import start_metrics_server
+from .api import DataApi
+
+async def spawn_workers(settings):
+    '''
+    Add tasks to the asyncio loop.
+
+    :param settings: Configuration file
+    '''
+    runner = web.AppRunner(DataApi(settings).create_app())
+    await runner.setup()
+    await web.TCPSite(runner, settings.SERVER_IP, settings.SERVER_PORT).start()
+    logging.info(f"Serving the API on: http://{settings.SERVER_IP}:{settings.SERVER_PORT}.")
+    await start_metrics_server(settings)
+
+def start_loop(settings):
+    '''
+    Run the asyncio event loop.
+
+    :param settings: Configuration file
+    '''
+    loop = asyncio.get_event_loop()
+    # Debug asyncio
+    if settings.ASYNCIO_DEBUG is True:
+        loop.set_debug(True)
+        logging.info("asyncio debugging enabled.")
+
+    try:
+        loop.run_until_complete(spawn_workers(settings))
+        loop.run_forever()
+    except KeyboardInterrupt:
+        logging.critical("Keyboard interrupt detected. Exiting the db_reader.")
@@ -0,0 +1,64 @@
+'''
+Cache serialized responses for a fixed time, so repeated requests for hot endpoints are
+answered without querying the database.
+'''
+import asyncio
+from collections import OrderedDict
+
+from metrics.registry import REGISTRY
+
+class ResponseCache:
+    '''
+    Responses expire ttl seconds after they are created. As every entry lives for the same
+    time, entries are kept in expiry order and expired entries are evicted from the front.
+    Concurrent requests for an uncached key share a single query.
+
+    :param float ttl: Seconds to keep each response
+    :param int max_entries: Maximum number of responses to keep
+    '''
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict() # key: (expiry, future)
+        self.hits = REGISTRY.counter('xrpl_db_reader_cache_total', "Response cache lookups, by result.", result='hit')
+        self.misses = REGISTRY.counter('xrpl_db_reader_cache_total', "Response cache lookups, by result.", result='miss')
+        REGISTRY.gauge('xrpl_db_reader_cache_size', "Responses held by the response cache.", lambda: len(self.entries))
+
+    def evict(self, now):
+        '''
+        Remove expired entries, then the oldest entries beyond max_entries.
+
+        :param float now: Event loop time
+        '''
+        while self.entries:
+            key, (expiry, _) = next(iter(self.entries.items()))
+            if expiry > now and len(self.entries) <= self.max_entries:
+                break
+            del self.entries[key]
+
+    async def get(self, key, function):
+        '''
+        Return the cached response for a key, or create it with function.
+
+        :param key: Hashable request identifier
+        :param function: Coroutine function that creates the response
+        :returns: The response
+        '''
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        self.evict(now)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits.inc()
+            return await asyncio.shield(entry[1])
+        self.misses.inc()
+        future = asyncio.ensure_future(function())
+        if self.ttl > 0:
+            self.entries[key] = (now + self.ttl, future)
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            # Don't cache failures.
+            if self.entries.get(key, (None, None))[1] is future:
+                del self.entries[key]
+            raise
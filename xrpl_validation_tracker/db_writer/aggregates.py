@@ -0,0 +1,175 @@
+'''
+Maintain hourly validation and agreement counts for each validator as batches are
+written, so the db_reader can report agreement without scanning validation_stream.
+
+A validation agrees with the network if its ledger hash appears in a ledgerClosed
+message. Validations for ledgers that haven't closed yet are held in memory until the
+ledger closes, or until enough newer ledgers arrive that it never will.
+'''
+import time
+from collections import OrderedDict
+
+HOUR = 3600 # Seconds in each aggregate period
+
+VALIDATOR_HOURLY_TABLE = """CREATE TABLE IF NOT EXISTS validator_hourly (
+                    master_key INT NOT NULL,
+                    hour INT NOT NULL,
+                    validations INT NOT NULL DEFAULT 0,
+                    agreed INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (hour, master_key)
+                ) WITHOUT ROWID;"""
+
+LEDGER_HOURLY_TABLE = """CREATE TABLE IF NOT EXISTS ledger_hourly (
+                    hour INT PRIMARY KEY,
+                    ledgers INT NOT NULL DEFAULT 0
+                );"""
+
+class AggregateTracker:
+    '''
+    Update the validator_hourly and ledger_hourly tables from each batch.
+
+    Like the IdCache, changes to the tracker's memory are staged until the transaction
+    that wrote them commits.
+
+    :param int ledger_window: Number of recent ledgers to remember validators and closes for
+    '''
+    def __init__(self, ledger_window):
+        self.ledger_window = ledger_window
+        self.pending = OrderedDict() # Unclosed ledger hash: (hour, master key ids)
+        self.closed = OrderedDict() # Closed ledger hash: (hour, master key ids)
+        self.staged_pending = {} # Ledger hash: hour
+        self.staged_closed = {} # Ledger hash: hour
+        self.staged_validators = {} # Ledger hash: master key ids
+
+    def ledger_hour(self, ledger_hash):
+        '''
+        :param bytes ledger_hash: Ledger hash
+        :returns: Hour the ledger's validations are counted in, or None if it's unknown
+        :rtype: int
+        '''
+        for ledgers in (self.closed, self.pending):
+            if ledger_hash in ledgers:
+                return ledgers[ledger_hash][0]
+        for ledgers in (self.staged_closed, self.staged_pending):
+            if ledger_hash in ledgers:
+                return ledgers[ledger_hash]
+        return None
+
+    def is_closed(self, ledger_hash):
+        '''
+        :param bytes ledger_hash: Ledger hash
+        :rtype: bool
+        '''
+        return ledger_hash in self.closed or ledger_hash in self.staged_closed
+
+    def is_counted(self, ledger_hash, master_key):
+        '''
+        :param bytes ledger_hash: Ledger hash
+        :param int master_key: Master key id
+        :returns: Whether a validation of the ledger by the validator was already counted
+        :rtype: bool
+        '''
+        if master_key in self.staged_validators.get(ledger_hash, ()):
+            return True
+        for ledgers in (self.closed, self.pending):
+            if ledger_hash in ledgers:
+                return master_key in ledgers[ledger_hash][1]
+        return False
+
+    def stage(self, validations, ledger_hashes):
+        '''
+        Count a batch's validations and ledger closes. Each validator is counted once per
+        ledger, even if it validated the ledger with more than one ephemeral key.
+
+        :param list validations: (ledger_hash, master_key_id, signing_time) tuples for the
+            validations that were inserted, with signing_time in UNIX time
+        :param list ledger_hashes: Hashes from the batch's ledgerClosed messages
+        :returns: (master_key, hour, validations, agreed) and (hour, ledgers) increments
+        :rtype: tuple
+        '''
+        for ledger_hash, _, signing_time in validations:
+            if self.ledger_hour(ledger_hash) is None:
+                self.staged_pending[ledger_hash] = signing_time // HOUR
+        closing = []
+        for ledger_hash in ledger_hashes:
+            if not self.is_closed(ledger_hash):
+                hour = self.ledger_hour(ledger_hash)
+                self.staged_closed[ledger_hash] = int(time.time() // HOUR) if hour is None else hour
+                closing.append(ledger_hash)
+
+        validators = {}
+        for ledger_hash, master_key, _ in validations:
+            if self.is_counted(ledger_hash, master_key):
+                continue
+            self.staged_validators.setdefault(ledger_hash, set()).add(master_key)
+            counts = validators.setdefault((master_key, self.ledger_hour(ledger_hash)), [0, 0])
+            counts[0] += 1
+            if self.is_closed(ledger_hash):
+                counts[1] += 1
+        ledgers = {}
+        for ledger_hash in closing:
+            hour = self.staged_closed[ledger_hash]
+            ledgers[hour] = ledgers.get(hour, 0) + 1
+            # Credit validations written by earlier batches.
+            for master_key in self.pending.get(ledger_hash, (hour, ()))[1]:
+                validators.setdefault((master_key, hour), [0, 0])[1] += 1
+        return (
+            [(key, hour, counts[0], counts[1]) for (key, hour), counts in validators.items()],
+            list(ledgers.items()),
+        )
+
+    def update(self, connection, validations, ledger_hashes):
+        '''
+        Stage a batch and add its counts to the aggregate tables. The caller is responsible
+        for committing the transaction.
+
+        :param connection: Connection to the SQL database
+        :param list validations: (ledger_hash, master_key_id, signing_time) tuples for the
+            validations that were inserted
+        :param list ledger_hashes: Hashes from the batch's ledgerClosed messages
+        '''
+        validators, ledgers = self.stage(validations, ledger_hashes)
+        if validators:
+            connection.executemany(
+                "INSERT OR IGNORE INTO validator_hourly (master_key, hour) VALUES (?, ?)",
+                [(i[0], i[1]) for i in validators]
+            )
+            connection.executemany(
+                '''UPDATE validator_hourly SET
+                    validations = validations + ?,
+                    agreed = agreed + ?
+                WHERE hour = ? AND master_key = ?''',
+                [(i[2], i[3], i[1], i[0]) for i in validators]
+            )
+        if ledgers:
+            connection.executemany(
+                "INSERT OR IGNORE INTO ledger_hourly (hour) VALUES (?)",
+                [(i[0],) for i in ledgers]
+            )
+            connection.executemany(
+                "UPDATE ledger_hourly SET ledgers = ledgers + ? WHERE hour = ?",
+                [(i[1], i[0]) for i in ledgers]
+            )
+
+    def commit(self):
+        '''
+        Apply staged changes, forgetting the oldest ledgers beyond the window.
+        '''
+        for ledger_hash, hour in self.staged_pending.items():
+            self.pending[ledger_hash] = (hour, set())
+        for ledger_hash, hour in self.staged_closed.items():
+            self.closed[ledger_hash] = self.pending.pop(ledger_hash, (hour, set()))
+        for ledger_hash, master_keys in self.staged_validators.items():
+            (self.closed.get(ledger_hash) or self.pending[ledger_hash])[1].update(master_keys)
+        for ledgers in (self.pending, self.closed):
+            while len(ledgers) > self.ledger_window:
+                ledgers.popitem(last=False)
+        self.rollback()
+
+    def rollback(self):
+        '''
+        Discard staged changes.
+        '''
+        self.staged_pending = {}
+        self.staged_closed = {}
+        self.staged_validators = {}
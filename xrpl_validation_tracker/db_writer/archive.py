@@ -0,0 +1,254 @@
+'''
+Compact columnar archive of validations for long-term storage and analysis.
+
+An archive holds one column per field, each a packed array that can be memory mapped
+and read without parsing:
+    * Validator keys are dictionary encoded. Each validation stores an index into the
+      master and ephemeral key dictionaries.
+    * Ledger hashes are stored once per ledger as 32 bytes. Each validation stores an
+      index into the ledger columns.
+    * Ledger sequences and signing times are delta encoded. Validation signing times are
+      stored as offsets from their ledger's signing time.
+    * Every integer column uses the smallest array type that fits its values.
+'''
+import mmap
+import struct
+import sys
+from array import array
+from itertools import accumulate
+
+from .sqlite_writer import RIPPLED_TIME_OFFSET
+
+MAGIC = b'XVTA'
+VERSION = 1
+HEADER = struct.Struct('<4sHHqq')
+COLUMN_ENTRY = struct.Struct('<cxxxQQ')
+ALIGNMENT = 8
+
+COLUMNS = (
+    'master_key_offsets',
+    'master_key_data',
+    'ephemeral_key_offsets',
+    'ephemeral_key_data',
+    'ledger_hashes',
+    'ledger_sequence_deltas',
+    'ledger_time_deltas',
+    'validation_ledger',
+    'validation_master_key',
+    'validation_ephemeral_key',
+    'validation_time_offset',
+    'validation_partial',
+)
+
+def smallest_array(values, signed):
+    '''
+    Pack integers into the smallest array type that fits them.
+
+    :param list values: Integers to pack
+    :param bool signed: Whether values may be negative
+    :rtype: array.array
+    '''
+    typecodes = ('b', 'h', 'i', 'q') if signed else ('B', 'H', 'I', 'Q')
+    low = min(values, default=0)
+    high = max(values, default=0)
+    for typecode in typecodes:
+        bits = array(typecode).itemsize * 8
+        if signed and -(1 << (bits - 1)) <= low and high < (1 << (bits - 1)):
+            return array(typecode, values)
+        if not signed and high < (1 << bits):
+            return array(typecode, values)
+    raise OverflowError("Value too large for a 64 bit column.")
+
+def encode_dictionary(keys):
+    '''
+    :param list keys: Strings to store
+    :returns: Offsets array and UTF-8 data
+    :rtype: tuple
+    '''
+    data = bytearray()
+    offsets = [0]
+    for key in keys:
+        data += key.encode()
+        offsets.append(len(data))
+    return smallest_array(offsets, False), array('B', data)
+
+def deltas(values):
+    '''
+    :param list values: Integers
+    :returns: Difference between each value and the previous value (the first is kept as is)
+    :rtype: list
+    '''
+    return [value - previous for previous, value in zip([0] + values[:-1], values)]
+
+def write_archive(path, rows):
+    '''
+    Write validations into an archive.
+
+    :param str path: Archive location
+    :param rows: (sequence, ledger_hash, master_key, ephemeral_key, signing_time, partial_validation)
+        rows, as returned by db_writer.partitions.iter_validations. signing_time is UNIX time.
+    :returns: Number of validations written
+    :rtype: int
+    '''
+    rows = sorted(rows, key=lambda row: (int(row[0]), row[1]))
+    master_keys = {}
+    ephemeral_keys = {}
+    ledgers = {}
+    for sequence, ledger_hash, master_key, ephemeral_key, signing_time, _ in rows:
+        master_keys.setdefault(master_key, len(master_keys))
+        ephemeral_keys.setdefault(ephemeral_key, len(ephemeral_keys))
+        if ledger_hash not in ledgers:
+            # Validation signing times are stored relative to the ledger's first validation.
+            ledgers[ledger_hash] = (len(ledgers), int(sequence), signing_time)
+
+    base_sequence = next(iter(ledgers.values()))[1] if ledgers else 0
+    base_time = next(iter(ledgers.values()))[2] if ledgers else 0
+    ledger_sequences = [i[1] - base_sequence for i in ledgers.values()]
+    ledger_times = [i[2] - base_time for i in ledgers.values()]
+
+    columns = {}
+    columns['master_key_offsets'], columns['master_key_data'] = encode_dictionary(master_keys)
+    columns['ephemeral_key_offsets'], columns['ephemeral_key_data'] = encode_dictionary(ephemeral_keys)
+    columns['ledger_hashes'] = array(
+        'B', b''.join(i if isinstance(i, bytes) else bytes.fromhex(i) for i in ledgers)
+    )
+    columns['ledger_sequence_deltas'] = smallest_array(deltas(ledger_sequences), True)
+    columns['ledger_time_deltas'] = smallest_array(deltas(ledger_times), True)
+    columns['validation_ledger'] = smallest_array([ledgers[row[1]][0] for row in rows], False)
+    columns['validation_master_key'] = smallest_array([master_keys[row[2]] for row in rows], False)
+    columns['validation_ephemeral_key'] = smallest_array([ephemeral_keys[row[3]] for row in rows], False)
+    columns['validation_time_offset'] = smallest_array(
+        [row[4] - ledgers[row[1]][2] for row in rows], True
+    )
+    columns['validation_partial'] = array('B', [1 if row[5] else 0 for row in rows])
+
+    if sys.byteorder != 'little':
+        for column in columns.values():
+            column.byteswap()
+
+    offset = HEADER.size + COLUMN_ENTRY.size * len(COLUMNS)
+    entries = []
+    for name in COLUMNS:
+        offset += -offset % ALIGNMENT
+        entries.append((columns[name].typecode.encode(), offset, len(columns[name])))
+        offset += len(columns[name]) * columns[name].itemsize
+
+    with open(path, 'wb') as archive:
+        archive.write(HEADER.pack(MAGIC, VERSION, len(COLUMNS), base_sequence, base_time))
+        for entry in entries:
+            archive.write(COLUMN_ENTRY.pack(*entry))
+        for name, entry in zip(COLUMNS, entries):
+            archive.write(b'\0' * (entry[1] - archive.tell()))
+            columns[name].tofile(archive)
+    return len(rows)
+
+class ArchiveReader:
+    '''
+    Memory map an archive and read its columns.
+
+    :param str path: Archive location
+    '''
+    def __init__(self, path):
+        with open(path, 'rb') as archive:
+            self.mmap = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, column_count, self.base_sequence, self.base_time = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} validation archive.")
+        self.columns = {}
+        for i, name in enumerate(COLUMNS[:column_count]):
+            typecode, offset, count = COLUMN_ENTRY.unpack_from(self.mmap, HEADER.size + i * COLUMN_ENTRY.size)
+            self.columns[name] = (typecode.decode(), offset, count)
+
+    def close(self):
+        '''
+        Unmap the archive.
+        '''
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.columns['validation_ledger'][2]
+
+    def column(self, name):
+        '''
+        :param str name: Column name from COLUMNS
+        :returns: The column's values, read directly from the mapped file
+        :rtype: memoryview or array.array
+        '''
+        typecode, offset, count = self.columns[name]
+        size = array(typecode).itemsize
+        view = memoryview(self.mmap)[offset:offset + count * size]
+        if sys.byteorder == 'little':
+            return view.cast(typecode)
+        values = array(typecode, view.tobytes())
+        values.byteswap()
+        return values
+
+    def dictionary(self, name):
+        '''
+        :param str name: 'master_key' or 'ephemeral_key'
+        :returns: Decoded keys
+        :rtype: list
+        '''
+        offsets = self.column(name + '_offsets')
+        data = bytes(self.column(name + '_data'))
+        return [data[offsets[i]:offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+
+    def ledgers(self):
+        '''
+        :returns: (ledger_hash, sequence, signing_time) for each ledger, with ledger_hash as bytes
+            and signing_time as UNIX time
+        :rtype: list
+        '''
+        hashes = bytes(self.column('ledger_hashes'))
+        sequences = accumulate(self.column('ledger_sequence_deltas'))
+        times = accumulate(self.column('ledger_time_deltas'))
+        return [
+            (hashes[i * 32:(i + 1) * 32], self.base_sequence + sequence, self.base_time + signing_time)
+            for i, (sequence, signing_time) in enumerate(zip(sequences, times))
+        ]
+
+    def iter_messages(self):
+        '''
+        Yield validation stream messages in the form db_writer.sqlite_writer.validations consumes.
+        '''
+        master_keys = self.dictionary('master_key')
+        ephemeral_keys = self.dictionary('ephemeral_key')
+        ledgers = self.ledgers()
+        for ledger, master_key, ephemeral_key, time_offset, partial in zip(
+                self.column('validation_ledger'),
+                self.column('validation_master_key'),
+                self.column('validation_ephemeral_key'),
+                self.column('validation_time_offset'),
+                self.column('validation_partial'),
+        ):
+            ledger_hash, sequence, signing_time = ledgers[ledger]
+            yield {
+                'type': 'validationReceived',
+                'ledger_hash': ledger_hash,
+                'ledger_index': str(sequence),
+                'signing_time': signing_time + time_offset - RIPPLED_TIME_OFFSET,
+                'validation_public_key': ephemeral_keys[ephemeral_key],
+                'master_key': master_keys[master_key],
+                'full': not partial,
+            }
+
+def export_range(connection, first_sequence, last_sequence, path):
+    '''
+    Archive the validations for a range of ledgers.
+
+    :param connection: Connection to the main database
+    :param int first_sequence: Lowest ledger sequence
+    :param int last_sequence: Highest ledger sequence
+    :param str path: Archive location
+    :returns: Number of validations written
+    :rtype: int
+    '''
+    # Imported here, as partitions imports this module.
+    from .partitions import iter_validations
+    return write_archive(path, iter_validations(connection, first_sequence, last_sequence))
@@ -1,11 +1,42 @@
 import asyncio
 import logging
-import sqlite3
-from sys import exit
 
-from .sqlite_connection import create_db_connection
-from .sqlite_writer import validations as db_validation_writer
-from .sqlite_writer import ledgers as db_ledger_writer
+from metrics.registry import REGISTRY
+from .storage import create_backend
+
+BATCH_SIZE = REGISTRY.histogram(
+    'xrpl_db_batch_size', "Messages in each batch written to the database.",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+)
+
+async def collect_batch(queue, batch_size, batch_latency):
+    '''
+    Wait for a message, then keep collecting messages until the batch is full or
+    batch_latency seconds have passed since the first message arrived.
+
+    :param asyncio.queues.Queue queue: Validation stream queue
+    :param int batch_size: Maximum number of messages in a batch
+    :param float batch_latency: Maximum time (seconds) to hold a message before writing it
+    :returns: Messages to write
+    :rtype: list
+    '''
+    loop = asyncio.get_event_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + batch_latency
+    while len(batch) < batch_size:
+        try:
+            batch.append(queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
 
 async def process_db_data(queue, settings):
     '''
@@ -14,22 +45,15 @@ async def process_db_data(queue, settings):
     :param asyncio.queues.Queue queue: Validation stream queue
     :param settings: Configuration file
     '''
-    # Create an object for the database connection.
-    database = create_db_connection(settings.DATABASE_LOCATION)
+    backend = create_backend(settings)
+    await backend.start()
     # Listen for validations
     while True:
-        message = await queue.get()
         try:
-            if not database:
-                database = sqlite3.connect(settings.DATABASE_LOCATION)
-            if message['type'] == 'validationReceived' and 'master_key' in message:
-                db_validation_writer(message, database)
-            elif message['type'] == 'ledgerClosed':
-                db_ledger_writer(message, database)
-        except sqlite3.Error as error:
-            logging.warning(f"Unable to connect to the database: {error}.")
-        except KeyError:
-            # Ignore messages that don't contain 'type' key
-            pass
+            batch = await collect_batch(queue, settings.DB_BATCH_SIZE, settings.DB_BATCH_LATENCY)
+            BATCH_SIZE.observe(len(batch))
+            await backend.write_batch(batch)
         except KeyboardInterrupt:
+            logging.info("Stopping the database backend.")
+            await backend.stop()
             break
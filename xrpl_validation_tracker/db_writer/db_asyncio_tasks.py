@@ -4,9 +4,10 @@ Compile and run asyncio tasks.
 import asyncio
 import logging
 
-from ws_client import ws_listen
-from ws_client import ws_minder
+from metrics.http_server import start_metrics_server
+from ws_client.ws_minder import ConnectionSupervisor
 from .db_access import process_db_data
+from aggregator.bounded_queue import BoundedQueue
 from aggregator.process_data import DataProcessor
 
 async def spawn_workers(settings):
@@ -15,37 +16,17 @@ async def spawn_workers(settings):
 
     :param settings: Configuration file
     '''
-    ws_servers = []
-
     # Create queues for websocket messages
-    queue = asyncio.Queue(maxsize=0)
-    queue_db = asyncio.Queue(maxsize=0)
+    queue = BoundedQueue(settings.QUEUE_MAX_SIZE, settings.QUEUE_OVERFLOW_POLICY, 'receive')
+    queue_db = BoundedQueue(settings.QUEUE_MAX_SIZE, settings.QUEUE_OVERFLOW_POLICY, 'database')
     logging.info("Adding initial asyncio tasks to the loop.")
-    # Subscribe to websocket servers
-    for url in settings.URLS:
-        ws_servers.append(
-            {
-                #'task': asyncio.create_task(
-                'task': asyncio.ensure_future(
-                    ws_listen.websocket_subscribe(url, settings.WS_SUBSCRIPTION_COMMAND, queue)
-                ),
-                'url': url,
-                'retry_count': 0,
-            }
-        )
-    # Reopen closed connections to the WS servers
-    #asyncio.create_task(
-    asyncio.ensure_future(
-        ws_minder.mind_tasks(
-            ws_servers,
-            queue,
-            settings
-        )
-    )
+    # Subscribe to websocket servers, and reopen closed connections
+    ConnectionSupervisor(settings.URLS, queue, settings).start()
     # check for duplicate messages
     asyncio.ensure_future(DataProcessor(queue, queue_db, settings).process_data())
     # write into the db
     asyncio.ensure_future(process_db_data(queue_db, settings))
+    await start_metrics_server(settings)
 
 def start_loop(settings):
     '''
@@ -0,0 +1,126 @@
+'''
+Write batches of messages into the database from a dedicated thread, so disk I/O
+never blocks the asyncio event loop.
+'''
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics.registry import REGISTRY
+from .aggregates import AggregateTracker
+from .id_cache import IdCache
+from .key_events import KeyEventPublisher
+from .partitions import PartitionManager
+from .sqlite_connection import create_db_connection
+from .sqlite_writer import write_batch as db_batch_writer
+from .storage import BATCH_ERRORS, BATCH_SECONDS, MESSAGES_WRITTEN
+
+CACHE_STATS_INTERVAL = 1000 # n batches between logging id cache hits & misses
+
+class DatabaseWriter(threading.Thread):
+    '''
+    Thread that owns the database connection and writes batches from a bounded queue.
+
+    :param settings: Configuration file
+    '''
+    def __init__(self, settings):
+        super().__init__(name="database_writer", daemon=True)
+        self.settings = settings
+        self.batches = queue.Queue(maxsize=settings.DB_WRITER_QUEUE_SIZE)
+        self.backpressure_count = 0
+        REGISTRY.gauge(
+            'xrpl_db_writer_queue_depth', "Batches waiting for the database writer thread.",
+            self.batches.qsize
+        )
+        REGISTRY.counter(
+            'xrpl_db_writer_backpressure_total', "Times the database writer queue was full.",
+            lambda: self.backpressure_count
+        )
+
+    def create_partitions(self, database):
+        '''
+        :param database: Connection to the main database
+        :returns: Partition manager, or None if partitioning is disabled
+        '''
+        if not self.settings.PARTITION_LEDGERS:
+            return None
+        return PartitionManager(
+            database,
+            self.settings.PARTITION_DIRECTORY,
+            self.settings.PARTITION_LEDGERS,
+            self.settings.PARTITIONS_HOT,
+            self.settings.ARCHIVE_DIRECTORY if self.settings.ARCHIVE_COLD_PARTITIONS else None
+        )
+
+    def run(self):
+        '''
+        Write batches from the queue until a None batch is received.
+        '''
+        database = create_db_connection(
+            self.settings.DATABASE_LOCATION,
+            self.settings.DB_SYNCHRONOUS,
+            self.settings.DB_CACHE_SIZE,
+            self.settings.DB_MMAP_SIZE
+        )
+        cache = IdCache(self.settings.LEDGER_ID_CACHE_SIZE)
+        aggregates = AggregateTracker(self.settings.AGGREGATE_LEDGER_WINDOW)
+        events = None
+        if self.settings.KEY_EVENTS_ENABLED:
+            events = KeyEventPublisher(self.settings.KEY_EVENTS_IP, self.settings.KEY_EVENTS_PORT)
+        partitions = None
+        if database:
+            cache.warm(database)
+            partitions = self.create_partitions(database)
+        batch_count = 0
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                break
+            try:
+                if not database:
+                    database = sqlite3.connect(self.settings.DATABASE_LOCATION)
+                    partitions = self.create_partitions(database)
+                start = time.perf_counter()
+                if db_batch_writer(batch, database, cache, partitions, aggregates, events):
+                    BATCH_SECONDS.observe(time.perf_counter() - start)
+                    MESSAGES_WRITTEN.inc(len(batch))
+                else:
+                    BATCH_ERRORS.inc()
+                batch_count += 1
+                if batch_count % CACHE_STATS_INTERVAL == 0:
+                    logging.info(f"Id cache statistics: {cache.stats()}.")
+            except sqlite3.Error as error:
+                BATCH_ERRORS.inc()
+                logging.warning(f"Unable to connect to the database: {error}.")
+            except Exception as error:
+                BATCH_ERRORS.inc()
+                # Keep the thread alive, as nothing else would write to the database.
+                logging.critical(f"Unexpected error writing a batch to the database: {error}.")
+        if database:
+            database.close()
+        logging.info("Database writer thread stopped.")
+
+    async def put(self, batch):
+        '''
+        Hand a batch to the writer thread. If the queue is full, wait for space without
+        blocking the event loop. The caller stops reading from its own queue while waiting,
+        which propagates backpressure upstream.
+
+        :param list batch: Messages to write
+        '''
+        try:
+            self.batches.put_nowait(batch)
+        except queue.Full:
+            self.backpressure_count += 1
+            logging.warning(f"Database writer queue is full ({self.batches.maxsize} batches). Waiting for the database to catch up. Occurrences: {self.backpressure_count}.")
+            await asyncio.get_event_loop().run_in_executor(None, self.batches.put, batch)
+
+    async def stop(self):
+        '''
+        Write the batches that are already queued, then stop the thread.
+        '''
+        await self.put(None)
+        await asyncio.get_event_loop().run_in_executor(None, self.join)
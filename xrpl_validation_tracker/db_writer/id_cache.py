@@ -0,0 +1,123 @@
+'''
+Cache the database ids of ledger hashes and validator keys, so validations for
+known ledgers and validators can be written without reading from the database.
+'''
+import logging
+import sqlite3
+from collections import OrderedDict
+
+KEY_TABLES = {
+    'ephemeral_keys': 'ephemeral_key',
+    'master_keys': 'master_key',
+}
+
+class IdCache:
+    '''
+    Write-through cache of database ids. Ledger hashes are kept in an LRU cache, as only
+    recent ledgers receive validations. Validator keys are few and long-lived, so all of
+    them are kept.
+
+    New ids are staged until the transaction that created them is committed, so a rolled
+    back batch never leaves ids in the cache that don't exist in the database.
+
+    :param int ledger_cache_size: Number of ledger hashes to cache
+    '''
+    def __init__(self, ledger_cache_size):
+        self.ledger_cache_size = ledger_cache_size
+        self.tables = {'ledgers': OrderedDict()}
+        self.tables.update({table: {} for table in KEY_TABLES})
+        self.staged = {table: {} for table in self.tables}
+        self.hits = {table: 0 for table in self.tables}
+        self.misses = {table: 0 for table in self.tables}
+
+    def warm(self, connection):
+        '''
+        Load all validator keys and the most recent ledgers from the database.
+
+        :param connection: Connection to the SQL database
+        '''
+        try:
+            cursor = connection.cursor()
+            for table, column in KEY_TABLES.items():
+                cursor.execute(f"SELECT {column}, rowid FROM {table}")
+                self.tables[table].update(cursor.fetchall())
+            cursor.execute(
+                "SELECT hash, rowid FROM ledgers ORDER BY rowid DESC LIMIT ?",
+                (self.ledger_cache_size,)
+            )
+            # Insert the oldest ledger first, so it's the first to be evicted.
+            self.tables['ledgers'].update(reversed(cursor.fetchall()))
+            logging.info(f"Warmed the id cache with: {self.sizes()} entries.")
+        except sqlite3.Error as error:
+            logging.warning(f"Unable to warm the id cache: {error}.")
+
+    def lookup(self, table, values):
+        '''
+        Split values into those with cached ids and those that must be queried.
+
+        :param str table: Table the values are stored in
+        :param values: Values to look up
+        :returns: Cached ids keyed by value, and a list of values that weren't cached
+        :rtype: tuple
+        '''
+        cache = self.tables[table]
+        found = {}
+        missing = []
+        for value in values:
+            value_id = cache.get(value)
+            if value_id is None:
+                missing.append(value)
+            else:
+                found[value] = value_id
+                if table == 'ledgers':
+                    cache.move_to_end(value)
+        self.hits[table] += len(found)
+        self.misses[table] += len(missing)
+        return found, missing
+
+    def stage(self, table, ids):
+        '''
+        Hold ids read from or written to the database until the transaction commits.
+
+        :param str table: Table the ids belong to
+        :param dict ids: Database ids keyed by value
+        '''
+        self.staged[table].update(ids)
+
+    def commit(self):
+        '''
+        Move staged ids into the cache, evicting the least recently used ledgers.
+        '''
+        for table, ids in self.staged.items():
+            self.tables[table].update(ids)
+            ids.clear()
+        ledgers = self.tables['ledgers']
+        while len(ledgers) > self.ledger_cache_size:
+            ledgers.popitem(last=False)
+
+    def rollback(self):
+        '''
+        Discard staged ids.
+        '''
+        for ids in self.staged.values():
+            ids.clear()
+
+    def sizes(self):
+        '''
+        :returns: Number of cached ids in each table
+        :rtype: dict
+        '''
+        return {table: len(cache) for table, cache in self.tables.items()}
+
+    def stats(self):
+        '''
+        :returns: Cache hits, misses, and size for each table
+        :rtype: dict
+        '''
+        return {
+            table: {
+                'hits': self.hits[table],
+                'misses': self.misses[table],
+                'size': len(self.tables[table]),
+            } for table in self.tables
+        }
@@ -0,0 +1,101 @@
+'''
+Notify supplemental_data when the db_writer stores a new validator key, so the key's
+manifest and TOML file are looked up within seconds rather than at the next poll.
+
+Events are JSON datagrams sent over UDP to a local port: {"master_keys": [...]}.
+Delivery isn't guaranteed, so supplemental_data still polls for new keys.
+'''
+import asyncio
+import json
+import logging
+import socket
+
+KEYS_PER_DATAGRAM = 500 # Keeps each datagram well below the maximum UDP payload
+
+class KeyEventPublisher:
+    '''
+    Send master keys that are new, or that have a new ephemeral key. Like the IdCache,
+    keys are staged until the transaction that stored them commits.
+
+    :param str ip: IP supplemental_data listens on
+    :param int port: Port supplemental_data listens on
+    '''
+    def __init__(self, ip, port):
+        self.address = (ip, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.staged = set()
+
+    def stage(self, keys):
+        '''
+        :param keys: Master keys to send once the transaction commits
+        '''
+        self.staged.update(keys)
+
+    def commit(self):
+        '''
+        Send the staged keys.
+        '''
+        keys = sorted(self.staged)
+        self.staged = set()
+        for i in range(0, len(keys), KEYS_PER_DATAGRAM):
+            try:
+                self.socket.sendto(
+                    json.dumps({'master_keys': keys[i:i + KEYS_PER_DATAGRAM]}).encode(),
+                    self.address
+                )
+            except OSError as error:
+                logging.info(f"Unable to send new key events to: {self.address}. Error: {error}.")
+                return
+        if keys:
+            logging.info(f"Sent events for: {len(keys)} new validator keys.")
+
+    def rollback(self):
+        '''
+        Discard the staged keys.
+        '''
+        self.staged = set()
+
+class KeyEventListener(asyncio.DatagramProtocol):
+    '''
+    Collect master keys from new key events.
+    '''
+    def __init__(self):
+        self.keys = set()
+        self.received = asyncio.Event()
+
+    def datagram_received(self, data, addr):
+        try:
+            keys = json.loads(data)['master_keys']
+        except (ValueError, KeyError, TypeError) as error:
+            logging.info(f"Ignoring an invalid key event from: {addr}. Error: {error}.")
+            return
+        self.keys.update(i for i in keys if isinstance(i, str))
+        self.received.set()
+
+    def take(self):
+        '''
+        :returns: Keys received since the last call
+        :rtype: set
+        '''
+        keys = self.keys
+        self.keys = set()
+        self.received.clear()
+        return keys
+
+async def start_key_event_listener(ip, port):
+    '''
+    :param str ip: IP to listen on
+    :param int port: Port to listen on
+    :returns: Listener, or None if the port couldn't be opened
+    :rtype: KeyEventListener
+    '''
+    try:
+        _, listener = await asyncio.get_event_loop().create_datagram_endpoint(
+            KeyEventListener, local_addr=(ip, port)
+        )
+        logging.info(f"Listening for new key events on: {ip}:{port}.")
+        return listener
+    except OSError as error:
+        logging.error(f"Unable to listen for new key events on: {ip}:{port}. Error: {error}.")
+        return None
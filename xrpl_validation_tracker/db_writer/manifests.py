@@ -0,0 +1,185 @@
+'''
+Convert between manifestReceived stream messages and serialized manifests. Manifests
+from the stream are stored in the same base64 format the `manifest` command returns,
+so a manifest has one row in the manifests table whichever way it arrived.
+'''
+import base64
+import hashlib
+
+XRPL_ALPHABET = 'rpshnaf39wBUDNEGHJKLM4PQRST7VWXYZ2bcdeCg65jkm8oFqi1tuvAxyz'
+NODE_PUBLIC_PREFIX = b'\x1c'
+NODE_PUBLIC_LENGTH = 38 # Prefix, 33 byte key, and 4 byte checksum
+MANIFEST_FIELDS = ('master_key', 'seq', 'master_signature')
+
+UINT32 = 2 # Type code of 32 bit unsigned integer fields
+BLOB = 7 # Type code of variable length fields
+
+# (type code, field code) of each manifest field, in canonical order
+SEQUENCE = (UINT32, 4)
+PUBLIC_KEY = (BLOB, 1)
+SIGNING_PUB_KEY = (BLOB, 3)
+SIGNATURE = (BLOB, 6)
+DOMAIN = (BLOB, 7)
+MASTER_SIGNATURE = (BLOB, 18)
+
+def checksum(data):
+    '''
+    :param bytes data: Data to check
+    :returns: First four bytes of the data's double SHA-256 hash
+    :rtype: bytes
+    '''
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4]
+
+def decode_node_public_key(key):
+    '''
+    :param str key: Base58 node public key. For example, 'nHB8QMKGt9VB4Vg71VszjBVQnDW3v3QudM4DwFaJfy96bj4Pv9fA'
+    :returns: 33 byte public key
+    :rtype: bytes
+    '''
+    number = 0
+    for character in key:
+        number = number * 58 + XRPL_ALPHABET.index(character)
+    try:
+        data = number.to_bytes(NODE_PUBLIC_LENGTH, 'big')
+    except OverflowError:
+        raise ValueError(f"Invalid node public key: {key}")
+    if data[:1] != NODE_PUBLIC_PREFIX or checksum(data[:-4]) != data[-4:]:
+        raise ValueError(f"Invalid node public key: {key}")
+    return data[1:-4]
+
+def encode_node_public_key(key):
+    '''
+    :param bytes key: 33 byte public key
+    :returns: Base58 node public key
+    :rtype: str
+    '''
+    data = NODE_PUBLIC_PREFIX + key
+    data += checksum(data)
+    number = int.from_bytes(data, 'big')
+    characters = []
+    while number:
+        number, remainder = divmod(number, 58)
+        characters.append(XRPL_ALPHABET[remainder])
+    return ''.join(reversed(characters))
+
+def field_header(field):
+    '''
+    :param tuple field: (type code, field code)
+    :rtype: bytes
+    '''
+    type_code, field_code = field
+    if field_code < 16:
+        return bytes([type_code << 4 | field_code])
+    return bytes([type_code << 4, field_code])
+
+def encode_length(length):
+    '''
+    :param int length: Length of a variable length field
+    :rtype: bytes
+    '''
+    if length <= 192:
+        return bytes([length])
+    if length <= 12480:
+        length -= 193
+        return bytes([193 + (length >> 8), length & 0xff])
+    length -= 12481
+    return bytes([241 + (length >> 16), (length >> 8) & 0xff, length & 0xff])
+
+def serialize_manifest(fields):
+    '''
+    :param dict fields: Field values, keyed by (type code, field code)
+    :returns: Fields serialized in canonical order
+    :rtype: bytes
+    '''
+    data = b''
+    for field in sorted(fields):
+        data += field_header(field)
+        if field[0] == UINT32:
+            data += fields[field].to_bytes(4, 'big')
+        else:
+            data += encode_length(len(fields[field])) + fields[field]
+    return data
+
+def as_bytes(value):
+    '''
+    :param value: Hex string, or bytes if the message was decoded on receipt
+    :rtype: bytes
+    '''
+    return value if isinstance(value, bytes) else bytes.fromhex(value)
+
+def manifest_from_message(message):
+    '''
+    Rebuild the manifest a manifestReceived message was published from.
+
+    :param dict message: manifestReceived message from the manifests stream
+    :returns: Base64 encoded manifest
+    :rtype: str
+    '''
+    fields = {
+        SEQUENCE: int(message['seq']),
+        PUBLIC_KEY: decode_node_public_key(message['master_key']),
+        MASTER_SIGNATURE: as_bytes(message['master_signature']),
+    }
+    # Revocations have no ephemeral key
+    if message.get('signing_key'):
+        fields[SIGNING_PUB_KEY] = decode_node_public_key(message['signing_key'])
+        fields[SIGNATURE] = as_bytes(message['signature'])
+    if message.get('domain'):
+        fields[DOMAIN] = message['domain'].encode()
+    return base64.b64encode(serialize_manifest(fields)).decode()
+
+def parse_manifest(data):
+    '''
+    :param bytes data: Serialized manifest
+    :returns: Field values, keyed by (type code, field code)
+    :rtype: dict
+    '''
+    fields = {}
+    position = 0
+    try:
+        while position < len(data):
+            type_code, field_code = data[position] >> 4, data[position] & 0x0f
+            position += 1
+            if type_code == 0:
+                type_code = data[position]
+                position += 1
+            if field_code == 0:
+                field_code = data[position]
+                position += 1
+            if type_code == UINT32:
+                fields[(type_code, field_code)] = int.from_bytes(data[position:position + 4], 'big')
+                position += 4
+                continue
+            if type_code != BLOB:
+                raise ValueError(f"Unexpected field type: {type_code} in manifest")
+            length = data[position]
+            position += 1
+            if 193 <= length <= 240:
+                length = 193 + (length - 193) * 256 + data[position]
+                position += 1
+            elif length > 240:
+                length = 12481 + (length - 241) * 65536 + data[position] * 256 + data[position + 1]
+                position += 2
+            fields[(type_code, field_code)] = data[position:position + length]
+            position += length
+    except IndexError:
+        raise ValueError("Truncated manifest")
+    if position != len(data):
+        raise ValueError("Truncated manifest")
+    return fields
+
+def decode_manifest(manifest):
+    '''
+    :param str manifest: Base64 encoded manifest
+    :returns: master_key, ephemeral_key, seq, domain, signature, and master_signature
+    :rtype: dict
+    '''
+    fields = parse_manifest(base64.b64decode(manifest))
+    return {
+        'master_key': encode_node_public_key(fields[PUBLIC_KEY]),
+        'ephemeral_key': encode_node_public_key(fields[SIGNING_PUB_KEY]) if SIGNING_PUB_KEY in fields else '',
+        'seq': fields[SEQUENCE],
+        'domain': fields.get(DOMAIN, b'').decode(),
+        'signature': fields.get(SIGNATURE, b'').hex().upper(),
+        'master_signature': fields[MASTER_SIGNATURE].hex().upper(),
+    }
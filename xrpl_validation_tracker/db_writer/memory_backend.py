@@ -0,0 +1,93 @@
+'''
+In-memory storage backend, for testing code that uses a StorageBackend without a
+database server or file.
+'''
+from .sqlite_writer import RIPPLED_TIME_OFFSET, manifest_rows, split_messages
+from .storage import MESSAGES_WRITTEN, StorageBackend
+
+MASTER_KEY_FIELDS = ('domain', 'dunl', 'network', 'server_country', 'owner_country', 'toml_verified')
+
+class MemoryBackend(StorageBackend):
+    '''
+    Keep everything the tracker writes in dictionaries. Data is lost when the process exits.
+
+    :param settings: Configuration file
+    '''
+    def __init__(self, settings=None):
+        super().__init__(settings)
+        self.master_keys = {} # Master key: supplemental data, keyed by MASTER_KEY_FIELDS
+        self.ephemeral_keys = {} # Ephemeral key: master key, or None
+        self.manifests = {} # Manifest: (master_key, sequence)
+        self.ledgers = {} # Ledger hash: ledgerClosed message
+        self.validations = set() # (ephemeral_key, ledger_hash) pairs
+        self.key_activity = {} # Master key: UNIX time of its newest validation
+        self.key_freshness = {}
+        self.domain_freshness = {}
+
+    def add_master_key(self, master_key):
+        '''
+        :param str master_key: Master key to add, if it isn't already stored
+        '''
+        self.master_keys.setdefault(master_key, dict.fromkeys(MASTER_KEY_FIELDS))
+
+    async def write_batch(self, messages):
+        messages_validation, messages_ledger, messages_manifest = split_messages(messages)
+        for message in messages_validation:
+            self.add_master_key(message['master_key'])
+            self.ephemeral_keys.setdefault(message['validation_public_key'], message['master_key'])
+            self.validations.add((message['validation_public_key'], message['ledger_hash']))
+            signing_time = message['signing_time'] + RIPPLED_TIME_OFFSET
+            if signing_time > self.key_activity.get(message['master_key'], 0):
+                self.key_activity[message['master_key']] = signing_time
+        for message in messages_ledger:
+            self.ledgers[message['ledger_hash']] = message
+        for row in manifest_rows(messages_manifest):
+            self.add_master_key(row[1])
+            if row[2]:
+                self.ephemeral_keys[row[2]] = row[1]
+            self.manifests.setdefault(row[0], (row[1], row[5]))
+        MESSAGES_WRITTEN.inc(len(messages))
+
+    async def get_master_keys(self):
+        return [
+            (master_key,) + tuple(fields[i] for i in MASTER_KEY_FIELDS)
+            for master_key, fields in self.master_keys.items()
+        ]
+
+    async def update_master_keys(self, data):
+        for row in data:
+            if row[-1] in self.master_keys:
+                self.master_keys[row[-1]] = dict(zip(MASTER_KEY_FIELDS, row[:-1]))
+
+    async def update_ephemeral_keys(self, data):
+        for master_key, ephemeral_key in data:
+            if ephemeral_key in self.ephemeral_keys:
+                self.ephemeral_keys[ephemeral_key] = master_key if master_key in self.master_keys else None
+
+    async def write_manifests(self, data):
+        for manifest, _, _, sequence, master_key, _ in data:
+            self.manifests.setdefault(manifest, (master_key, sequence))
+
+    async def get_latest_manifests(self):
+        latest = {}
+        for manifest, (master_key, sequence) in self.manifests.items():
+            if master_key in self.master_keys and sequence >= latest.get(master_key, ('', -1))[1]:
+                latest[master_key] = (manifest, sequence)
+        return {master_key: i[0] for master_key, i in latest.items()}
+
+    async def get_key_freshness(self):
+        return dict(self.key_freshness)
+
+    async def update_key_freshness(self, data):
+        for master_key, manifest_sequence, checked in data:
+            self.key_freshness[master_key] = (manifest_sequence, checked)
+
+    async def get_domain_freshness(self):
+        return dict(self.domain_freshness)
+
+    async def update_domain_freshness(self, data):
+        for domain, etag, last_modified, checked in data:
+            self.domain_freshness[domain] = (etag, last_modified, checked)
+
+    async def get_key_activity(self):
+        return dict(self.key_activity)
@@ -0,0 +1,314 @@
+'''
+Split the validation_stream table into database files that each hold a fixed range of
+ledger sequences. A catalog table in the main database records each partition's
+location, ledger range, and time range, so queries only open the partitions they need.
+'''
+import logging
+import os
+import sqlite3
+
+from .archive import export_range
+from .sqlite_writer import insert_new_rows
+
+CATALOG_TABLE = """CREATE TABLE IF NOT EXISTS partitions (
+                    partition_id INT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    first_sequence INT NOT NULL,
+                    last_sequence INT NOT NULL,
+                    first_signing_time INT,
+                    last_signing_time INT,
+                    validation_count INT NOT NULL DEFAULT 0,
+                    state TEXT NOT NULL DEFAULT 'hot'
+                );"""
+
+PARTITION_TABLE = """CREATE TABLE IF NOT EXISTS {schema}.validation_stream (
+                    ephemeral_key INT NOT NULL,
+                    ledger_hash INT NOT NULL,
+                    master_key INT NOT NULL,
+                    signing_time INT NOT NULL,
+                    partial_validation BOOLEAN NOT NULL,
+                    PRIMARY KEY (ephemeral_key, ledger_hash)
+                ) WITHOUT ROWID;"""
+
+PARTITION_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS {schema}.validation_stream_master_key ON validation_stream (master_key);",
+    "CREATE INDEX IF NOT EXISTS {schema}.validation_stream_signing_time ON validation_stream (signing_time);",
+    "CREATE INDEX IF NOT EXISTS {schema}.validation_stream_ledger_hash ON validation_stream (ledger_hash);",
+)
+
+# SQLite allows 10 attached databases by default.
+MAX_ATTACHED = 8
+
+def schema_name(partition_id):
+    '''
+    :param int partition_id: Partition number
+    :returns: Name the partition is attached as
+    :rtype: str
+    '''
+    return f"p{partition_id}"
+
+def compact_partition(path):
+    '''
+    Rebuild a partition file that will no longer be written to, so it uses as little
+    space as possible.
+
+    :param str path: Partition file location
+    '''
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA journal_mode=DELETE;")
+        connection.execute("VACUUM;")
+    finally:
+        connection.close()
+
+class PartitionManager:
+    '''
+    Route validations into per-period partition files attached to the main database
+    connection. The newest partitions stay attached. Older partitions are detached
+    and compacted when a new partition is created.
+
+    :param connection: Connection to the main database
+    :param str directory: Directory to store partition files in
+    :param int partition_ledgers: Number of ledger sequences in each partition
+    :param int partitions_hot: Number of recent partitions to keep attached
+    :param str archive_directory: Directory to write archives of cold partitions to, or None
+    '''
+    def __init__(self, connection, directory, partition_ledgers, partitions_hot, archive_directory=None):
+        self.connection = connection
+        self.directory = directory
+        self.archive_directory = archive_directory
+        self.partition_ledgers = partition_ledgers
+        self.partitions_hot = min(max(partitions_hot, 1), MAX_ATTACHED)
+        self.attached = set()
+        self.known = {}
+        os.makedirs(directory, exist_ok=True)
+        if archive_directory:
+            os.makedirs(archive_directory, exist_ok=True)
+        connection.execute(CATALOG_TABLE)
+        connection.commit()
+        for partition_id, state in connection.execute("SELECT partition_id, state FROM partitions"):
+            self.known[partition_id] = state
+
+    def partition_id(self, sequence):
+        '''
+        :param sequence: Ledger sequence
+        :returns: Partition the ledger belongs to
+        :rtype: int
+        '''
+        return int(sequence) // self.partition_ledgers
+
+    def path(self, partition_id):
+        '''
+        :param int partition_id: Partition number
+        :returns: Partition file location
+        :rtype: str
+        '''
+        first_sequence = partition_id * self.partition_ledgers
+        return os.path.join(self.directory, f"validations_{first_sequence}.sqlite3")
+
+    def attach(self, partition_id):
+        '''
+        Attach a partition, creating it and its catalog entry if needed. This must not be
+        called inside a transaction.
+
+        :param int partition_id: Partition number
+        '''
+        if partition_id in self.attached:
+            return
+        if len(self.attached) >= MAX_ATTACHED:
+            self.detach(min(self.attached))
+        schema = schema_name(partition_id)
+        path = self.path(partition_id)
+        self.connection.execute("ATTACH DATABASE ? AS " + schema, (path,))
+        self.connection.execute(f"PRAGMA {schema}.journal_mode=WAL;")
+        self.connection.execute(PARTITION_TABLE.format(schema=schema))
+        for index in PARTITION_INDEXES:
+            self.connection.execute(index.format(schema=schema))
+        self.attached.add(partition_id)
+        if partition_id not in self.known:
+            self.connection.execute(
+                '''INSERT OR IGNORE INTO partitions (partition_id, path, first_sequence, last_sequence)
+                VALUES (?, ?, ?, ?)''',
+                (
+                    partition_id,
+                    path,
+                    partition_id * self.partition_ledgers,
+                    (partition_id + 1) * self.partition_ledgers - 1,
+                )
+            )
+            self.known[partition_id] = 'hot'
+            logging.info(f"Created database partition: {path}.")
+        self.connection.commit()
+
+    def detach(self, partition_id):
+        '''
+        Detach a partition. This must not be called inside a transaction.
+
+        :param int partition_id: Partition number
+        '''
+        self.connection.execute("DETACH DATABASE " + schema_name(partition_id))
+        self.attached.discard(partition_id)
+
+    def prepare(self, messages):
+        '''
+        Attach the partitions a batch of validations will be written to, before the
+        batch's transaction begins.
+
+        :param list messages: Validation stream messages
+        '''
+        for partition_id in {self.partition_id(i['ledger_index']) for i in messages}:
+            self.attach(partition_id)
+
+    def write(self, data, sequences):
+        '''
+        Insert validation_stream rows into their partitions and update the catalog. The
+        caller is responsible for committing the transaction.
+
+        :param list data: validation_stream rows
+        :param list sequences: Ledger sequence for each row
+        :returns: Whether each row was inserted, rather than ignored as a duplicate
+        :rtype: list
+        '''
+        rows = {}
+        for index, (row, sequence) in enumerate(zip(data, sequences)):
+            rows.setdefault(self.partition_id(sequence), []).append((index, row))
+        inserted = [False] * len(data)
+        for partition_id, partition_rows in rows.items():
+            sql = f''' INSERT OR IGNORE INTO {schema_name(partition_id)}.validation_stream (
+                    ledger_hash,
+                    ephemeral_key,
+                    master_key,
+                    signing_time,
+                    partial_validation
+                    )
+                    VALUES(?,?,?,?,?)'''
+            partition_inserted = insert_new_rows(self.connection, sql, [i[1] for i in partition_rows])
+            for (index, _), new in zip(partition_rows, partition_inserted):
+                inserted[index] = new
+            signing_times = [i[1][3] for i in partition_rows]
+            self.connection.execute(
+                '''UPDATE partitions SET
+                    first_signing_time = MIN(IFNULL(first_signing_time, ?), ?),
+                    last_signing_time = MAX(IFNULL(last_signing_time, ?), ?),
+                    validation_count = validation_count + ?
+                WHERE partition_id = ?''',
+                (
+                    min(signing_times), min(signing_times),
+                    max(signing_times), max(signing_times),
+                    sum(inserted[i[0]] for i in partition_rows),
+                    partition_id,
+                )
+            )
+        return inserted
+
+    def archive(self, partition_id):
+        '''
+        Write a cold partition into a columnar archive.
+
+        :param int partition_id: Partition number
+        '''
+        first_sequence = partition_id * self.partition_ledgers
+        path = os.path.join(self.archive_directory, f"validations_{first_sequence}.xvta")
+        count = export_range(
+            self.connection,
+            first_sequence,
+            first_sequence + self.partition_ledgers - 1,
+            path
+        )
+        self.connection.execute(
+            "UPDATE partitions SET state = 'archived' WHERE partition_id = ?",
+            (partition_id,)
+        )
+        self.connection.commit()
+        self.known[partition_id] = 'archived'
+        logging.info(f"Archived: {count} validations from database partition: {partition_id} to: {path}.")
+
+    def roll(self):
+        '''
+        Detach partitions that are no longer among the most recent, and compact hot
+        partitions that have become cold. Called after each batch is committed.
+        '''
+        hot = set(sorted(self.known)[-self.partitions_hot:])
+        for partition_id in self.attached - hot:
+            self.detach(partition_id)
+        for partition_id, state in list(self.known.items()):
+            if state == 'hot' and partition_id not in hot:
+                path = self.path(partition_id)
+                try:
+                    compact_partition(path)
+                    self.connection.execute(
+                        "UPDATE partitions SET state = 'cold' WHERE partition_id = ?",
+                        (partition_id,)
+                    )
+                    self.connection.commit()
+                    self.known[partition_id] = 'cold'
+                    logging.info(f"Compacted cold database partition: {path}.")
+                    if self.archive_directory:
+                        self.archive(partition_id)
+                except (sqlite3.Error, OSError) as error:
+                    logging.warning(f"Unable to compact or archive database partition: {path}. Error: {error}.")
+
+def select_partitions(connection, first_sequence=None, last_sequence=None, first_time=None, last_time=None):
+    '''
+    Find the partitions that may contain validations in a ledger sequence or time range.
+
+    :param connection: Connection to the main database
+    :param int first_sequence: Lowest ledger sequence
+    :param int last_sequence: Highest ledger sequence
+    :param int first_time: Earliest signing time (UNIX time)
+    :param int last_time: Latest signing time (UNIX time)
+    :returns: (partition_id, path) rows
+    :rtype: list
+    '''
+    catalog = connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'partitions'"
+    ).fetchall()
+    if not catalog:
+        return []
+    sql = "SELECT partition_id, path FROM partitions WHERE 1"
+    parameters = []
+    if first_sequence is not None:
+        sql += " AND last_sequence >= ?"
+        parameters.append(first_sequence)
+    if last_sequence is not None:
+        sql += " AND first_sequence <= ?"
+        parameters.append(last_sequence)
+    if first_time is not None:
+        sql += " AND IFNULL(last_signing_time >= ?, 1)"
+        parameters.append(first_time)
+    if last_time is not None:
+        sql += " AND IFNULL(first_signing_time <= ?, 1)"
+        parameters.append(last_time)
+    return connection.execute(sql + " ORDER BY partition_id", parameters).fetchall()
+
+def iter_validations(connection, first_sequence, last_sequence):
+    '''
+    Yield validations for a range of ledger sequences, reading only the partitions that
+    cover the range, plus the main validation_stream table.
+
+    :param connection: Connection to the main database
+    :param int first_sequence: Lowest ledger sequence
+    :param int last_sequence: Highest ledger sequence
+    :returns: (sequence, ledger_hash, master_key, ephemeral_key, signing_time, partial_validation) rows
+    '''
+    query = '''SELECT ledgers.sequence, ledgers.hash, master_keys.master_key,
+            ephemeral_keys.ephemeral_key, v.signing_time, v.partial_validation
+        FROM {table} AS v
+        JOIN ledgers ON ledgers.rowid = v.ledger_hash
+        JOIN master_keys ON master_keys.rowid = v.master_key
+        JOIN ephemeral_keys ON ephemeral_keys.rowid = v.ephemeral_key
+        WHERE ledgers.sequence BETWEEN ? AND ?
+        ORDER BY ledgers.sequence'''
+
+    yield from connection.execute(query.format(table='validation_stream'), (first_sequence, last_sequence))
+
+    for partition_id, path in select_partitions(connection, first_sequence, last_sequence):
+        schema = "query_" + schema_name(partition_id)
+        connection.execute("ATTACH DATABASE ? AS " + schema, (path,))
+        try:
+            yield from connection.execute(
+                query.format(table=schema + ".validation_stream"),
+                (first_sequence, last_sequence)
+            ).fetchall()
+        finally:
+            connection.execute("DETACH DATABASE " + schema)
@@ -0,0 +1,369 @@
+'''
+PostgreSQL storage backend. Requires `asyncpg`.
+'''
+import logging
+import time
+
+import asyncpg
+
+from .id_cache import IdCache
+from .sqlite_writer import RIPPLED_TIME_OFFSET, manifest_rows, split_messages
+from .storage import BATCH_ERRORS, BATCH_SECONDS, MESSAGES_WRITTEN, StorageBackend
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS ledgers (
+        id BIGSERIAL PRIMARY KEY,
+        hash BYTEA UNIQUE NOT NULL,
+        sequence BIGINT NOT NULL,
+        signing_time BIGINT,
+        txn_count INT,
+        fee_base BIGINT,
+        fee_ref BIGINT,
+        reserve_base BIGINT,
+        reserve_inc BIGINT,
+        chain TEXT
+    );""",
+    """CREATE TABLE IF NOT EXISTS ephemeral_keys (
+        id BIGSERIAL PRIMARY KEY,
+        ephemeral_key TEXT UNIQUE NOT NULL,
+        master_key BIGINT
+    );""",
+    """CREATE TABLE IF NOT EXISTS master_keys (
+        id BIGSERIAL PRIMARY KEY,
+        master_key TEXT UNIQUE NOT NULL,
+        domain TEXT,
+        dunl BOOLEAN,
+        network TEXT,
+        server_country TEXT,
+        owner_country TEXT,
+        toml_verified BOOLEAN
+    );""",
+    """CREATE TABLE IF NOT EXISTS validation_stream (
+        ephemeral_key BIGINT NOT NULL,
+        ledger_hash BIGINT NOT NULL,
+        master_key BIGINT NOT NULL,
+        signing_time BIGINT NOT NULL,
+        partial_validation BOOLEAN NOT NULL,
+        PRIMARY KEY (ephemeral_key, ledger_hash)
+    );""",
+    """CREATE TABLE IF NOT EXISTS manifests (
+        manifest TEXT PRIMARY KEY,
+        master_key BIGINT,
+        ephemeral_key BIGINT,
+        manifest_sig_master TEXT,
+        manifest_sig_eph TEXT,
+        sequence BIGINT
+    );""",
+    """CREATE TABLE IF NOT EXISTS key_freshness (
+        master_key TEXT PRIMARY KEY,
+        manifest_sequence BIGINT,
+        checked BIGINT NOT NULL
+    );""",
+    """CREATE TABLE IF NOT EXISTS domain_freshness (
+        domain TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        checked BIGINT NOT NULL
+    );""",
+    "CREATE INDEX IF NOT EXISTS ledgers_sequence ON ledgers (sequence);",
+    "CREATE INDEX IF NOT EXISTS validation_stream_master_key ON validation_stream (master_key);",
+    "CREATE INDEX IF NOT EXISTS validation_stream_signing_time ON validation_stream (signing_time);",
+)
+
+VALIDATION_COLUMNS = ('ephemeral_key', 'ledger_hash', 'master_key', 'signing_time', 'partial_validation')
+
+class PostgresBackend(StorageBackend):
+    '''
+    Write to PostgreSQL through a connection pool. Ids are resolved with multi-row upserts,
+    and validations are loaded with COPY.
+
+    :param settings: Configuration file
+    '''
+    errors = (asyncpg.PostgresError, OSError)
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.pool = None
+        self.cache = None
+
+    async def start(self):
+        self.pool = await asyncpg.create_pool(
+            self.settings.POSTGRES_DSN,
+            min_size=1,
+            max_size=self.settings.POSTGRES_POOL_SIZE,
+        )
+        async with self.pool.acquire() as connection:
+            for statement in SCHEMA:
+                await connection.execute(statement)
+        logging.info("Connected to PostgreSQL.")
+
+    async def stop(self):
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+        logging.info("PostgreSQL connection pool closed.")
+
+    async def get_ids(self, connection, table, column, values, extra_columns=(), extra_types=(), value_type='text[]'):
+        '''
+        Return ids for values, inserting the values that don't exist yet.
+
+        :param connection: Database connection
+        :param str table: Table to query. For example, 'ephemeral_keys'
+        :param str column: Column in the table to search. For example, 'ephemeral_key'
+        :param dict values: Rows to insert if missing, keyed by the value in column
+        :param tuple extra_columns: Additional columns in each row
+        :param tuple extra_types: PostgreSQL array types for the additional columns
+        :param str value_type: PostgreSQL array type for the values
+        :returns: Database ids, keyed by value
+        :rtype: dict
+        '''
+        ids, uncached = self.cache.lookup(table, values)
+        if not uncached:
+            return ids
+        columns = (column,) + tuple(extra_columns)
+        types = (value_type,) + tuple(extra_types)
+        arrays = [list(i) for i in zip(*(values[value] for value in uncached))]
+        parameters = ', '.join(f"${i + 1}::{types[i]}" for i in range(len(columns)))
+        await connection.execute(
+            f'''INSERT INTO {table} ({', '.join(columns)})
+            SELECT * FROM unnest({parameters})
+            ON CONFLICT ({column}) DO NOTHING''',
+            *arrays
+        )
+        rows = await connection.fetch(
+            f"SELECT {column}, id FROM {table} WHERE {column} = ANY($1::{value_type})",
+            uncached
+        )
+        ids_db = {row[0]: row[1] for row in rows}
+        self.cache.stage(table, ids_db)
+        ids.update(ids_db)
+        return ids
+
+    async def write_validations(self, connection, messages):
+        '''
+        Resolve ids, then COPY validations into a staging table and merge them.
+
+        :param connection: Database connection inside a transaction
+        :param list messages: Validation stream messages
+        '''
+        ledger_ids = await self.get_ids(
+            connection, 'ledgers', 'hash',
+            {
+                i['ledger_hash']: (i['ledger_hash'], int(i['ledger_index']), i['signing_time'])
+                for i in messages
+            },
+            ('sequence', 'signing_time'),
+            ('bigint[]', 'bigint[]'),
+            'bytea[]',
+        )
+        ephemeral_key_ids = await self.get_ids(
+            connection, 'ephemeral_keys', 'ephemeral_key',
+            {i['validation_public_key']: (i['validation_public_key'],) for i in messages},
+        )
+        master_key_ids = await self.get_ids(
+            connection, 'master_keys', 'master_key',
+            {i['master_key']: (i['master_key'],) for i in messages},
+        )
+        records = [
+            (
+                ephemeral_key_ids[i['validation_public_key']],
+                ledger_ids[i['ledger_hash']],
+                master_key_ids[i['master_key']],
+                i['signing_time'] + RIPPLED_TIME_OFFSET,
+                not i['full'],
+            ) for i in messages
+        ]
+        await connection.execute(
+            '''CREATE TEMP TABLE IF NOT EXISTS validation_stream_load
+            (LIKE validation_stream INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'''
+        )
+        await connection.copy_records_to_table(
+            'validation_stream_load', records=records, columns=VALIDATION_COLUMNS
+        )
+        await connection.execute(
+            '''INSERT INTO validation_stream SELECT * FROM validation_stream_load
+            ON CONFLICT DO NOTHING'''
+        )
+
+    async def write_ledgers(self, connection, messages):
+        '''
+        Update ledgers with data from the ledger stream.
+
+        :param connection: Database connection inside a transaction
+        :param list messages: Ledger stream messages
+        '''
+        columns = list(zip(*(
+            (
+                i['ledger_hash'],
+                i['txn_count'],
+                i['fee_base'],
+                i['fee_ref'],
+                i['reserve_base'],
+                i['reserve_inc'],
+            ) for i in messages
+        )))
+        await connection.execute(
+            '''UPDATE ledgers SET
+                txn_count = u.txn_count,
+                fee_base = u.fee_base,
+                fee_ref = u.fee_ref,
+                reserve_base = u.reserve_base,
+                reserve_inc = u.reserve_inc
+            FROM unnest($1::bytea[], $2::int[], $3::bigint[], $4::bigint[], $5::bigint[], $6::bigint[])
+                AS u(hash, txn_count, fee_base, fee_ref, reserve_base, reserve_inc)
+            WHERE ledgers.hash = u.hash''',
+            *[list(i) for i in columns]
+        )
+
+    async def write_manifest_stream(self, connection, messages):
+        '''
+        Write manifests from the manifests stream, and map their ephemeral keys to master keys.
+
+        :param connection: Database connection inside a transaction
+        :param list messages: Manifest stream messages
+        '''
+        rows = manifest_rows(messages)
+        if not rows:
+            return
+        master_key_ids = await self.get_ids(
+            connection, 'master_keys', 'master_key', {i[1]: (i[1],) for i in rows},
+        )
+        ephemeral_key_ids = await self.get_ids(
+            connection, 'ephemeral_keys', 'ephemeral_key', {i[2]: (i[2],) for i in rows if i[2]},
+        )
+        await connection.executemany(
+            "UPDATE ephemeral_keys SET master_key = $1 WHERE id = $2",
+            [(master_key_ids[i[1]], ephemeral_key_ids[i[2]]) for i in rows if i[2]]
+        )
+        await connection.executemany(
+            '''INSERT INTO manifests (
+                manifest,
+                master_key,
+                ephemeral_key,
+                manifest_sig_master,
+                manifest_sig_eph,
+                sequence
+            )
+            VALUES ($1, $2, $3, $4, $5, $6)
+            ON CONFLICT (manifest) DO NOTHING''',
+            [
+                (i[0], master_key_ids[i[1]], ephemeral_key_ids.get(i[2]), i[3], i[4], i[5])
+                for i in rows
+            ]
+        )
+
+    async def write_batch(self, messages):
+        messages_validation, messages_ledger, messages_manifest = split_messages(messages)
+        if not self.cache:
+            self.cache = IdCache(self.settings.LEDGER_ID_CACHE_SIZE)
+
+        start = time.perf_counter()
+        try:
+            async with self.pool.acquire() as connection:
+                async with connection.transaction():
+                    if messages_validation:
+                        await self.write_validations(connection, messages_validation)
+                    if messages_ledger:
+                        await self.write_ledgers(connection, messages_ledger)
+                    if messages_manifest:
+                        await self.write_manifest_stream(connection, messages_manifest)
+            self.cache.commit()
+            BATCH_SECONDS.observe(time.perf_counter() - start)
+            MESSAGES_WRITTEN.inc(len(messages))
+        except (asyncpg.PostgresError, OSError) as error:
+            self.cache.rollback()
+            BATCH_ERRORS.inc()
+            logging.critical(f"Could not write a batch of: {len(messages)} messages to PostgreSQL: {error}.")
+
+    async def get_master_keys(self):
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(
+                '''SELECT master_key, domain, dunl, network, server_country, owner_country, toml_verified
+                FROM master_keys'''
+            )
+        return [tuple(row) for row in rows]
+
+    async def update_master_keys(self, data):
+        async with self.pool.acquire() as connection:
+            await connection.executemany(
+                '''UPDATE master_keys SET
+                    domain = $1,
+                    dunl = $2,
+                    network = $3,
+                    server_country = $4,
+                    owner_country = $5,
+                    toml_verified = $6
+                WHERE master_key = $7''',
+                data
+            )
+
+    async def update_ephemeral_keys(self, data):
+        async with self.pool.acquire() as connection:
+            await connection.executemany(
+                '''UPDATE ephemeral_keys SET
+                    master_key = (SELECT id FROM master_keys WHERE master_key = $1)
+                WHERE ephemeral_key = $2''',
+                data
+            )
+
+    async def write_manifests(self, data):
+        async with self.pool.acquire() as connection:
+            await connection.executemany(
+                '''INSERT INTO manifests (
+                    manifest,
+                    manifest_sig_master,
+                    manifest_sig_eph,
+                    sequence,
+                    master_key,
+                    ephemeral_key
+                )
+                VALUES ($1, $2, $3, $4,
+                    (SELECT id FROM master_keys WHERE master_key = $5),
+                    (SELECT id FROM ephemeral_keys WHERE ephemeral_key = $6)
+                )
+                ON CONFLICT (manifest) DO NOTHING''',
+                data
+            )
+
+    async def get_latest_manifests(self):
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch(
+                '''SELECT DISTINCT ON (manifests.master_key) master_keys.master_key, manifests.manifest
+                FROM manifests
+                JOIN master_keys ON master_keys.id = manifests.master_key
+                ORDER BY manifests.master_key, manifests.sequence DESC'''
+            )
+        return {row[0]: row[1] for row in rows}
+
+    async def get_key_freshness(self):
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch("SELECT master_key, manifest_sequence, checked FROM key_freshness")
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    async def update_key_freshness(self, data):
+        async with self.pool.acquire() as connection:
+            await connection.executemany(
+                '''INSERT INTO key_freshness (master_key, manifest_sequence, checked)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (master_key) DO UPDATE SET
+                    manifest_sequence = EXCLUDED.manifest_sequence,
+                    checked = EXCLUDED.checked''',
+                data
+            )
+
+    async def get_domain_freshness(self):
+        async with self.pool.acquire() as connection:
+            rows = await connection.fetch("SELECT domain, etag, last_modified, checked FROM domain_freshness")
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    async def update_domain_freshness(self, data):
+        async with self.pool.acquire() as connection:
+            await connection.executemany(
+                '''INSERT INTO domain_freshness (domain, etag, last_modified, checked)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (domain) DO UPDATE SET
+                    etag = EXCLUDED.etag,
+                    last_modified = EXCLUDED.last_modified,
+                    checked = EXCLUDED.checked''',
+                data
+            )
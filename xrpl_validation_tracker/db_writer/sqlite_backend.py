@@ -0,0 +1,195 @@
+'''
+SQLite storage backend.
+'''
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from .aggregates import HOUR
+from .db_thread import DatabaseWriter
+from .storage import StorageBackend
+
+class SqliteBackend(StorageBackend):
+    '''
+    Stream messages are written by a DatabaseWriter thread. Other queries run on a single
+    worker thread, as sqlite3 connections may only be used by the thread that created them.
+
+    :param settings: Configuration file
+    '''
+    errors = (sqlite3.Error,)
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.writer = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.connection = None
+
+    async def run(self, function, *args):
+        '''
+        Run a function that uses self.connection on the worker thread.
+        '''
+        return await asyncio.get_event_loop().run_in_executor(self.executor, function, *args)
+
+    def connect(self):
+        '''
+        Open the connection used for queries outside of the stream writer. The schema is
+        created and migrated by the db_writer, so this connection doesn't change it, and
+        fails until the db_writer has created the database.
+        '''
+        if not self.connection:
+            self.connection = sqlite3.connect(f"file:{self.settings.DATABASE_LOCATION}?mode=rw", uri=True)
+            self.connection.execute("PRAGMA busy_timeout=5000;")
+        return self.connection
+
+    def executemany(self, sql, data):
+        '''
+        Execute a statement for each row, then commit. A failed statement is rolled back,
+        so the connection doesn't keep holding the write lock.
+        '''
+        connection = self.connect()
+        try:
+            connection.executemany(sql, data)
+            connection.commit()
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+
+    def select_master_keys(self):
+        '''
+        Retrieve master keys from the database.
+        '''
+        cursor = self.connect().cursor()
+        cursor.execute(
+            '''SELECT master_key, domain, dunl, network, server_country, owner_country, toml_verified
+            FROM master_keys'''
+        )
+        return cursor.fetchall()
+
+    def select(self, sql):
+        '''
+        :returns: All rows returned by a query
+        :rtype: list
+        '''
+        return self.connect().execute(sql).fetchall()
+
+    def close(self):
+        '''
+        Close the query connection.
+        '''
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    async def stop(self):
+        if self.writer:
+            await self.writer.stop()
+            self.writer = None
+        await self.run(self.close)
+        logging.info("Database connection closed.")
+
+    async def write_batch(self, messages):
+        if not self.writer:
+            self.writer = DatabaseWriter(self.settings)
+            self.writer.start()
+        await self.writer.put(messages)
+
+    async def get_master_keys(self):
+        return await self.run(self.select_master_keys)
+
+    async def update_master_keys(self, data):
+        await self.run(
+            self.executemany,
+            '''
+            UPDATE master_keys
+            SET
+                domain = ?,
+                dunl = ?,
+                network = ?,
+                server_country = ?,
+                owner_country = ?,
+                toml_verified = ?
+            WHERE master_key = ?
+            ''',
+            data
+        )
+
+    async def update_ephemeral_keys(self, data):
+        await self.run(
+            self.executemany,
+            '''
+            UPDATE ephemeral_keys
+            SET
+                master_key = (SELECT rowid FROM master_keys WHERE master_key = ?)
+            WHERE ephemeral_key = ?
+            ''',
+            data
+        )
+
+    async def write_manifests(self, data):
+        await self.run(
+            self.executemany,
+            '''
+            INSERT OR IGNORE INTO manifests (
+                manifest,
+                manifest_sig_master,
+                manifest_sig_eph,
+                sequence,
+                master_key,
+                ephemeral_key
+            )
+            VALUES (?, ?, ?, ?,
+                (SELECT rowid FROM master_keys WHERE master_key is ?),
+                (SELECT rowid FROM ephemeral_keys WHERE ephemeral_key is ?)
+            )
+            ''',
+            data
+        )
+
+    async def get_latest_manifests(self):
+        # SQLite returns the manifest from the row holding the MAX() sequence.
+        rows = await self.run(
+            self.select,
+            '''SELECT master_keys.master_key, manifests.manifest, MAX(manifests.sequence)
+            FROM manifests
+            JOIN master_keys ON master_keys.rowid = manifests.master_key
+            GROUP BY manifests.master_key'''
+        )
+        return {row[0]: row[1] for row in rows}
+
+    async def get_key_freshness(self):
+        rows = await self.run(
+            self.select, "SELECT master_key, manifest_sequence, checked FROM key_freshness"
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    async def update_key_freshness(self, data):
+        await self.run(
+            self.executemany,
+            "INSERT OR REPLACE INTO key_freshness (master_key, manifest_sequence, checked) VALUES (?, ?, ?)",
+            data
+        )
+
+    async def get_domain_freshness(self):
+        rows = await self.run(
+            self.select, "SELECT domain, etag, last_modified, checked FROM domain_freshness"
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    async def update_domain_freshness(self, data):
+        await self.run(
+            self.executemany,
+            "INSERT OR REPLACE INTO domain_freshness (domain, etag, last_modified, checked) VALUES (?, ?, ?, ?)",
+            data
+        )
+
+    async def get_key_activity(self):
+        # The db_writer's hourly aggregates record the hours each validator validated in.
+        rows = await self.run(
+            self.select,
+            '''SELECT master_keys.master_key, MAX(validator_hourly.hour)
+            FROM validator_hourly
+            JOIN master_keys ON master_keys.rowid = validator_hourly.master_key
+            GROUP BY validator_hourly.master_key'''
+        )
+        return {row[0]: (row[1] + 1) * HOUR for row in rows}
@@ -5,27 +5,133 @@ from websocket messages to the database.
 import logging
 import sqlite3
 
-def create_db_connection(db_location):
+from .aggregates import LEDGER_HOURLY_TABLE, VALIDATOR_HOURLY_TABLE
+
+# Increment when the schema changes, and add a step to migrate_db.
+SCHEMA_VERSION = 2
+
+DB_SYNCHRONOUS = 'NORMAL' # Safe with WAL - a power loss may only lose the latest transactions
+DB_CACHE_SIZE = 65536 # Page cache size in KiB
+DB_MMAP_SIZE = 268435456 # Bytes of the database file to memory map
+
+VALIDATION_STREAM_TABLE = """CREATE TABLE IF NOT EXISTS validation_stream (
+                    ephemeral_key INT NOT NULL,
+                    ledger_hash INT NOT NULL,
+                    master_key INT NOT NULL,
+                    signing_time INT NOT NULL,
+                    partial_validation BOOLEAN NOT NULL,
+                    PRIMARY KEY (ephemeral_key, ledger_hash)
+                ) WITHOUT ROWID;"""
+
+KEY_FRESHNESS_TABLE = """CREATE TABLE IF NOT EXISTS key_freshness (
+                    master_key TEXT PRIMARY KEY,
+                    manifest_sequence INT,
+                    checked INT NOT NULL
+                );"""
+
+DOMAIN_FRESHNESS_TABLE = """CREATE TABLE IF NOT EXISTS domain_freshness (
+                    domain TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    checked INT NOT NULL
+                );"""
+
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ledgers_sequence ON ledgers (sequence);",
+    "CREATE INDEX IF NOT EXISTS validation_stream_master_key ON validation_stream (master_key);",
+    "CREATE INDEX IF NOT EXISTS validation_stream_signing_time ON validation_stream (signing_time);",
+    "CREATE INDEX IF NOT EXISTS validation_stream_ledger_hash ON validation_stream (ledger_hash);",
+)
+
+def set_pragmas(connection, synchronous=DB_SYNCHRONOUS, cache_size=DB_CACHE_SIZE, mmap_size=DB_MMAP_SIZE):
+    '''
+    Use write-ahead logging, so readers (e.g., supplemental_data) and the writer don't
+    block each other, and tune the connection for bulk inserts.
+
+    :param connection: Connection to the SQL database
+    :param str synchronous: PRAGMA synchronous setting
+    :param int cache_size: Page cache size in KiB
+    :param int mmap_size: Bytes of the database file to memory map
+    '''
+    cursor = connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL;")
+    cursor.execute(f"PRAGMA synchronous={synchronous};")
+    cursor.execute(f"PRAGMA cache_size=-{int(cache_size)};")
+    cursor.execute(f"PRAGMA mmap_size={int(mmap_size)};")
+    cursor.execute("PRAGMA temp_store=MEMORY;")
+    cursor.execute("PRAGMA busy_timeout=5000;")
+
+def hex_to_blob(value):
+    '''
+    SQL function converting a hex string to bytes. Other values are returned unchanged.
+    '''
+    if isinstance(value, str):
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            pass
+    return value
+
+def migrate_db(connection):
+    '''
+    Upgrade databases created by earlier versions of the db_writer.
+
+    :param connection: Connection to the SQL database
+    '''
+    cursor = connection.cursor()
+    version = cursor.execute("PRAGMA user_version;").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    tables = {i[0] for i in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+    cursor.execute("BEGIN;")
+
+    columns = [i[1] for i in cursor.execute("PRAGMA table_info(validation_stream);")]
+    if version < 1 and 'id' in columns:
+        # Version 0 keyed validation_stream on the text "ephemeral_key_id+ledger_id".
+        logging.warning("Migrating the validation_stream table to integer keys. This may take a while.")
+        cursor.execute("ALTER TABLE validation_stream RENAME TO validation_stream_v0;")
+        cursor.execute(VALIDATION_STREAM_TABLE)
+        cursor.execute(
+            """INSERT OR IGNORE INTO validation_stream
+                SELECT
+                    CAST(ephemeral_key AS INT),
+                    CAST(ledger_hash AS INT),
+                    CAST(master_key AS INT),
+                    signing_time,
+                    CASE partial_validation WHEN 'True' THEN 1 ELSE 0 END
+                FROM validation_stream_v0;"""
+        )
+        cursor.execute("DROP TABLE validation_stream_v0;")
+
+    if version < 2 and 'ledgers' in tables:
+        # Version 1 stored ledger hashes as hex text.
+        logging.warning("Migrating ledger hashes to binary.")
+        connection.create_function('hex_to_blob', 1, hex_to_blob)
+        cursor.execute("UPDATE ledgers SET hash = hex_to_blob(hash) WHERE typeof(hash) = 'text';")
+
+    cursor.execute(f"PRAGMA user_version={SCHEMA_VERSION};")
+    connection.commit()
+    logging.info(f"Database schema is at version: {SCHEMA_VERSION}.")
+
+def create_db_connection(db_location, synchronous=DB_SYNCHRONOUS, cache_size=DB_CACHE_SIZE, mmap_size=DB_MMAP_SIZE):
     '''
     Connect to the SQL database.
 
     :param db_location: Location to store the database
+    :param str synchronous: PRAGMA synchronous setting
+    :param int cache_size: Page cache size in KiB
+    :param int mmap_size: Bytes of the database file to memory map
     :returns: Database connection
     '''
     connection = None
     try:
         connection = sqlite3.connect(db_location)
         if connection is not None:
-            connection.cursor().execute(
-                """CREATE TABLE IF NOT EXISTS validation_stream (
-                    id TEXT PRIMARY KEY UNIQUE,
-                    ledger_hash TEXT NOT NULL,
-                    ephemeral_key TEXT NOT NULL,
-                    master_key TEXT NOT NULL,
-                    signing_time INT NOT NULL,
-                    partial_validation BOOLEAN NOT NULL
-                );"""
-            )
+            set_pragmas(connection, synchronous, cache_size, mmap_size)
+            migrate_db(connection)
+
+            connection.cursor().execute(VALIDATION_STREAM_TABLE)
 
             connection.cursor().execute(
                 """CREATE TABLE IF NOT EXISTS ephemeral_keys (
@@ -48,7 +154,7 @@ def create_db_connection(db_location):
 
             connection.cursor().execute(
                 """CREATE TABLE IF NOT EXISTS ledgers (
-                    hash TEXT PRIMARY KEY UNIQUE,
+                    hash BLOB PRIMARY KEY UNIQUE,
                     sequence INT NOT NULL,
                     signing_time INT,
                     txn_count INT,
@@ -70,6 +176,15 @@ def create_db_connection(db_location):
                     sequence INT
                 );"""
             )
+
+            connection.cursor().execute(VALIDATOR_HOURLY_TABLE)
+            connection.cursor().execute(LEDGER_HOURLY_TABLE)
+            connection.cursor().execute(KEY_FRESHNESS_TABLE)
+            connection.cursor().execute(DOMAIN_FRESHNESS_TABLE)
+
+            for index in INDEXES:
+                connection.cursor().execute(index)
+            connection.commit()
         return connection
 
     except sqlite3.Error as message:
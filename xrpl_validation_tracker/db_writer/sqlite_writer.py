@@ -6,7 +6,29 @@ from websocket messages to the database.
 import logging
 import sqlite3
 
+from .manifests import MANIFEST_FIELDS, as_bytes, manifest_from_message
+
 RIPPLED_TIME_OFFSET = 946684800
+# Stay below SQLITE_MAX_VARIABLE_NUMBER on older sqlite3 builds.
+MAX_QUERY_VARIABLES = 900
+
+VALIDATION_FIELDS = (
+    'ledger_hash',
+    'ledger_index',
+    'signing_time',
+    'validation_public_key',
+    'master_key',
+    'full',
+)
+LEDGER_FIELDS = (
+    'ledger_hash',
+    'ledger_index',
+    'txn_count',
+    'fee_base',
+    'fee_ref',
+    'reserve_base',
+    'reserve_inc',
+)
 
 def sql_write(sql, data, connection):
     '''
@@ -22,122 +44,220 @@ def sql_write(sql, data, connection):
     except sqlite3.Error as exception:
         logging.critical(f"Could not write data to database: {exception}.")
 
-def ledger_id_check(message, connection):
+def select_ids(values, column, table, connection):
     '''
-    Query the ledger database to see if the hash already exists. If it does not, then
-    insert the hash and sequence.
+    Look up the rowids for multiple values in a single column.
+
+    :param values: Values to search for
+    :param str column: Column in the table to search. For example, 'ephemeral_key'
+    :param str table: Table to query in the DB. For example, 'ephemeral_keys'
+    :returns: Database ids, keyed by value
+    :rtype: dict
     '''
-    # signing_time might be incorrect (i.e., if one node misreports it for some reason)
-    # Double check signing time against an aggregated 'ledger' subscription stream or another source
+    values = list(values)
+    ids = {}
     cursor = connection.cursor()
-    cursor.execute("SELECT rowid FROM ledgers WHERE hash=?", (message['ledger_hash'],))
-    ledger_id = cursor.fetchall()
+    for i in range(0, len(values), MAX_QUERY_VARIABLES):
+        chunk = values[i:i + MAX_QUERY_VARIABLES]
+        cursor.execute(
+            f"SELECT {column}, rowid FROM {table} WHERE {column} IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+        ids.update(cursor.fetchall())
+    return ids
 
-    if ledger_id:
-        ledger_id = ledger_id[0][0]
-    elif not ledger_id:
-        sql = ''' INSERT INTO ledgers(
-                    hash,
-                    sequence,
-                    signing_time)
-                    VALUES(?,?,?) '''
+def get_ledger_ids(messages, connection, cache=None):
+    '''
+    Query the ledger database for the hashes in a batch of validations. Insert any hashes
+    that don't exist yet, along with their sequence and signing time.
 
-        data = (
+    :param list messages: Validation stream messages
+    :param IdCache cache: Optional cache of known ids
+    :returns: Database ids, keyed by ledger hash
+    :rtype: dict
+    '''
+    # signing_time might be incorrect (i.e., if one node misreports it for some reason)
+    # Double check signing time against an aggregated 'ledger' subscription stream or another source
+    ledgers_new = {}
+    for message in messages:
+        ledgers_new[message['ledger_hash']] = (
             message['ledger_hash'],
             message['ledger_index'],
             message['signing_time'],
         )
+    if cache:
+        ledger_ids, uncached = cache.lookup('ledgers', ledgers_new)
+    else:
+        ledger_ids, uncached = {}, list(ledgers_new)
+    if not uncached:
+        return ledger_ids
 
-        ledger_id = sql_write(sql, data, connection)
+    ledger_ids_db = select_ids(uncached, 'hash', 'ledgers', connection)
+    missing = [ledgers_new[i] for i in uncached if i not in ledger_ids_db]
+    if missing:
+        connection.executemany(
+            ''' INSERT INTO ledgers(
+                    hash,
+                    sequence,
+                    signing_time)
+                    VALUES(?,?,?) ''',
+            missing
+        )
+        ledger_ids_db.update(select_ids([i[0] for i in missing], 'hash', 'ledgers', connection))
 
-    return ledger_id
+    if cache:
+        cache.stage('ledgers', ledger_ids_db)
+    ledger_ids.update(ledger_ids_db)
+    return ledger_ids
 
-def get_validator_key(key, column, table, connection):
+def get_validator_keys(keys, column, table, connection, cache=None, inserted=None):
     '''
-    Query the ephemeral_keys database to see if the ephemeral key already exists.
-    If it does not, then insert the key.
+    Query a key table for multiple keys. Insert any keys that don't exist yet.
 
-    :param str key: Database will return an index ID for the key.
+    :param keys: Keys the database will return index IDs for
     :param str column: Column in the table to search. For example, 'ephemeral_key'
     :param str table: Table to query in the DB. For example, 'ephemeral_keys'
-    :returns: Database id for the key.
+    :param IdCache cache: Optional cache of known ids
+    :param set inserted: Optional set to add the inserted keys to
+    :returns: Database ids, keyed by validator key
+    :rtype: dict
     '''
-    cursor = connection.cursor()
-    cursor.execute(f"SELECT rowid FROM {table} WHERE {column}=?",
-                   (key,))
-    key_id = cursor.fetchall()
+    keys = set(keys)
+    if cache:
+        key_ids, uncached = cache.lookup(table, keys)
+    else:
+        key_ids, uncached = {}, list(keys)
+    if not uncached:
+        return key_ids
 
-    if key_id:
-        key_id = key_id[0][0]
-    elif not key_id:
-        sql = ''' INSERT INTO {}({}) VALUES(?) '''.format(table, column)
+    key_ids_db = select_ids(uncached, column, table, connection)
+    missing = [(key,) for key in uncached if key not in key_ids_db]
+    if missing:
+        connection.executemany(f''' INSERT INTO {table}({column}) VALUES(?) ''', missing)
+        if inserted is not None:
+            inserted.update(i[0] for i in missing)
+        key_ids_db.update(select_ids([i[0] for i in missing], column, table, connection))
 
-        data = (key,)
+    if cache:
+        cache.stage(table, key_ids_db)
+    key_ids.update(key_ids_db)
+    return key_ids
 
-        key_id = sql_write(sql, data, connection)
+def insert_new_rows(connection, sql, rows):
+    '''
+    Run an INSERT OR IGNORE statement for each row with executemany. If any row was
+    ignored, the batch is rolled back to a savepoint and inserted one row at a time, to
+    find which rows were new. The caller is responsible for committing the transaction.
 
-    return key_id
+    :param connection: connection to the SQL database
+    :param str sql: INSERT OR IGNORE statement
+    :param list rows: Parameters for each row
+    :returns: Whether each row was inserted
+    :rtype: list
+    '''
+    if not connection.in_transaction:
+        # Releasing an outermost savepoint would commit the batch early.
+        connection.execute("BEGIN")
+    connection.execute("SAVEPOINT insert_new_rows")
+    changes = connection.total_changes
+    connection.executemany(sql, rows)
+    if connection.total_changes - changes == len(rows):
+        connection.execute("RELEASE insert_new_rows")
+        return [True] * len(rows)
+    connection.execute("ROLLBACK TO insert_new_rows")
+    connection.execute("RELEASE insert_new_rows")
+    return [connection.execute(sql, row).rowcount > 0 for row in rows]
 
-def validations(message, connection):
+def validations(messages, connection, cache=None, partitions=None, events=None):
     '''
-    Parse validations subscription messages into SQL.
+    Parse validations subscription messages into SQL. The caller is responsible for
+    committing the transaction.
 
-    :param message: a websocket validation stream subscription response message
+    :param list messages: websocket validation stream subscription response messages
     :param connection: connection to the SQL database
+    :param IdCache cache: Optional cache of known ids
+    :param PartitionManager partitions: Optional partitions to write validations into
+    :param KeyEventPublisher events: Optional publisher to stage new validator keys with
+    :returns: (message, row) pairs for the validations that were inserted, rather than
+        ignored as duplicates. Rows are (ledger_id, ephemeral_key_id, master_key_id,
+        signing_time, partial_validation).
+    :rtype: list
     '''
-    ledger_id = ledger_id_check(message, connection)
-    ephemeral_key_id = get_validator_key(
-        message['validation_public_key'],
+    ledger_ids = get_ledger_ids(messages, connection, cache)
+    ephemeral_keys_new = set() if events else None
+    master_keys_new = set() if events else None
+    ephemeral_key_ids = get_validator_keys(
+        [i['validation_public_key'] for i in messages],
         'ephemeral_key',
         'ephemeral_keys',
-        connection
+        connection,
+        cache,
+        ephemeral_keys_new
     )
-    master_key_id = get_validator_key(
-        message['master_key'],
+    master_key_ids = get_validator_keys(
+        [i['master_key'] for i in messages],
         'master_key',
         'master_keys',
-        connection
+        connection,
+        cache,
+        master_keys_new
     )
+    if events and (ephemeral_keys_new or master_keys_new):
+        # A new ephemeral key means its validator rotated keys, so its manifest changed.
+        master_keys_new.update(
+            i['master_key'] for i in messages if i['validation_public_key'] in ephemeral_keys_new
+        )
+        events.stage(master_keys_new)
 
-    identifier = str(ephemeral_key_id) + '+' + str(ledger_id)
-
-    cursor = connection.cursor()
-    cursor.execute("SELECT rowid FROM validation_stream WHERE id=?",
-                   (identifier,))
-    validation_id = cursor.fetchall()
-
-    if not validation_id:
-        data = (
-            identifier,
-            ledger_id,
-            ephemeral_key_id,
-            master_key_id,
-            message['signing_time'] + RIPPLED_TIME_OFFSET,
-            str(not message['full']),
+    data = []
+    for message in messages:
+        data.append(
+            (
+                ledger_ids[message['ledger_hash']],
+                ephemeral_key_ids[message['validation_public_key']],
+                master_key_ids[message['master_key']],
+                message['signing_time'] + RIPPLED_TIME_OFFSET,
+                not message['full'],
+            )
         )
 
-        sql = ''' INSERT INTO validation_stream (
-                id,
+    if partitions:
+        inserted = partitions.write(data, [i['ledger_index'] for i in messages])
+    else:
+        sql = ''' INSERT OR IGNORE INTO validation_stream (
                 ledger_hash,
                 ephemeral_key,
                 master_key,
                 signing_time,
                 partial_validation
                 )
-                VALUES(?,?,?,?,?,?)'''
-
-        sql_write(sql, data, connection)
+                VALUES(?,?,?,?,?)'''
+        inserted = insert_new_rows(connection, sql, data)
+    return [(message, row) for message, row, new in zip(messages, data, inserted) if new]
 
-def ledgers(message, connection):
+def ledgers(messages, connection):
     '''
-    Write data on ledgers into the database.
+    Write data on ledgers into the database. The caller is responsible for
+    committing the transaction.
 
     To-do: Verify signing time is correct.
 
-    :param message: a websocket ledger stream subscription response message
+    :param list messages: websocket ledger stream subscription response messages
     :param connection: connection to the SQL database
     '''
-    sql = '''UPDATE ledgers SET
+    data = [
+        (
+            message['txn_count'],
+            message['fee_base'],
+            message['fee_ref'],
+            message['reserve_base'],
+            message['reserve_inc'],
+            message['ledger_hash']
+        ) for message in messages
+    ]
+
+    connection.executemany(
+        '''UPDATE ledgers SET
             txn_count = ?,
             fee_base = ?,
             fee_ref = ?,
@@ -145,15 +265,156 @@ def ledgers(message, connection):
             reserve_inc = ?
 
             WHERE hash = ?
-          '''
-    data = (
-        message['txn_count'],
-        message['fee_base'],
-        message['fee_ref'],
-        message['reserve_base'],
-        message['reserve_inc'],
-        message['ledger_hash']
+          ''',
+        data
     )
+    for message in messages:
+        logging.info(f"Wrote ledger: {message['ledger_index']} with {message['txn_count']} transactions into the DB.")
+
+def manifest_rows(messages):
+    '''
+    Serialize manifests from the manifests stream. Messages that can't be serialized are
+    ignored.
+
+    :param list messages: websocket manifest stream subscription response messages
+    :returns: (manifest, master_key, ephemeral_key, master_signature, signature, seq) rows
+    :rtype: list
+    '''
+    rows = []
+    for message in messages:
+        try:
+            rows.append(
+                (
+                    manifest_from_message(message),
+                    message['master_key'],
+                    message.get('signing_key') or '',
+                    as_bytes(message['master_signature']).hex().upper(),
+                    as_bytes(message.get('signature') or b'').hex().upper(),
+                    int(message['seq']),
+                )
+            )
+        except (KeyError, TypeError, ValueError) as error:
+            logging.warning(f"Unable to serialize a manifest for key: {message.get('master_key')}. Error: {error}.")
+    return rows
+
+def manifests(messages, connection, cache=None, events=None):
+    '''
+    Write manifests from the manifests stream, and map their ephemeral keys to master
+    keys. The caller is responsible for committing the transaction.
 
-    sql_write(sql, data, connection)
-    print(f"Wrote ledger: {message['ledger_index']} with {message['txn_count']} transactions into the DB.")
+    :param list messages: websocket manifest stream subscription response messages
+    :param connection: connection to the SQL database
+    :param IdCache cache: Optional cache of known ids
+    :param KeyEventPublisher events: Optional publisher to stage keys with new manifests with
+    '''
+    rows = manifest_rows(messages)
+    if not rows:
+        return
+    master_key_ids = get_validator_keys(
+        [i[1] for i in rows], 'master_key', 'master_keys', connection, cache
+    )
+    ephemeral_key_ids = get_validator_keys(
+        [i[2] for i in rows if i[2]], 'ephemeral_key', 'ephemeral_keys', connection, cache
+    )
+    connection.executemany(
+        "UPDATE ephemeral_keys SET master_key = ? WHERE rowid = ?",
+        [(master_key_ids[i[1]], ephemeral_key_ids[i[2]]) for i in rows if i[2]]
+    )
+    connection.executemany(
+        '''INSERT OR IGNORE INTO manifests (
+            manifest,
+            master_key,
+            ephemeral_key,
+            manifest_sig_master,
+            manifest_sig_eph,
+            sequence
+            )
+            VALUES(?,?,?,?,?,?)''',
+        [
+            (i[0], master_key_ids[i[1]], ephemeral_key_ids.get(i[2]), i[3], i[4], i[5])
+            for i in rows
+        ]
+    )
+    if events:
+        events.stage(i[1] for i in rows)
+    logging.info(f"Wrote: {len(rows)} manifests into the DB.")
+
+def split_messages(messages):
+    '''
+    Sort messages into validations, ledgers, and manifests. Messages without the fields
+    needed to write them are ignored, so one bad message doesn't cause a batch to be
+    discarded.
+
+    :param list messages: websocket subscription response messages
+    :returns: Validation, ledger, and manifest stream messages
+    :rtype: tuple
+    '''
+    messages_validation = []
+    messages_ledger = []
+    messages_manifest = []
+    for message in messages:
+        message_type = message.get('type')
+        if message_type == 'validationReceived':
+            if all(field in message for field in VALIDATION_FIELDS):
+                messages_validation.append(message)
+        elif message_type == 'ledgerClosed':
+            if all(field in message for field in LEDGER_FIELDS):
+                messages_ledger.append(message)
+        elif message_type == 'manifestReceived':
+            if all(field in message for field in MANIFEST_FIELDS):
+                messages_manifest.append(message)
+    return messages_validation, messages_ledger, messages_manifest
+
+def write_batch(messages, connection, cache=None, partitions=None, aggregates=None, events=None):
+    '''
+    Write a batch of validation, ledger, and manifest stream messages in a single transaction.
+
+    :param list messages: websocket subscription response messages
+    :param connection: connection to the SQL database
+    :param IdCache cache: Optional cache of known ids
+    :param PartitionManager partitions: Optional partitions to write validations into
+    :param AggregateTracker aggregates: Optional tracker to update the aggregate tables with
+    :param KeyEventPublisher events: Optional publisher to send new validator keys to
+    :returns: True if the batch was written
+    :rtype: bool
+    '''
+    messages_validation, messages_ledger, messages_manifest = split_messages(messages)
+    inserted = []
+
+    try:
+        if partitions:
+            # Partitions can't be attached once the transaction has begun.
+            partitions.prepare(messages_validation)
+        # Write validations first, so ledgers closed in this batch already have a row to update.
+        if messages_validation:
+            inserted = validations(messages_validation, connection, cache, partitions, events)
+        if aggregates:
+            aggregates.update(
+                connection,
+                [(i['ledger_hash'], row[2], row[3]) for i, row in inserted],
+                [i['ledger_hash'] for i in messages_ledger]
+            )
+        if messages_ledger:
+            ledgers(messages_ledger, connection)
+        if messages_manifest:
+            manifests(messages_manifest, connection, cache, events)
+        connection.commit()
+        if cache:
+            cache.commit()
+        if aggregates:
+            aggregates.commit()
+        if events:
+            events.commit()
+        if partitions:
+            partitions.roll()
+        return True
+    except sqlite3.Error as exception:
+        connection.rollback()
+        if cache:
+            cache.rollback()
+        if aggregates:
+            aggregates.rollback()
+        if events:
+            events.rollback()
+        logging.critical(f"Could not write a batch of: {len(messages)} messages to database: {exception}.")
+        return False
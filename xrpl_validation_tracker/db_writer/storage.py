@@ -0,0 +1,135 @@
+'''
+Storage backend interface shared by the db_writer and supplemental_data modules.
+'''
+from abc import ABC, abstractmethod
+
+from metrics.registry import REGISTRY
+
+# Updated by each backend's batch writer.
+BATCH_SECONDS = REGISTRY.histogram('xrpl_db_batch_write_seconds', "Time to write each batch to the database.")
+MESSAGES_WRITTEN = REGISTRY.counter('xrpl_db_messages_written_total', "Messages written to the database.")
+BATCH_ERRORS = REGISTRY.counter('xrpl_db_batch_errors_total', "Batches that could not be written to the database.")
+
+class StorageBackend(ABC):
+    '''
+    Base class for databases the tracker can write to. All methods are coroutines, so
+    backends must not block the event loop. Backends that don't implement every abstract
+    method can't be created.
+
+    :param settings: Configuration file
+    '''
+    # Exceptions callers should expect from database operations.
+    errors = ()
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    async def start(self):
+        '''
+        Open connections and create the schema if needed.
+        '''
+
+    async def stop(self):
+        '''
+        Finish pending writes and close connections.
+        '''
+
+    @abstractmethod
+    async def write_batch(self, messages):
+        '''
+        Write a batch of validation and ledger stream messages in a single transaction.
+
+        :param list messages: websocket subscription response messages
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_master_keys(self):
+        '''
+        :returns: (master_key, domain, dunl, network, server_country, owner_country, toml_verified) rows
+        :rtype: list
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_master_keys(self, data):
+        '''
+        :param list data: (domain, dunl, network, server_country, owner_country, toml_verified, master_key) rows
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_ephemeral_keys(self, data):
+        '''
+        Link ephemeral keys to their master keys.
+
+        :param list data: (master_key, ephemeral_key) rows
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def write_manifests(self, data):
+        '''
+        :param list data: (manifest, manifest_sig_master, manifest_sig_eph, sequence, master_key, ephemeral_key) rows
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_latest_manifests(self):
+        '''
+        :returns: The highest sequence manifest stored for each master key
+        :rtype: dict
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_key_freshness(self):
+        '''
+        :returns: (manifest_sequence, checked) for each master key supplemental data was retrieved for
+        :rtype: dict
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_key_freshness(self, data):
+        '''
+        :param list data: (master_key, manifest_sequence, checked) rows
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_domain_freshness(self):
+        '''
+        :returns: (etag, last_modified, checked) for each domain a TOML file was retrieved from
+        :rtype: dict
+        '''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_domain_freshness(self, data):
+        '''
+        :param list data: (domain, etag, last_modified, checked) rows
+        '''
+        raise NotImplementedError
+
+    async def get_key_activity(self):
+        '''
+        :returns: UNIX time each master key last validated a ledger. Backends that don't
+            track this return an empty dict.
+        :rtype: dict
+        '''
+        return {}
+
+def create_backend(settings):
+    '''
+    Create the storage backend selected by settings.DB_BACKEND.
+
+    :param settings: Configuration file
+    :rtype: StorageBackend
+    '''
+    if settings.DB_BACKEND == 'postgresql':
+        # Only import asyncpg when it's needed.
+        from .postgres_backend import PostgresBackend
+        return PostgresBackend(settings)
+    from .sqlite_backend import SqliteBackend
+    return SqliteBackend(settings)
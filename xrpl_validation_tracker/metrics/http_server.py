@@ -0,0 +1,67 @@
+'''
+Serve metrics over HTTP at /metrics from the module's asyncio loop.
+'''
+import asyncio
+import logging
+
+from .registry import REGISTRY
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+REQUEST_TIMEOUT = 10 # Time (seconds) to wait for a scraper to send its request
+
+def http_response(status, body):
+    '''
+    :param str status: Status line, for example '200 OK'
+    :param str body: Response body
+    :rtype: bytes
+    '''
+    body = body.encode()
+    return (
+        f"HTTP/1.1 {status}\r\n"
+        f"Content-Type: {CONTENT_TYPE}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode() + body
+
+async def handle_request(reader, writer, registry=REGISTRY):
+    '''
+    Answer a single HTTP request, then close the connection.
+
+    :param asyncio.StreamReader reader: Request stream
+    :param asyncio.StreamWriter writer: Response stream
+    :param Registry registry: Metrics to serve
+    '''
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_TIMEOUT)
+        method, path = request.split(b' ', 2)[:2]
+        if method != b'GET':
+            writer.write(http_response('405 Method Not Allowed', 'Only GET is supported.\n'))
+        elif path.split(b'?')[0] == b'/metrics':
+            writer.write(http_response('200 OK', registry.render()))
+        else:
+            writer.write(http_response('404 Not Found', 'Metrics are served at /metrics.\n'))
+        await writer.drain()
+    except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            asyncio.TimeoutError,
+            ConnectionError,
+            ValueError,
+    ) as error:
+        logging.info(f"Unable to answer metrics request. Error: {error}.")
+    finally:
+        writer.close()
+
+async def start_metrics_server(settings):
+    '''
+    Listen for metrics requests, if enabled in the settings.
+
+    :param settings: Configuration file
+    '''
+    if not settings.METRICS_ENABLED:
+        return
+    try:
+        await asyncio.start_server(handle_request, settings.METRICS_IP, settings.METRICS_PORT)
+        logging.info(f"Serving metrics on: http://{settings.METRICS_IP}:{settings.METRICS_PORT}/metrics.")
+    except OSError as error:
+        logging.error(f"Unable to start the metrics server on: {settings.METRICS_IP}:{settings.METRICS_PORT}. Error: {error}.")
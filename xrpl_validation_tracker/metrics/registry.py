@@ -0,0 +1,197 @@
+'''
+In-process metrics, rendered in the Prometheus text exposition format.
+
+Updating a metric is a single attribute update, so metrics can be updated for every
+message. Values that already exist elsewhere (queue sizes, client counts) are read
+from a function when metrics are rendered, so they cost nothing between scrapes.
+'''
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def format_labels(labels):
+    '''
+    :param tuple labels: (name, value) pairs
+    :returns: Labels in exposition format, for example '{url="wss://..."}'
+    :rtype: str
+    '''
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def format_value(value):
+    '''
+    :param value: Metric value
+    :rtype: str
+    '''
+    if value is None:
+        return 'NaN'
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+class Counter:
+    '''
+    Value that only increases.
+
+    :param tuple labels: (name, value) pairs
+    :param function: Returns the current value, instead of counting with inc()
+    '''
+    __slots__ = ('labels', 'value', 'function')
+    kind = 'counter'
+
+    def __init__(self, labels=(), function=None):
+        self.labels = labels
+        self.value = 0
+        self.function = function
+
+    def inc(self, amount=1):
+        '''
+        :param amount: Amount to add
+        '''
+        self.value += amount
+
+    def samples(self, name):
+        '''
+        :param str name: Metric name
+        :returns: (name, labels, value) tuples
+        :rtype: list
+        '''
+        return [(name, self.labels, self.function() if self.function else self.value)]
+
+class Gauge(Counter):
+    '''
+    Value that can go up and down.
+
+    :param tuple labels: (name, value) pairs
+    :param function: Returns the current value, instead of setting it with set()
+    '''
+    __slots__ = ()
+    kind = 'gauge'
+
+    def set(self, value):
+        '''
+        :param value: New value
+        '''
+        self.value = value
+
+    def dec(self, amount=1):
+        '''
+        :param amount: Amount to subtract
+        '''
+        self.value -= amount
+
+class Histogram:
+    '''
+    Count of observations in cumulative buckets, with their sum.
+
+    :param tuple labels: (name, value) pairs
+    :param tuple buckets: Upper bound of each bucket, in increasing order
+    '''
+    __slots__ = ('labels', 'buckets', 'counts', 'sum')
+    kind = 'histogram'
+
+    def __init__(self, labels=(), buckets=DEFAULT_BUCKETS):
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # The final count is the +Inf bucket.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        '''
+        :param value: Observed value
+        '''
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name):
+        '''
+        :param str name: Metric name
+        :returns: (name, labels, value) tuples
+        :rtype: list
+        '''
+        samples = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            samples.append((name + '_bucket', self.labels + (('le', format_value(bound)),), total))
+        samples.append((name + '_sum', self.labels, self.sum))
+        samples.append((name + '_count', self.labels, total))
+        return samples
+
+class Registry:
+    '''
+    Collection of named metrics. Requesting a metric that already exists returns it,
+    so modules can share metrics by name.
+    '''
+    def __init__(self):
+        self.families = {}
+
+    def get(self, metric_class, name, description, labels, **kwargs):
+        '''
+        Return the metric with the given name and labels, creating it if needed.
+
+        :param metric_class: Counter, Gauge, or Histogram
+        :param str name: Metric name
+        :param str description: Help text
+        :param dict labels: Label values
+        :returns: The metric
+        '''
+        labels = tuple(sorted(labels.items()))
+        family = self.families.setdefault(name, (metric_class, description, {}))
+        if family[0] is not metric_class:
+            raise ValueError(f"Metric: {name} is already registered as a {family[0].kind}.")
+        metric = family[2].get(labels)
+        # Metrics read from a function are replaced, so they follow the newest object.
+        if metric is None or kwargs.get('function') is not None:
+            metric = family[2][labels] = metric_class(labels, **kwargs)
+        return metric
+
+    def counter(self, name, description, function=None, **labels):
+        '''
+        :param str name: Metric name
+        :param str description: Help text
+        :param function: Returns the current value, or None to count with inc()
+        :rtype: Counter
+        '''
+        return self.get(Counter, name, description, labels, function=function)
+
+    def gauge(self, name, description, function=None, **labels):
+        '''
+        :param str name: Metric name
+        :param str description: Help text
+        :param function: Returns the current value, or None to set the value with set()
+        :rtype: Gauge
+        '''
+        return self.get(Gauge, name, description, labels, function=function)
+
+    def histogram(self, name, description, buckets=DEFAULT_BUCKETS, **labels):
+        '''
+        :param str name: Metric name
+        :param str description: Help text
+        :param tuple buckets: Upper bound of each bucket
+        :rtype: Histogram
+        '''
+        return self.get(Histogram, name, description, labels, buckets=buckets)
+
+    def render(self):
+        '''
+        :returns: Every metric in the Prometheus text exposition format
+        :rtype: str
+        '''
+        lines = []
+        for name, (metric_class, description, metrics) in sorted(self.families.items()):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_class.kind}")
+            for metric in list(metrics.values()):
+                for sample_name, labels, value in metric.samples(name):
+                    lines.append(f"{sample_name}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+# Metrics for the running module. Each module runs in its own process.
+REGISTRY = Registry()
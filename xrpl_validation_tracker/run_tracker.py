@@ -11,6 +11,11 @@ PARSER = argparse.ArgumentParser(description="Select which module to run.")
 PARSER.add_argument("-a", "--aggregator", help="Run the aggregator.", action="store_true")
 PARSER.add_argument("-d", "--db_writer", help="Run the db_writer.", action="store_true")
 PARSER.add_argument("-s", "--supplemental", help="Run supplemental_data.", action="store_true")
+PARSER.add_argument("-r", "--db_reader", help="Run the db_reader API.", action="store_true")
+PARSER.add_argument(
+    "-e", "--export", help="Archive validations for a range of ledger sequences, then exit.",
+    nargs=2, type=int, metavar=("FIRST_SEQUENCE", "LAST_SEQUENCE")
+)
 ARGS = PARSER.parse_args()
 
 def config_logging(settings):
@@ -52,6 +57,40 @@ def run_db_writer():
     check_db_writer_settings(settings_db_w)
     start_loop_db_w(settings_db_w)
 
+def run_db_reader():
+    '''
+    Run the db_reader module.
+    '''
+    import settings_db_reader as settings_db_r
+    from assertions.assert_db_reader import check_db_reader_settings
+    from db_reader.reader_asyncio_tasks import start_loop as start_loop_db_r
+
+    config_logging(settings_db_r)
+    check_db_reader_settings(settings_db_r)
+    start_loop_db_r(settings_db_r)
+
+def run_export(first_sequence, last_sequence):
+    '''
+    Write validations from the db_writer database into a columnar archive.
+
+    :param int first_sequence: Lowest ledger sequence
+    :param int last_sequence: Highest ledger sequence
+    '''
+    import os
+    import settings_db_writer as settings_db_w
+    from db_writer.archive import export_range
+    from db_writer.sqlite_connection import create_db_connection
+
+    config_logging(settings_db_w)
+    os.makedirs(settings_db_w.ARCHIVE_DIRECTORY, exist_ok=True)
+    path = os.path.join(
+        settings_db_w.ARCHIVE_DIRECTORY, f"validations_{first_sequence}_{last_sequence}.xvta"
+    )
+    count = export_range(
+        create_db_connection(settings_db_w.DATABASE_LOCATION), first_sequence, last_sequence, path
+    )
+    print(f"Archived: {count} validations to: {path}.")
+
 def run_aggregator():
     '''
     Run the aggregator module.
@@ -65,6 +104,10 @@ def run_aggregator():
     start_loop_ag(settings_ag)
 
 if __name__ == '__main__':
+    if ARGS.export:
+        run_export(*ARGS.export)
+        sys_exit(0)
+
     PROCESSES = []
     if ARGS.aggregator:
         PROCESSES.append(Process(target=run_aggregator,))
@@ -72,6 +115,8 @@ if __name__ == '__main__':
         PROCESSES.append(Process(target=run_db_writer,))
     if ARGS.supplemental:
         PROCESSES.append(Process(target=run_supplemental,))
+    if ARGS.db_reader:
+        PROCESSES.append(Process(target=run_db_reader,))
 
     try:
         for process in PROCESSES:
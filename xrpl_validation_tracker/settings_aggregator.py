@@ -9,13 +9,32 @@ LOG_FILE = "../aggregator.log" # Log file location
 LOG_LEVEL = logging.WARNING
 ASYNCIO_DEBUG = False # Debug the asyncio loop
 
-# Storing too many SENT_MESSAGES can slow down the script and result in the outgoing server hanging
+QUEUE_MAX_SIZE = 10000 # Max n messages waiting between each stage of the module (0 is unbounded)
+# Action when a queue is full: 'block' (stop reading from websocket servers until there is room),
+# 'drop_oldest' message, or 'drop_by_type' (drop responses, then validations, then ledgerClosed messages)
+QUEUE_OVERFLOW_POLICY = 'drop_by_type'
+
+# Lookups and evictions are O(1), so this only bounds memory use
 SENT_MESSAGES_MAX_LENGTH = 20000 # n outbound items to store to avoid sending duplicate outbound WS messages
+CONSENSUS_WINDOW = 256 # n recent ledger sequences to track validators' agreement for (0 disables)
+# Send clients a 'validationsMissed' message listing the validators that didn't validate each closed ledger
+MISSED_VALIDATIONS = True # Requires CONSENSUS_WINDOW
+MISSED_VALIDATION_GRACE = 5 # Seconds after a ledger closes to wait for its validations
+# Master keys of the validators expected to validate every ledger (e.g., the dUNL).
+# If empty, every validator seen in the CONSENSUS_WINDOW is expected.
+MISSED_VALIDATION_KEYS = []
 
 #### ------------------- WS Client Settings ------------------- ####
-WS_RETRY = 20 # Time in seconds to wait before trying to reconnect to a websocket server
-MAX_CONNECT_ATTEMPTS = 9000000 # Max number of tries to attempt to call a remote websocket server
-WS_SUBSCRIPTION_COMMAND = {"command": "subscribe", "streams": ["validations", "ledger",]} # Command to send to websocket server on open
+WS_BACKOFF_MIN = 0.1 # Seconds to wait before reconnecting to a websocket server. Doubles after each consecutive failure
+WS_BACKOFF_MAX = 60 # Max seconds to wait before reconnecting to a websocket server
+WS_STALE_TIMEOUT = 30 # Reconnect if a websocket server sends no messages for this many seconds (0 disables)
+MAX_CONNECT_ATTEMPTS = 9000000 # Max consecutive failed tries to connect to a remote websocket server
+# Number of processes to spread the URLS connections across. 0 keeps every connection in
+# the main aggregator process. Workers always forward raw frames.
+AGGREGATOR_WORKERS = 0
+# Forward frames without decoding them. Only the fields needed for deduplication are read.
+RAW_FRAMES = True
+WS_SUBSCRIPTION_COMMAND = {"command": "subscribe", "streams": ["validations", "ledger", "manifests",]} # Command to send to websocket server on open
 
 
 URLS = [
@@ -27,4 +46,17 @@ URLS = [
 #### ------------------- WS Server Settings ------------------- ####
 SERVER_IP = '127.0.0.1'
 SERVER_PORT = 8000
+WS_CLIENT_BUFFER_SIZE = 5000 # n messages to buffer for each connected client
+# Action when a client's buffer is full: 'drop_oldest' message, 'disconnect' the client,
+# or 'coalesce' (drop the buffered ledgerClosed message when a newer one arrives, then validations for
+# ledgers that already closed, then the oldest message)
+WS_SLOW_CLIENT_POLICY = 'drop_oldest'
+# Send clients every stream until they send a subscribe or unsubscribe command. If False,
+# clients receive nothing until they subscribe, as with rippled.
+WS_SEND_ALL_BY_DEFAULT = True
+WS_MAX_VALIDATOR_KEYS = 1000 # Max n validator keys each client can filter validations by
 
+#### ------------------- Metrics Settings ------------------- ####
+METRICS_ENABLED = True # Serve Prometheus metrics over HTTP at /metrics
+METRICS_IP = '127.0.0.1'
+METRICS_PORT = 9101
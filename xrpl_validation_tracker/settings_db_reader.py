@@ -0,0 +1,22 @@
+'''
+Variables
+'''
+import logging
+
+#### ------------------ General Settings #### ------------------
+LOG_FILE = "../database_reader.log"
+LOG_LEVEL = logging.WARNING
+DATABASE_LOCATION = "../validations.sqlite3" # SQLite database written by the db_writer
+DB_READER_THREADS = 4 # n threads querying the database, each with its own read-only connection
+ASYNCIO_DEBUG = False
+
+#### ------------------ API Server Settings #### ------------------
+SERVER_IP = '127.0.0.1'
+SERVER_PORT = 8001
+CACHE_TTL = 5 # Seconds to cache each response (0 disables caching)
+CACHE_MAX_ENTRIES = 10000 # Max n responses to cache
+
+#### ------------------ Metrics Settings #### ------------------
+METRICS_ENABLED = True # Serve Prometheus metrics over HTTP at /metrics
+METRICS_IP = '127.0.0.1'
+METRICS_PORT = 9104
@@ -6,15 +6,50 @@ import logging
 #### ------------------ General Settings #### ------------------
 LOG_FILE = "../database_writer.log"
 LOG_LEVEL = logging.WARNING
+DB_BACKEND = 'sqlite' # 'sqlite' or 'postgresql'
 DATABASE_LOCATION = "../validations.sqlite3"
+POSTGRES_DSN = "postgresql://tracker@localhost/validations" # Used when DB_BACKEND is 'postgresql'
+POSTGRES_POOL_SIZE = 4 # Max connections to PostgreSQL
+DB_SYNCHRONOUS = 'NORMAL' # SQLite PRAGMA synchronous: 'OFF', 'NORMAL', or 'FULL'
+DB_CACHE_SIZE = 65536 # SQLite page cache size in KiB
+DB_MMAP_SIZE = 268435456 # Bytes of the SQLite database to memory map (0 disables)
 ASYNCIO_DEBUG = False
 
+QUEUE_MAX_SIZE = 10000 # Max n messages waiting between each stage of the module (0 is unbounded)
+# Action when a queue is full: 'block' (stop reading from websocket servers until there is room),
+# 'drop_oldest' message, or 'drop_by_type' (drop responses, then validations, then ledgerClosed messages)
+QUEUE_OVERFLOW_POLICY = 'block'
 SENT_MESSAGES_MAX_LENGTH = 20000 # n messages to retain to avoid duplicate DB queries
+DB_BATCH_SIZE = 1000 # Max n messages to write to the database in a single transaction
+DB_BATCH_LATENCY = 1 # Max time (seconds) to hold a message before writing it to the database
+LEDGER_ID_CACHE_SIZE = 2000 # n recent ledger hashes to cache database ids for
+AGGREGATE_LEDGER_WINDOW = 2000 # n recent ledgers to hold validations for until their ledgerClosed message arrives (SQLite only)
+DB_WRITER_QUEUE_SIZE = 20 # Max n batches waiting for the database writer thread
+
+# SQLite only: store validations in one file per PARTITION_LEDGERS ledgers (0 keeps them in DATABASE_LOCATION)
+PARTITION_LEDGERS = 0 # For example, 100000 ledgers is roughly 4-5 days
+PARTITION_DIRECTORY = "../partitions" # Directory to store partition files in
+PARTITIONS_HOT = 2 # n most recent partitions to keep attached. Older partitions are compacted.
+ARCHIVE_COLD_PARTITIONS = False # Also write compacted partitions into columnar archives
+ARCHIVE_DIRECTORY = "../archives" # Directory to store columnar archives in
+
+# Tell supplemental_data about new validator keys, so it looks them up right away (SQLite only)
+KEY_EVENTS_ENABLED = True
+KEY_EVENTS_IP = '127.0.0.1' # IP supplemental_data listens for new key events on
+KEY_EVENTS_PORT = 9110
+
 #### ------------------ Websocket Client Settings #### ------------------
-WS_RETRY = 5 # Time in seconds to wait before trying to respawn a websocket connection
-MAX_CONNECT_ATTEMPTS = 50000 # Max numbers of tries to attempt to call a remote websocket server
+WS_BACKOFF_MIN = 0.1 # Seconds to wait before reconnecting to a websocket server. Doubles after each consecutive failure
+WS_BACKOFF_MAX = 60 # Max seconds to wait before reconnecting to a websocket server
+WS_STALE_TIMEOUT = 30 # Reconnect if a websocket server sends no messages for this many seconds (0 disables)
+MAX_CONNECT_ATTEMPTS = 50000 # Max consecutive failed tries to connect to a remote websocket server
 WS_SUBSCRIPTION_COMMAND = {} # Command to send to websocket servers upon connection
 
 URLS = [
     {'url': "ws://127.0.0.1:8000", "ssl_verify": False},
 ]
+
+#### ------------------ Metrics Settings #### ------------------
+METRICS_ENABLED = True # Serve Prometheus metrics over HTTP at /metrics
+METRICS_IP = '127.0.0.1'
+METRICS_PORT = 9102
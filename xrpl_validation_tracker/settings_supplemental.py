@@ -6,17 +6,43 @@ import logging
 #### ------------------ General Settings #### ------------------
 LOG_FILE = "../supplemental_data.log"
 LOG_LEVEL = logging.WARNING
+DB_BACKEND = 'sqlite' # 'sqlite' or 'postgresql'
 DATABASE_LOCATION = "../validations.sqlite3"
+POSTGRES_DSN = "postgresql://tracker@localhost/validations" # Used when DB_BACKEND is 'postgresql'
+POSTGRES_POOL_SIZE = 4 # Max connections to PostgreSQL
 ASYNCIO_DEBUG = False
 
-SLEEP_CYCLE = 600 # Time (seconds) to sleep between runs
+SLEEP_CYCLE = 600 # Time (seconds) between refreshes of each key's manifest and of the dUNL
+NEW_KEY_INTERVAL = 30 # Time (seconds) between checks for new keys and keys due to be refreshed
+TOML_TTL = 86400 # Time (seconds) between requests for each domain's TOML file, unless its manifest changes
+KEY_MAX_AGE = 2592000 # Stop refreshing keys that haven't validated a ledger for this many seconds (SQLite only)
 
-HTTP_TIMEOUT = 20 # Time (seconds) to wait for HTTP responses
+# Look up keys as soon as the db_writer reports them as new, rather than at the next NEW_KEY_INTERVAL (SQLite only)
+KEY_EVENTS_ENABLED = True
+KEY_EVENTS_IP = '127.0.0.1' # Must match KEY_EVENTS_IP in settings_db_writer.py
+KEY_EVENTS_PORT = 9110 # Must match KEY_EVENTS_PORT in settings_db_writer.py
+KEY_EVENT_DELAY = 2 # Time (seconds) to wait after an event, so keys arriving together are looked up together
+
+HTTP_TIMEOUT = 20 # Time (seconds) to wait for HTTP and manifest query responses
+HTTP_CONNECTIONS = 100 # Max n open HTTP connections, which are kept alive and reused
+HTTP_CONNECTIONS_PER_HOST = 4 # Max n open HTTP connections to each host
+DNS_CACHE_SECONDS = 600 # Time (seconds) to cache DNS lookups
+MAX_CONCURRENT_LOOKUPS = 50 # Max n keys to query manifests and TOML files for at once
+
+VERIFY_SIGNATURES = False # Verify manifest and dUNL signatures. Keys and lists that fail are not updated
+VERIFY_PROCESSES = 2 # Number of processes to verify signatures in
+VERIFIED_CACHE_SIZE = 10000 # n verified manifest hashes to remember, so they aren't verified again
 
 DUNL_ADDRESS = "https://vl.xrplf.org" # Address where the dUNL is served
 #DUNL_ADDRESS = "https://vl.ripple.com" # Address where the dUNL is served
 
+MANIFESTS_FROM_DB = True # Use manifests the db_writer stored from the manifests stream, only querying keys without one
 #List of URLs to query for manifests
 MANIFEST_QUERY_WS = [
     {'url': 'wss://marvin.alloy.ee', 'ssl_verify': False},
 ]
+
+#### ------------------ Metrics Settings #### ------------------
+METRICS_ENABLED = True # Serve Prometheus metrics over HTTP at /metrics
+METRICS_IP = '127.0.0.1'
+METRICS_PORT = 9103
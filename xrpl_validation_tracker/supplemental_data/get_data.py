@@ -5,96 +5,53 @@ Validate domain, UNL status, and other info for keys stored in an exiting databa
 import asyncio
 import json
 import logging
-import socket
-import sqlite3
 import time
 
 import aiohttp
 import pytomlpp
-import websockets
 
-from supplemental_data.sqlite3_connection import create_db_connection
-from db_writer.sqlite_writer import sql_write
-from ws_client.ws_listen import create_ws_object
+from db_writer.key_events import start_key_event_listener
+from db_writer.manifests import decode_manifest
+from db_writer.storage import create_backend
+from metrics.http_server import start_metrics_server
+from metrics.registry import REGISTRY
+from .manifest_client import ManifestClient
+from .signatures import SignatureVerifier
 import xrpl_unl_manager.utils as unl_utils
 
+CYCLE_SECONDS = REGISTRY.histogram(
+    'xrpl_supplemental_cycle_seconds', "Time to complete each supplemental data cycle.",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200, 3600)
+)
+CYCLE_ERRORS = REGISTRY.counter('xrpl_supplemental_cycle_errors_total', "Supplemental data cycles that failed.")
+KEYS_VERIFIED = REGISTRY.gauge('xrpl_supplemental_keys', "Keys updated in the last supplemental data cycle.")
+KEYS_CHECKED = REGISTRY.gauge('xrpl_supplemental_keys_checked', "Keys looked up in the last supplemental data cycle.")
+TOML_NOT_MODIFIED = REGISTRY.counter('xrpl_supplemental_toml_not_modified_total', "TOML requests answered with 304 Not Modified.")
+KEY_EVENTS = REGISTRY.counter('xrpl_supplemental_key_events_total', "Keys reported as new by the db_writer.")
+
 class DomainVerification:
     '''
     Query the manifests and TOML files to find and verify domains.
     '''
     def __init__(self):
-        self.db_connection = None
+        self.backend = None
         self.keys_new = []
         self.master_keys = None
         self.dunl_keys = set()
         self.settings = None
-
-    async def write_ma_keys(self, data):
-        '''
-        Write the supplemental data for the master keys into the database.
-
-        :param list data: Aggregated SQL data to write
-        '''
-        logging.info(f"Preparing to write: {len(data)} keys to the master_key DB.")
-        self.db_connection.executemany(
-            '''
-            UPDATE master_keys
-            SET
-                domain = ?,
-                dunl = ?,
-                network = ?,
-                server_country = ?,
-                owner_country = ?,
-                toml_verified = ?
-            WHERE master_key = ?
-            ''',
-            data
-        )
-        logging.info(f"Wrote: {len(data)} keys to the master_key DB.")
-
-    async def write_eph_keys(self, data):
-        '''
-        Write the supplemental data for ephemeral keys into the database.
-
-        :param list data: Aggregated SQL data to write
-        '''
-        logging.info(f"Preparing to write: {len(data)} keys to the ephemeral_key DB.")
-        self.db_connection.executemany(
-            '''
-            UPDATE ephemeral_keys
-            SET
-                master_key = (SELECT rowid FROM master_keys WHERE master_key = ?)
-            WHERE ephemeral_key = ?
-            ''',
-            data
-        )
-        logging.info(f"Wrote: {len(data)} keys to the ephemeral_key DB.")
-
-    async def write_manifests(self, data):
-        '''
-        Write manifests into the database.
-
-        :param list data: Aggregated SQL data to write
-        '''
-        logging.info(f"Preparing to write: {len(data)} manifests to the DB.")
-        self.db_connection.executemany(
-            '''
-            INSERT OR IGNORE INTO manifests (
-                manifest,
-                manifest_sig_master,
-                manifest_sig_eph,
-                sequence,
-                master_key,
-                ephemeral_key
-            )
-            VALUES (?, ?, ?, ?,
-                (SELECT rowid FROM master_keys WHERE master_key is ?),
-                (SELECT rowid FROM ephemeral_keys WHERE ephemeral_key is ?)
-            )
-            ''',
-            data
-        )
-        logging.info(f"Wrote: {len(data)} manifests to the DB.")
+        self.session = None
+        self.manifests = None
+        self.semaphore = None
+        self.dunl_etag = None
+        self.dunl_last_modified = None
+        self.dunl_checked = 0
+        self.domain_freshness = {}
+        self.domains_checked = {}
+        self.keys_failed = []
+        self.listener = None
+        self.event_keys = set()
+        self.stored_manifests = {}
+        self.verifier = None
 
     async def write_to_db(self):
         '''
@@ -134,122 +91,134 @@ class DomainVerification:
                 )
             )
 
-        await self.write_ma_keys(data_master)
-        await self.write_eph_keys(data_ephemeral)
-        await self.write_manifests(data_manifest)
-
-        self.db_connection.commit()
-        self.db_connection.close()
-        logging.info("Database connection closed.")
-
-    async def get_db_connection(self):
+        if not self.keys_new:
+            return
+        logging.info(f"Preparing to write: {len(data_master)} keys to the master_key DB.")
+        await self.backend.update_master_keys(data_master)
+        logging.info(f"Preparing to write: {len(data_ephemeral)} keys to the ephemeral_key DB.")
+        await self.backend.update_ephemeral_keys(data_ephemeral)
+        logging.info(f"Preparing to write: {len(data_manifest)} manifests to the DB.")
+        await self.backend.write_manifests(data_manifest)
+        logging.info(f"Wrote supplemental data for: {len(self.keys_new)} keys to the DB.")
+
+    def create_session(self):
         '''
-        Create the database connection.
+        Create the HTTP session shared by every request. Connections are kept alive and
+        DNS results are cached, so repeat requests to a host skip the lookup and handshake.
         '''
-        self.db_connection = create_db_connection(self.settings.DATABASE_LOCATION)
-
-    async def http_request(self, url):
-        '''
-        Return the results from a http request.
-
-        :param str url: Address to connect to
-        '''
-        response = ''
+        connector = aiohttp.TCPConnector(
+            limit=self.settings.HTTP_CONNECTIONS,
+            limit_per_host=self.settings.HTTP_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=self.settings.DNS_CACHE_SECONDS,
+        )
         session_timeout = aiohttp.ClientTimeout(
             total=None,
             sock_connect=self.settings.HTTP_TIMEOUT,
             sock_read=self.settings.HTTP_TIMEOUT
         )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=session_timeout)
+
+    async def http_request(self, url, etag=None, last_modified=None):
+        '''
+        Return the results from a http request. If an ETag or Last-Modified value from an
+        earlier response is passed, the server is asked to only send the file if it changed.
+
+        :param str url: Address to connect to
+        :param str etag: ETag from an earlier response
+        :param str last_modified: Last-Modified from an earlier response
+        :returns: Response body, ETag, and Last-Modified. The body is None if the request
+            failed, and False if the file wasn't modified.
+        :rtype: tuple
+        '''
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
         try:
-            async with aiohttp.ClientSession(timeout=session_timeout) as session:
-                response = await session.get(url)
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    return False, etag, last_modified
                 if response.status == 200:
-                    return await response.text()
+                    return (
+                        await response.text(),
+                        response.headers.get('ETag'),
+                        response.headers.get('Last-Modified'),
+                    )
 
         except (
                 aiohttp.client_exceptions.ClientError,
                 aiohttp.client_exceptions.ClientResponseError,
                 aiohttp.client_exceptions.ClientConnectionError,
+                asyncio.TimeoutError,
                 #aiohttp.client_exceptions.ClientConnectorError,
                 #aiohttp.client_exceptions.ClientConnectorCertificateError,
         ) as error:
             logging.info(f"Unable to complete HTTP request to URL: {url}. Error: {error}.")
-
-    async def get_manifest(self, key):
-        '''
-        Query the manifest for a given key.
-
-        :param str key: Master key to query
-        '''
-        manifest = None
-        query_attempt = 1
-        query = json.dumps(
-            {
-                "command": "manifest",
-                "public_key": key
-            })
-
-        for url in self.settings.MANIFEST_QUERY_WS:
-            if not manifest:
-                try:
-                    websocket_connection = await create_ws_object(url)
-                    if websocket_connection:
-                        async with websocket_connection as wsocket:
-                            await wsocket.send(query)
-                            manifest = await wsocket.recv()
-                    manifest = json.loads(manifest)
-                    # logging.info(f"Successfully retrieved the manifest for {key}.")
-                except (
-                        TimeoutError,
-                        ConnectionResetError,
-                        ConnectionRefusedError,
-                        websockets.exceptions.InvalidStatusCode,
-                        websockets.exceptions.ConnectionClosedError,
-                        websockets.exceptions.InvalidMessage,
-                        socket.gaierror,
-                ) as error:
-                    logging.warning(f"Error:( {error}) querying manifest for key {key} from server: {url}.")
-                query_attempt += 1
-            elif manifest:
-                #logging.info(f"Retrieved manifest for validator {key} using server: {url}.")
-                pass
-
-            return manifest
+        return None, None, None
 
     async def get_master_keys(self):
         '''
         Retrieve master keys from the database.
 
         '''
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT * FROM master_keys",)
-        self.master_keys = cursor.fetchall()
+        self.master_keys = await self.backend.get_master_keys()
         logging.info(f"Retrieved: {len(self.master_keys)} master keys from the database.")
-        self.db_connection.close()
-        logging.info("Database connection closed.")
 
     async def get_dunl_keys(self):
         '''
-        Retrieve the dUNL from a remote site.
+        Retrieve the dUNL from a remote site, if SLEEP_CYCLE seconds have passed since it
+        was last checked. The request is conditional, so an unchanged list isn't downloaded.
         '''
-        self.dunl_keys = set()
+        now = time.time()
+        if now - self.dunl_checked < self.settings.SLEEP_CYCLE:
+            return
         logging.info(f"Preparing to retrieve the dUNL from {self.settings.DUNL_ADDRESS}.")
-        dunl = await self.http_request(self.settings.DUNL_ADDRESS)
-        #To-do: catch json.loads exceptions
-        dunl_keys = unl_utils.decodeValList(json.loads(dunl))
-        for i in dunl_keys:
-            self.dunl_keys.add(i.decode())
-        logging.info(f"Retrieved the dUNL, which contains: {len(self.dunl_keys)} keys.")
-
-    async def make_keys_list(self):
+        dunl, etag, last_modified = await self.http_request(
+            self.settings.DUNL_ADDRESS, self.dunl_etag, self.dunl_last_modified
+        )
+        if dunl is False:
+            self.dunl_checked = now
+            logging.info("The dUNL hasn't changed.")
+            return
+        try:
+            dunl = json.loads(dunl)
+            if self.verifier:
+                errors = await self.verifier.verify_unl(dunl)
+                if errors:
+                    raise ValueError(f"Signature verification failed: {', '.join(errors)}")
+            dunl_keys = {i.decode() for i in unl_utils.decodeValList(dunl)}
+        except (TypeError, ValueError, KeyError) as error:
+            # Keep the previous list, and try again next cycle.
+            logging.warning(f"Unable to retrieve the dUNL from {self.settings.DUNL_ADDRESS}. Error: {error}.")
+            return
+        self.dunl_checked = now
+        self.dunl_etag, self.dunl_last_modified = etag, last_modified
+        if dunl_keys != self.dunl_keys:
+            self.dunl_keys = dunl_keys
+            logging.info(f"Retrieved the dUNL, which contains: {len(self.dunl_keys)} keys.")
+
+    async def make_keys_list(self, key_freshness, key_activity):
         '''
-        Verify if a node is in the dUNL then make an initial list of keys.
+        Verify if a node is in the dUNL then list the keys due to be looked up. New keys
+        and keys the db_writer reported as new are listed first. Other keys are due
+        SLEEP_CYCLE seconds after they were last looked up, or as soon as their dUNL status
+        changes. Keys that haven't validated a ledger for KEY_MAX_AGE seconds are skipped.
+
+        :param dict key_freshness: (manifest_sequence, checked) for each key looked up before
+        :param dict key_activity: UNIX time each key last validated a ledger
         '''
+        now = time.time()
         for key in self.master_keys:
-            if key[0] in self.dunl_keys:
-                dunl = True
-            elif key[0] not in self.dunl_keys:
-                dunl = False
+            dunl = key[0] in self.dunl_keys
+            freshness = key_freshness.get(key[0])
+            new = freshness is None
+            changed = new or dunl != bool(key[2]) or key[0] in self.event_keys
+            if not changed:
+                if now - freshness[1] < self.settings.SLEEP_CYCLE:
+                    continue
+                if key_activity and now - key_activity.get(key[0], 0) > self.settings.KEY_MAX_AGE:
+                    continue
             self.keys_new.append(
                 {
                     'key': key[0],
@@ -259,25 +228,54 @@ class DomainVerification:
                     'network': key[3],
                     'server_country': key[4],
                     'owner_country': key[5],
-                    'toml_verified': False,
+                    'toml_verified': bool(key[6]),
                     'manifest_sig_master': '',
                     'manifest_sig_eph': '',
                     'manifest': '',
                     'sequence': int(),
+                    'new': new,
+                    'changed': changed,
+                    'previous_sequence': None if new else freshness[0],
                 }
             )
+        self.keys_new.sort(key=lambda i: not (i['new'] or i['key'] in self.event_keys))
+
+    def toml_due(self, key):
+        '''
+        :param dict key: Validation public key, domain, and other info
+        :returns: Whether the key's TOML file should be requested
+        :rtype: bool
+        '''
+        if key['changed']:
+            return True
+        freshness = self.domain_freshness.get(key['domain'])
+        return freshness is None or time.time() - freshness[2] >= self.settings.TOML_TTL
 
     async def check_toml(self, key):
         '''
         Attempt to retrieve and parse a TOML file for a domain provided through a manifest query.
+        If the key's data is already stored, the request is conditional, and an unmodified
+        file leaves the stored data in place.
 
         :param dict key: Validation public key, domain, and other info
         '''
         url = "https://" + key['domain'] + "/.well-known/xrp-ledger.toml"
         validators = []
+        etag, last_modified = None, None
+        freshness = self.domain_freshness.get(key['domain'])
+        if freshness and not key['changed']:
+            etag, last_modified = freshness[:2]
         #logging.info(f"Preparing to retrieve TOML for: {key['domain']}.")
         try:
-            response_content = await self.http_request(url)
+            response_content, etag, last_modified = await self.http_request(url, etag, last_modified)
+            if response_content is None:
+                return key
+            self.domains_checked[key['domain']] = (etag, last_modified, int(time.time()))
+            if response_content is False:
+                TOML_NOT_MODIFIED.inc()
+                return key
+            previous = (key['toml_verified'], key['network'], key['owner_country'], key['server_country'])
+            key['toml_verified'] = False
             validators = pytomlpp.loads(str(response_content))['VALIDATORS']
             for i in validators:
                 if i['public_key'] == key['key']:
@@ -294,32 +292,141 @@ class DomainVerification:
                     # To-do: Check to see if novel keys are listed in the TOML.
                     # Then use the manifest verify their domains.
                     logging.info(f"An additional validator key was detected while querying {key['domain']}.")
-        except (pytomlpp._impl.DecodeError,) as error:
+            if previous != (key['toml_verified'], key['network'], key['owner_country'], key['server_country']):
+                key['changed'] = True
+        except (pytomlpp._impl.DecodeError, KeyError) as error:
             logging.info(f"Unable to decode the TOML for: {key['domain']}. Error: {error}.")
 
         return key
 
-    async def get_domain(self, key):
+    async def get_manifest(self, key):
+        '''
+        Use the manifest the db_writer stored from the manifests stream, or query it if there
+        isn't one. An event for a key whose stored manifest was already looked up means the
+        stream may have missed a key rotation, so the manifest is queried.
+
+        :param dict key: key, domain, dunl
+        :returns: Base64 encoded manifest and the decoded manifest
+        :rtype: tuple
+        '''
+        manifest_blob = self.stored_manifests.get(key['key'])
+        if manifest_blob is not None:
+            manifest = decode_manifest(manifest_blob)
+            if key['key'] not in self.event_keys or manifest['seq'] != key['previous_sequence']:
+                return manifest_blob, manifest
+        response = await self.manifests.query(key['key'])
+        manifest_blob = response['result']['manifest']
+        return manifest_blob, decode_manifest(manifest_blob)
+
+    def lookup_failed(self, key, error):
         '''
-        Retrieve domains from a manifest and verify them via TOML.
+        Record a key whose lookup failed, so it is retried after SLEEP_CYCLE.
 
         :param dict key: key, domain, dunl
+        :param error: Reason the lookup failed
+        '''
+        logging.info(f"Unable to retrieve supplemental data for key: {key['key']}. Error: {error}.")
+        self.keys_failed.append(key)
+
+    async def fetch_manifest(self, key):
+        '''
+        Look up a key's manifest once fewer than MAX_CONCURRENT_LOOKUPS lookups are running.
+
+        :param dict key: key, domain, dunl
+        :returns: The key, its base64 encoded manifest, and the decoded manifest, or None if
+            the lookup failed
+        :rtype: tuple
+        '''
+        async with self.semaphore:
+            try:
+                manifest_blob, manifest = await self.get_manifest(key)
+                if manifest['master_key'] != key['key']:
+                    raise ValueError(f"Received a manifest for key: {manifest['master_key']}")
+                return key, manifest_blob, manifest
+            except (KeyError, TypeError, ValueError) as error:
+                self.lookup_failed(key, error)
+                return None
+
+    async def verify_manifests(self, lookups):
+        '''
+        Check the signatures of a cycle's manifests with a single call to the verifier, so
+        they are split evenly across its processes.
+
+        :param list lookups: (key, base64 encoded manifest, decoded manifest) tuples
+        :returns: The lookups with valid manifests
+        :rtype: list
+        '''
+        if not self.verifier or not lookups:
+            return lookups
+        valid = await self.verifier.verify_manifests([i[1] for i in lookups])
+        for lookup, manifest_valid in zip(lookups, valid):
+            if not manifest_valid:
+                self.lookup_failed(lookup[0], "Invalid manifest signature")
+        return [lookup for lookup, manifest_valid in zip(lookups, valid) if manifest_valid]
+
+    async def get_domain(self, key, manifest_blob, manifest):
+        '''
+        Retrieve domains from a manifest and verify them via TOML. The TOML file is only
+        requested when the manifest changed or the domain's TOML_TTL has passed.
+
+        :param dict key: key, domain, dunl
+        :param str manifest_blob: Base64 encoded manifest
+        :param dict manifest: Decoded manifest
         '''
-        manifest = await self.get_manifest(key['key'])
-        manifest_blob = manifest['result']['manifest']
-        manifest = manifest['result']['details']
         key['ephemeral_key'] = manifest['ephemeral_key']
         key['sequence'] = manifest['seq']
-        decoded_manifest = unl_utils.decodeManifest(manifest_blob)
-        key['manifest_sig_master'] = decoded_manifest['master_signature']
-        key['manifest_sig_eph'] = decoded_manifest['signature']
+        key['manifest_sig_master'] = manifest['master_signature']
+        key['manifest_sig_eph'] = manifest['signature']
         key['manifest'] = manifest_blob
+        if key['sequence'] != key['previous_sequence']:
+            key['changed'] = True
 
         if manifest['domain']:
-            key['domain'] = manifest['domain'].lower()
-            key = await self.check_toml(key)
+            domain = manifest['domain'].lower()
+            if domain != key['domain']:
+                key['domain'] = domain
+                key['changed'] = True
+            if self.toml_due(key):
+                key = await self.check_toml(key)
         return key
 
+    async def get_domain_bounded(self, key, manifest_blob, manifest):
+        '''
+        Check a key's domain once fewer than MAX_CONCURRENT_LOOKUPS lookups are running. A
+        key that can't be checked doesn't stop the others, and is retried after SLEEP_CYCLE.
+
+        :param dict key: key, domain, dunl
+        :param str manifest_blob: Base64 encoded manifest
+        :param dict manifest: Decoded manifest
+        :returns: The key, or None if its lookup failed
+        :rtype: dict
+        '''
+        async with self.semaphore:
+            try:
+                return await self.get_domain(key, manifest_blob, manifest)
+            except (KeyError, TypeError, ValueError) as error:
+                self.lookup_failed(key, error)
+                return None
+
+    async def wait_for_keys(self):
+        '''
+        Wait NEW_KEY_INTERVAL seconds, or until the db_writer reports new keys.
+        '''
+        logging.info(f"Sleeping for up to {self.settings.NEW_KEY_INTERVAL} seconds.")
+        if not self.listener:
+            await asyncio.sleep(self.settings.NEW_KEY_INTERVAL)
+            return
+        try:
+            await asyncio.wait_for(self.listener.received.wait(), self.settings.NEW_KEY_INTERVAL)
+            # Give keys arriving in the following batches a chance to join this cycle.
+            await asyncio.sleep(self.settings.KEY_EVENT_DELAY)
+        except asyncio.TimeoutError:
+            pass
+        self.event_keys = self.listener.take()
+        if self.event_keys:
+            KEY_EVENTS.inc(len(self.event_keys))
+            logging.info(f"Received events for: {len(self.event_keys)} new keys.")
+
     async def run_verification(self, settings):
         '''
         Run the script.
@@ -327,23 +434,51 @@ class DomainVerification:
         :param settings: Configuration file.
         '''
         self.settings = settings
+        self.backend = create_backend(settings)
+        await self.backend.start()
+        self.create_session()
+        self.manifests = ManifestClient(settings.MANIFEST_QUERY_WS, settings.HTTP_TIMEOUT)
+        self.semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_LOOKUPS)
+        if settings.VERIFY_SIGNATURES:
+            self.verifier = SignatureVerifier(settings.VERIFY_PROCESSES, settings.VERIFIED_CACHE_SIZE)
+        if settings.KEY_EVENTS_ENABLED:
+            self.listener = await start_key_event_listener(settings.KEY_EVENTS_IP, settings.KEY_EVENTS_PORT)
+        await start_metrics_server(settings)
         while True:
             self.keys_new = []
+            self.domains_checked = {}
+            self.keys_failed = []
             try:
-                logging.info(f"Sleeping for {self.settings.SLEEP_CYCLE} seconds.")
-                await asyncio.sleep(self.settings.SLEEP_CYCLE)
-                logging.info("Preparing to get supplemental data.")
+                await self.wait_for_keys()
                 time_start = time.time()
-                await self.get_db_connection()
                 await self.get_master_keys()
                 await self.get_dunl_keys()
                 if self.dunl_keys and self.master_keys:
-                    await self.make_keys_list()
+                    self.domain_freshness = await self.backend.get_domain_freshness()
+                    if self.settings.MANIFESTS_FROM_DB:
+                        self.stored_manifests = await self.backend.get_latest_manifests()
+                    await self.make_keys_list(
+                        await self.backend.get_key_freshness(),
+                        await self.backend.get_key_activity()
+                    )
                 if self.keys_new:
-                    domain_tasks = [self.get_domain(key) for key in self.keys_new]
-                    self.keys_new = await asyncio.gather(*domain_tasks)
-                    await self.get_db_connection()
+                    logging.info(f"Preparing to get supplemental data for: {len(self.keys_new)} keys.")
+                    lookups = await asyncio.gather(*[self.fetch_manifest(key) for key in self.keys_new])
+                    lookups = await self.verify_manifests([i for i in lookups if i])
+                    domain_tasks = [self.get_domain_bounded(*i) for i in lookups]
+                    keys_checked = [i for i in await asyncio.gather(*domain_tasks) if i]
+                    self.keys_new = [i for i in keys_checked if i['changed']]
                     await self.write_to_db()
+                    await self.backend.update_key_freshness(
+                        [(i['key'], i['sequence'], int(time_start)) for i in keys_checked]
+                        + [(i['key'], i['previous_sequence'], int(time_start)) for i in self.keys_failed]
+                    )
+                    await self.backend.update_domain_freshness(
+                        [(domain,) + freshness for domain, freshness in self.domains_checked.items()]
+                    )
+                    CYCLE_SECONDS.observe(time.time() - time_start)
+                    KEYS_CHECKED.set(len(keys_checked))
+                    KEYS_VERIFIED.set(len(self.keys_new))
                     logging.info(f"Supplemental data cycle completed in {round(time.time() - time_start, 2)} seconds.")
             except (
                     KeyError,
@@ -353,9 +488,16 @@ class DomainVerification:
                     ConnectionError,
             ) as error:
                 logging.warning(f"A general error: {error} was encountered Continuing.")
+                CYCLE_ERRORS.inc()
                 continue
-            except sqlite3.OperationalError as error:
-                logging.warning(f"SQLite3 error: {error}.")
+            except self.backend.errors as error:
+                logging.warning(f"Database error: {error}.")
+                CYCLE_ERRORS.inc()
                 continue
             except KeyboardInterrupt:
+                if self.verifier:
+                    self.verifier.close()
+                await self.manifests.close()
+                await self.session.close()
+                await self.backend.stop()
                 break
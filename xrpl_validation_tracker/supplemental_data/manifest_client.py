@@ -0,0 +1,122 @@
+'''
+Query manifests over a persistent websocket connection. Requests are tagged with an id,
+so any number of queries can share the connection, and a single reader task hands each
+response to the query waiting for it.
+'''
+import asyncio
+import json
+import logging
+import socket
+
+import websockets
+
+from ws_client.ws_listen import create_ws_object
+
+class ManifestClient:
+    '''
+    Multiplex manifest queries over one connection. If a server fails, the next server in
+    the list is used.
+
+    :param list urls: URL and SSL certificate verification settings for each server
+    :param float timeout: Seconds to wait for a connection or a response
+    '''
+    def __init__(self, urls, timeout):
+        self.urls = urls
+        self.timeout = timeout
+        self.url_index = 0
+        self.ws = None
+        self.reader = None
+        self.lock = asyncio.Lock()
+        self.pending = {}
+        self.next_id = 0
+
+    async def connect(self):
+        '''
+        Open a connection if there isn't one, trying each server once.
+
+        :returns: Websocket connection, or None if no server could be reached
+        '''
+        async with self.lock:
+            if self.ws is not None:
+                return self.ws
+            for _ in range(len(self.urls)):
+                url = self.urls[self.url_index]
+                try:
+                    websocket_connection = await create_ws_object(url)
+                    if websocket_connection:
+                        self.ws = await asyncio.wait_for(websocket_connection, self.timeout)
+                        self.reader = asyncio.ensure_future(self.read_responses(self.ws))
+                        logging.info(f"Connected to: {url['url']} for manifest queries.")
+                        return self.ws
+                except (
+                        asyncio.TimeoutError,
+                        OSError,
+                        socket.gaierror,
+                        websockets.exceptions.InvalidHandshake,
+                ) as error:
+                    logging.warning(f"Unable to connect to: {url['url']} for manifest queries. Error: {error}.")
+                self.url_index = (self.url_index + 1) % len(self.urls)
+            return None
+
+    async def read_responses(self, ws):
+        '''
+        Pass each response to the query with the matching id, until the connection closes.
+
+        :param ws: Websocket connection
+        '''
+        try:
+            async for data in ws:
+                try:
+                    response = json.loads(data)
+                    future = self.pending.pop(response['id'], None)
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if future and not future.done():
+                    future.set_result(response)
+        except websockets.exceptions.ConnectionClosed as error:
+            logging.warning(f"Manifest query connection closed. Error: {error}.")
+        finally:
+            if self.ws is ws:
+                self.ws = None
+                # Try the next server on the next query.
+                self.url_index = (self.url_index + 1) % len(self.urls)
+                # Queries waiting on the closed connection won't get a response.
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_result(None)
+                self.pending = {}
+
+    async def query(self, key):
+        '''
+        Query the manifest for a master key.
+
+        :param str key: Master key to query
+        :returns: Response from the server, or None
+        :rtype: dict
+        '''
+        ws = await self.connect()
+        if ws is None:
+            return None
+        self.next_id += 1
+        request_id = self.next_id
+        future = asyncio.get_event_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            await ws.send(json.dumps({"id": request_id, "command": "manifest", "public_key": key}))
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            logging.info(f"Timed out querying the manifest for key: {key}.")
+        except websockets.exceptions.ConnectionClosed as error:
+            logging.warning(f"Error: {error} querying the manifest for key: {key}.")
+        finally:
+            self.pending.pop(request_id, None)
+        return None
+
+    async def close(self):
+        '''
+        Close the connection.
+        '''
+        if self.ws is not None:
+            await self.ws.close()
+        if self.reader is not None:
+            await self.reader
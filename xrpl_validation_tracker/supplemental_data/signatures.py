@@ -0,0 +1,212 @@
+'''
+Verify the signatures on manifests and published UNLs. Verification is CPU bound, so it
+runs in a pool of processes rather than on the event loop, and manifests that were
+already verified are remembered by their hash.
+'''
+import asyncio
+import base64
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from cryptography.hazmat.primitives.asymmetric.utils import Prehashed
+
+from aggregator.dedup import DedupCache
+from db_writer.manifests import (
+    MASTER_SIGNATURE,
+    PUBLIC_KEY,
+    SIGNATURE,
+    SIGNING_PUB_KEY,
+    parse_manifest,
+    serialize_manifest,
+)
+from metrics.registry import REGISTRY
+
+MANIFEST_PREFIX = b'MAN\x00' # Prepended to manifests before they are signed
+ED25519_PREFIX = 0xed # First byte of 33 byte ed25519 public keys
+
+VALID_COUNT = REGISTRY.counter(
+    'xrpl_supplemental_signatures_total', "Manifests and UNL blobs verified, by result.", result='valid'
+)
+INVALID_COUNT = REGISTRY.counter(
+    'xrpl_supplemental_signatures_total', "Manifests and UNL blobs verified, by result.", result='invalid'
+)
+CACHED_COUNT = REGISTRY.counter(
+    'xrpl_supplemental_signatures_total', "Manifests and UNL blobs verified, by result.", result='cached'
+)
+
+def sha512_half(data):
+    '''
+    :param bytes data: Data to hash
+    :returns: First 32 bytes of the data's SHA-512 hash
+    :rtype: bytes
+    '''
+    return hashlib.sha512(data).digest()[:32]
+
+def verify_signature(public_key, signature, data):
+    '''
+    :param bytes public_key: 33 byte ed25519 or secp256k1 public key
+    :param bytes signature: Signature, DER encoded for secp256k1 keys
+    :param bytes data: Signed data
+    :rtype: bool
+    '''
+    try:
+        if public_key[0] == ED25519_PREFIX:
+            Ed25519PublicKey.from_public_bytes(public_key[1:]).verify(signature, data)
+        else:
+            # secp256k1 keys sign the SHA-512 half of the data.
+            ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256K1(), public_key).verify(
+                signature, sha512_half(data), ec.ECDSA(Prehashed(hashes.SHA256()))
+            )
+    except (InvalidSignature, ValueError, IndexError):
+        return False
+    return True
+
+def verify_manifest(manifest):
+    '''
+    Check a manifest's master key signature and, unless the manifest revokes the master
+    key, its ephemeral key signature.
+
+    :param bytes manifest: Serialized manifest
+    :rtype: bool
+    '''
+    try:
+        fields = parse_manifest(manifest)
+        data = MANIFEST_PREFIX + serialize_manifest(
+            {k: v for k, v in fields.items() if k not in (SIGNATURE, MASTER_SIGNATURE)}
+        )
+        if not verify_signature(fields[PUBLIC_KEY], fields[MASTER_SIGNATURE], data):
+            return False
+        if SIGNING_PUB_KEY in fields:
+            return verify_signature(fields[SIGNING_PUB_KEY], fields[SIGNATURE], data)
+        return True
+    except (KeyError, ValueError):
+        return False
+
+def verify_manifests(manifests):
+    '''
+    :param list manifests: Serialized manifests
+    :returns: Whether each manifest is valid
+    :rtype: list
+    '''
+    return [verify_manifest(i) for i in manifests]
+
+def verify_unl_blobs(unl):
+    '''
+    Check a published UNL's publisher manifest and the signature on each blob.
+
+    :param dict unl: Published UNL, as served by its publisher
+    :returns: Problems found, and the base64 encoded manifests of the validators listed
+    :rtype: tuple
+    '''
+    publisher = base64.b64decode(unl['manifest'])
+    if not verify_manifest(publisher):
+        return ["Invalid publisher manifest"], []
+    fields = parse_manifest(publisher)
+    if fields[PUBLIC_KEY].hex().upper() != unl['public_key'].upper():
+        return ["The publisher manifest is for a different key"], []
+    signing_key = fields.get(SIGNING_PUB_KEY)
+    # Version 2 lists may hold several blobs, each optionally signed with its own manifest.
+    blobs = unl.get('blobs_v2') or [{'blob': unl['blob'], 'signature': unl['signature']}]
+    errors = []
+    validator_manifests = []
+    for blob in blobs:
+        blob_signing_key = signing_key
+        if blob.get('manifest'):
+            blob_manifest = base64.b64decode(blob['manifest'])
+            blob_fields = parse_manifest(blob_manifest)
+            if not verify_manifest(blob_manifest) or blob_fields[PUBLIC_KEY] != fields[PUBLIC_KEY]:
+                errors.append("Invalid blob manifest")
+                continue
+            blob_signing_key = blob_fields.get(SIGNING_PUB_KEY)
+        data = base64.b64decode(blob['blob'])
+        if not blob_signing_key or not verify_signature(blob_signing_key, bytes.fromhex(blob['signature']), data):
+            errors.append("Invalid blob signature")
+            continue
+        validator_manifests.extend(
+            i['manifest'] for i in json.loads(data)['validators'] if i.get('manifest')
+        )
+    return errors, validator_manifests
+
+class SignatureVerifier:
+    '''
+    Verify signatures in a process pool, skipping manifests that were already verified.
+
+    :param int processes: Number of worker processes
+    :param int cache_size: Number of verified manifest hashes to remember
+    '''
+    def __init__(self, processes, cache_size):
+        self.processes = processes
+        self.executor = ProcessPoolExecutor(max_workers=processes)
+        self.verified = DedupCache(cache_size)
+
+    async def verify_manifests(self, manifests):
+        '''
+        :param list manifests: Base64 encoded manifests
+        :returns: Whether each manifest is valid
+        :rtype: list
+        '''
+        results = []
+        unverified = {}
+        for i, manifest in enumerate(manifests):
+            try:
+                data = base64.b64decode(manifest)
+            except ValueError:
+                results.append(False)
+                continue
+            manifest_hash = sha512_half(data)
+            results.append(manifest_hash in self.verified)
+            if results[i]:
+                CACHED_COUNT.inc()
+            else:
+                unverified[i] = (manifest_hash, data)
+        if not unverified:
+            return results
+
+        # Split the manifests into one batch per process, so each batch is only one round trip.
+        loop = asyncio.get_event_loop()
+        indexes = list(unverified)
+        batch_size = -(-len(indexes) // self.processes)
+        batches = [indexes[i:i + batch_size] for i in range(0, len(indexes), batch_size)]
+        checked = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, verify_manifests, [unverified[i][1] for i in batch])
+            for batch in batches
+        ])
+        for batch, valid in zip(batches, checked):
+            for i, manifest_valid in zip(batch, valid):
+                results[i] = manifest_valid
+                if manifest_valid:
+                    self.verified.add(unverified[i][0])
+                    VALID_COUNT.inc()
+                else:
+                    INVALID_COUNT.inc()
+        return results
+
+    async def verify_unl(self, unl):
+        '''
+        Check a published UNL's publisher manifest, blob signatures, and the manifest of
+        each validator it lists.
+
+        :param dict unl: Published UNL, as served by its publisher
+        :returns: Problems found, or an empty list if the UNL is valid
+        :rtype: list
+        '''
+        errors, validator_manifests = await asyncio.get_event_loop().run_in_executor(
+            self.executor, verify_unl_blobs, unl
+        )
+        if errors:
+            INVALID_COUNT.inc()
+            return errors
+        VALID_COUNT.inc()
+        valid = await self.verify_manifests(validator_manifests)
+        return [f"Invalid manifest for validator number: {i + 1}" for i, manifest_valid in enumerate(valid) if not manifest_valid]
+
+    def close(self):
+        '''
+        Stop the worker processes.
+        '''
+        self.executor.shutdown()
@@ -0,0 +1,117 @@
+'''
+Check that storage backends implement the StorageBackend interface the same way.
+
+Run from the xrpl_validation_tracker directory:
+`python3 -m unittest discover tests`
+'''
+import asyncio
+import os
+import sqlite3
+import tempfile
+import types
+import unittest
+
+from db_writer.memory_backend import MemoryBackend
+from db_writer.sqlite_backend import SqliteBackend
+from db_writer.sqlite_connection import create_db_connection
+from db_writer.sqlite_writer import write_batch
+from db_writer.storage import StorageBackend
+
+MESSAGES = [
+    {
+        'type': 'validationReceived',
+        'ledger_hash': 'AB' * 32,
+        'ledger_index': '2',
+        'validation_public_key': 'n9Ephemeral1',
+        'master_key': 'nHMaster1',
+        'signing_time': 700000000,
+        'full': True,
+    },
+    {
+        'type': 'validationReceived',
+        'ledger_hash': 'AB' * 32,
+        'ledger_index': '2',
+        'validation_public_key': 'n9Ephemeral2',
+        'master_key': 'nHMaster2',
+        'signing_time': 700000001,
+        'full': True,
+    },
+]
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+class IncompleteBackend(StorageBackend):
+    async def write_batch(self, messages):
+        pass
+
+class InterfaceTest(unittest.TestCase):
+    def test_incomplete_backend_fails_on_creation(self):
+        with self.assertRaises(TypeError):
+            IncompleteBackend(None)
+
+class BackendContract:
+    '''
+    Calls made by supplemental_data, run against each backend once MESSAGES are stored.
+    '''
+    def test_master_keys(self):
+        keys = run(self.backend.get_master_keys())
+        self.assertEqual(sorted(i[0] for i in keys), ['nHMaster1', 'nHMaster2'])
+        run(self.backend.update_master_keys([('example.com', 1, 'main', 'US', 'US', 1, 'nHMaster1')]))
+        keys = {i[0]: i[1:] for i in run(self.backend.get_master_keys())}
+        self.assertEqual(keys['nHMaster1'], ('example.com', 1, 'main', 'US', 'US', 1))
+        self.assertEqual(keys['nHMaster2'], (None,) * 6)
+
+    def test_latest_manifests(self):
+        run(self.backend.write_manifests([
+            ('manifest1', 'AA', 'BB', 1, 'nHMaster1', 'n9Ephemeral1'),
+            ('manifest2', 'AA', 'BB', 2, 'nHMaster1', 'n9Ephemeral1'),
+            ('manifest3', 'AA', 'BB', 1, 'nHMaster2', 'n9Ephemeral2'),
+        ]))
+        self.assertEqual(
+            run(self.backend.get_latest_manifests()),
+            {'nHMaster1': 'manifest2', 'nHMaster2': 'manifest3'}
+        )
+
+    def test_freshness(self):
+        run(self.backend.update_key_freshness([('nHMaster1', 2, 100)]))
+        run(self.backend.update_key_freshness([('nHMaster1', 3, 200)]))
+        self.assertEqual(run(self.backend.get_key_freshness()), {'nHMaster1': (3, 200)})
+        run(self.backend.update_domain_freshness([('example.com', 'etag', None, 100)]))
+        self.assertEqual(run(self.backend.get_domain_freshness()), {'example.com': ('etag', None, 100)})
+
+class MemoryBackendTest(BackendContract, unittest.TestCase):
+    def setUp(self):
+        self.backend = MemoryBackend()
+        run(self.backend.write_batch(MESSAGES))
+
+class SqliteBackendTest(BackendContract, unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        location = os.path.join(self.directory.name, 'validations.sqlite3')
+        # The db_writer creates the schema and writes the stream.
+        connection = create_db_connection(location)
+        write_batch(MESSAGES, connection)
+        connection.close()
+        self.backend = SqliteBackend(types.SimpleNamespace(DATABASE_LOCATION=location))
+
+    def tearDown(self):
+        run(self.backend.stop())
+        self.directory.cleanup()
+
+    def test_failed_update_is_rolled_back(self):
+        with self.assertRaises(sqlite3.Error):
+            run(self.backend.update_key_freshness([('nHMaster1', 2, 100), ('nHMaster2', 2)]))
+        self.assertFalse(self.backend.connection.in_transaction)
+        self.assertEqual(run(self.backend.get_key_freshness()), {})
+
+    def test_missing_database_isnt_created(self):
+        location = os.path.join(self.directory.name, 'missing.sqlite3')
+        backend = SqliteBackend(types.SimpleNamespace(DATABASE_LOCATION=location))
+        with self.assertRaises(sqlite3.Error):
+            run(backend.get_master_keys())
+        self.assertFalse(os.path.exists(location))
+        run(backend.stop())
+
+if __name__ == '__main__':
+    unittest.main()
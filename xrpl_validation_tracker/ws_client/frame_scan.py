@@ -0,0 +1,127 @@
+'''
+Extract the fields needed to route and deduplicate a websocket frame without decoding
+the whole JSON message, so frames can be forwarded as received.
+'''
+import json
+import logging
+import re
+from collections import namedtuple
+
+# A frame that is forwarded without being decoded.
+# type: message type, key: dedup key or None, frame: JSON text
+RawMessage = namedtuple('RawMessage', ['type', 'key', 'frame'])
+
+TYPE_PATTERN = re.compile(r'"type"\s*:\s*"([^"]*)"')
+# Keys are whole bytes of hex, so frames with malformed keys get no key and are skipped.
+KEY_PATTERNS = {
+    'validationReceived': re.compile(r'"signature"\s*:\s*"((?:[0-9A-Fa-f]{2})+)"'),
+    'ledgerClosed': re.compile(r'"ledger_hash"\s*:\s*"((?:[0-9A-Fa-f]{2})+)"'),
+}
+# Manifests are deduplicated by (master_key, seq), as a manifest has no single unique field.
+MANIFEST_KEY_PATTERN = re.compile(r'"master_key"\s*:\s*"([^"]*)"')
+MANIFEST_SEQ_PATTERN = re.compile(r'"seq"\s*:\s*(\d+)')
+VALIDATOR_KEY_PATTERN = re.compile(r'"(?:master_key|validation_public_key)"\s*:\s*"([^"]*)"')
+NODE_SPECIFIC_PATTERN = re.compile(r'"validated_ledgers"\s*:')
+# ledger_index is a string in validationReceived frames, and a number in ledgerClosed frames.
+LEDGER_INDEX_PATTERN = re.compile(r'"ledger_index"\s*:\s*"?(\d+)')
+LEDGER_HASH_PATTERN = re.compile(r'"ledger_hash"\s*:\s*"([0-9A-Fa-f]{64})"')
+EPHEMERAL_KEY_PATTERN = re.compile(r'"validation_public_key"\s*:\s*"([^"]*)"')
+
+def scan_frame(frame):
+    '''
+    Find the type and dedup key of a frame.
+
+    :param str frame: JSON text received from a websocket server
+    :rtype: RawMessage
+    '''
+    match = TYPE_PATTERN.search(frame)
+    message_type = match.group(1) if match else None
+    key = None
+    pattern = KEY_PATTERNS.get(message_type)
+    if pattern:
+        match = pattern.search(frame)
+        if match:
+            key = bytes.fromhex(match.group(1))
+    elif message_type == 'manifestReceived':
+        key = scan_manifest_key(frame)
+    return RawMessage(message_type, key, frame)
+
+def scan_manifest_key(frame):
+    '''
+    Find the master key and sequence of a manifestReceived frame.
+
+    :param str frame: JSON text received from a websocket server
+    :returns: (master_key, seq), or None
+    :rtype: tuple
+    '''
+    key = MANIFEST_KEY_PATTERN.search(frame)
+    sequence = MANIFEST_SEQ_PATTERN.search(frame)
+    if key and sequence:
+        return key.group(1), int(sequence.group(1))
+    return None
+
+def scan_ledger(frame):
+    '''
+    Find the ledger a validationReceived or ledgerClosed frame is for.
+
+    :param str frame: JSON text received from a websocket server
+    :returns: (ledger_index, ledger_hash), or None
+    :rtype: tuple
+    '''
+    sequence = scan_ledger_index(frame)
+    ledger_hash = LEDGER_HASH_PATTERN.search(frame)
+    if sequence is not None and ledger_hash:
+        return sequence, bytes.fromhex(ledger_hash.group(1))
+    return None
+
+def scan_ledger_index(frame):
+    '''
+    :param str frame: JSON text of a validationReceived or ledgerClosed message
+    :returns: The message's ledger_index, or None
+    :rtype: int
+    '''
+    match = LEDGER_INDEX_PATTERN.search(frame)
+    return int(match.group(1)) if match else None
+
+def scan_validator_key(frame):
+    '''
+    Find the master key of a validationReceived frame, or its ephemeral key if the master
+    key is unknown.
+
+    :param str frame: JSON text received from a websocket server
+    :rtype: str
+    '''
+    for pattern in (MANIFEST_KEY_PATTERN, EPHEMERAL_KEY_PATTERN):
+        match = pattern.search(frame)
+        if match and match.group(1):
+            return match.group(1)
+    return None
+
+def scan_validator_keys(frame):
+    '''
+    Find the master and ephemeral keys in a validationReceived frame, or the master key
+    in a manifestReceived frame.
+
+    :param str frame: JSON text received from a websocket server
+    :rtype: list
+    '''
+    return VALIDATOR_KEY_PATTERN.findall(frame)
+
+def strip_node_specific_fields(message):
+    '''
+    Remove `validated_ledgers` from a ledgerClosed frame. Frames without the field are
+    returned unchanged, without being decoded.
+
+    :param RawMessage message: Frame to strip
+    :returns: The stripped frame, or None if the frame isn't valid JSON
+    :rtype: RawMessage
+    '''
+    if message.type != 'ledgerClosed' or not NODE_SPECIFIC_PATTERN.search(message.frame):
+        return message
+    try:
+        data = json.loads(message.frame)
+    except ValueError as error:
+        logging.warning(f"Dropping a ledgerClosed frame that isn't valid JSON. Error: {error}.")
+        return None
+    data.pop('validated_ledgers', None)
+    return message._replace(frame=json.dumps(data))
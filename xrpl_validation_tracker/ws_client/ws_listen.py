@@ -6,6 +6,9 @@ import ssl
 
 import websockets
 
+from .encoding import decode_message
+from .frame_scan import scan_frame
+
 async def create_ws_object(url):
     '''
     Check if SSL certificate verification is enabled, then create a ws accordingly.
@@ -23,17 +26,39 @@ async def create_ws_object(url):
         logging.error(f"Error determining SSL/TLS settings for URL: {url}")
         return
 
-async def websocket_subscribe(url, subscription_command, queue_receive):
+async def queue_message(queue_receive, message, health):
+    '''
+    Put a message into the queue, marking the connection as blocked while it waits
+    for room.
+
+    :param asyncio.queues.Queue queue_receive: Queue for incoming websocket messages
+    :param message: Message to queue
+    :param ConnectionHealth health: Connection state to update, or None
+    '''
+    if not health:
+        await queue_receive.put(message)
+        return
+    health.queueing()
+    try:
+        await queue_receive.put(message)
+    finally:
+        health.queued()
+
+async def websocket_subscribe(url, subscription_command, queue_receive, raw=False, health=None):
     '''
     Connect to a websocket address using TLS settings specified in 'url'.
     Keep the socket open, and add unique response messages from the remote server to
-    the queue.
+    the queue. Hashes and signatures are converted to bytes.
 
     :param dict url: URL and SSL certificate verification settings
     :param json subscription_command: JSON object to send after opening the connection
     :param asyncio.queues.Queue queue_receive: Queue for incoming websocket messages
+    :param bool raw: Queue frames as RawMessages, rather than decoding them
+    :param ConnectionHealth health: Connection state to update, or None
     '''
     logging.info(f"Attempting to connect to: {url['url']}")
+    if health:
+        health.connecting()
 
     # Check to see if a custom SSLContext is needed to ignore cert verification
     websocket_connection = await create_ws_object(url)
@@ -44,12 +69,19 @@ async def websocket_subscribe(url, subscription_command, queue_receive):
                 # Subscribe to the websocket stream
                 await ws.send(json.dumps(subscription_command))
                 logging.info(f"Subscribed to: {url['url']}")
+                if health:
+                    health.subscribed()
                 while True:
                     # Listen for response messages
                     data = await ws.recv()
+                    if health:
+                        health.received()
+                    if raw:
+                        await queue_message(queue_receive, scan_frame(data), health)
+                        continue
                     try:
-                        data = json.loads(data)
-                        await queue_receive.put(data)
+                        data = decode_message(json.loads(data))
+                        await queue_message(queue_receive, data, health)
                     except (json.JSONDecodeError,) as error:
                         logging.warning(f"{url['url']}. Unable to decode JSON: {data}. Error: {error}")
                         break
@@ -1,52 +1,256 @@
+'''
+Supervise connections to remote websocket servers. Each connection restarts itself as
+soon as it closes, waiting a jittered, exponentially increasing delay after consecutive
+failures. Connections that stop delivering messages are closed and restarted.
+'''
 import asyncio
 import logging
+import random
+import time
 
+from metrics.registry import REGISTRY
 from .ws_listen import websocket_subscribe
 
-async def resubscribe_client(ws_servers, subscription_command, server, queue_receive):
+def backoff_delay(failures, minimum, maximum):
     '''
-    Attempt to reconnect dropped websocket connections to remote servers.
+    :param int failures: Number of consecutive failed attempts
+    :param float minimum: Delay (seconds) after the first failure
+    :param float maximum: Longest delay (seconds)
+    :returns: Seconds to wait before the next attempt, randomized so connections to the
+        same server don't retry in step
+    :rtype: float
+    '''
+    return random.uniform(0.5, 1) * min(maximum, minimum * 2 ** min(failures, 32))
 
-    :param list ws_servers: Connections to websocket servers
-    :param dict server: Info on the server that the reconnection attempt will be made to
-    :param dict subscription_command: Message to send to websocket server
-    :param asyncio.queues.Queue queue_receive: Queue for incoming websocket messages
-    :return: Connections to websocket servers
-    :rtype: list
-    '''
-    logging.warning(f"WS connection to {server['url']['url']} closed. Attempting to reconnect. Retry counter: {server['retry_count']}")
-    ws_servers.append(
-        {
-            #'task': asyncio.create_task(
-            'task': asyncio.ensure_future(
-                websocket_subscribe(server['url'], subscription_command, queue_receive)
-            ),
-            'url': server['url'],
-            'retry_count': server['retry_count'] + 1,
+class ConnectionHealth:
+    '''
+    State of a connection to a remote websocket server.
+
+    :param dict url: URL and SSL certificate verification settings
+    '''
+    def __init__(self, url):
+        self.url = url
+        self.connected = False
+        self.connect_time = None
+        self.last_message_time = None
+        self.blocked = False
+        self.latency = None
+        self.message_count = 0
+        self.reconnect_count = 0
+        self.failures = 0
+
+    def connecting(self):
+        '''
+        Called before opening the connection.
+        '''
+        self.connect_time = time.monotonic()
+
+    def subscribed(self):
+        '''
+        Called once the subscription command has been sent.
+        '''
+        now = time.monotonic()
+        self.connected = True
+        self.latency = now - self.connect_time
+        self.last_message_time = now
+
+    def received(self):
+        '''
+        Called for each message received.
+        '''
+        self.last_message_time = time.monotonic()
+        self.message_count += 1
+        self.failures = 0
+
+    def queueing(self):
+        '''
+        Called before putting a message into a queue that may be full.
+        '''
+        self.blocked = True
+
+    def queued(self):
+        '''
+        Called once the message is in the queue. Time spent waiting for room doesn't
+        count as silence from the remote server.
+        '''
+        self.blocked = False
+        self.last_message_time = time.monotonic()
+
+    def disconnected(self):
+        '''
+        Called when the connection closes or fails to open.
+        '''
+        # Consecutive attempts that ended without a message. Reset in received().
+        self.failures += 1
+        self.connected = False
+
+    def as_dict(self):
+        '''
+        :returns: Health state, with times as seconds ago
+        :rtype: dict
+        '''
+        now = time.monotonic()
+        return {
+            'url': self.url['url'],
+            'connected': self.connected,
+            'last_message_age': now - self.last_message_time if self.last_message_time else None,
+            'latency': self.latency,
+            'message_count': self.message_count,
+            'reconnect_count': self.reconnect_count,
         }
-    )
-    ws_servers.remove(server)
-    return ws_servers
 
-async def mind_tasks(ws_servers, queue_receive, settings):
+class SupervisedConnection:
     '''
-    Check task loop & restart websocket clients if needed.
+    A websocket subscription that restarts itself when it closes.
 
-    :param list ws_servers: Connections to websocket servers
-    :param dict subscription_command: Message to send to websocket server
+    :param dict url: URL and SSL certificate verification settings
     :param asyncio.queues.Queue queue_receive: Queue for incoming websocket messages
-    :param settings: File with necessary variables defined
-    '''
-    while True:
-        try:
-            await asyncio.sleep(settings.WS_RETRY)
-            for server in ws_servers:
-                if server['task'].done() and server['retry_count'] <= settings.MAX_CONNECT_ATTEMPTS:
-                    ws_servers = await resubscribe_client(
-                        ws_servers,
-                        settings.WS_SUBSCRIPTION_COMMAND,
-                        server,
-                        queue_receive
-                    )
-        except KeyboardInterrupt:
-            break
+    :param settings: Configuration file
+    :param bool raw: Queue frames as RawMessages, rather than decoding them
+    '''
+    def __init__(self, url, queue_receive, settings, raw=False):
+        self.url = url
+        self.queue_receive = queue_receive
+        self.settings = settings
+        self.raw = raw
+        self.health = ConnectionHealth(url)
+        self.task = None
+        self.stopped = False
+        self.register_metrics()
+
+    def register_metrics(self):
+        '''
+        Report the connection's health state as metrics.
+        '''
+        health = self.health
+        url = self.url['url']
+        REGISTRY.counter(
+            'xrpl_ws_messages_received_total', "Messages received from each websocket server.",
+            lambda: health.message_count, url=url
+        )
+        REGISTRY.counter(
+            'xrpl_ws_reconnects_total', "Reconnections to each websocket server.",
+            lambda: health.reconnect_count, url=url
+        )
+        REGISTRY.gauge(
+            'xrpl_ws_connected', "1 if subscribed to the websocket server, otherwise 0.",
+            lambda: health.connected, url=url
+        )
+        REGISTRY.gauge(
+            'xrpl_ws_last_message_age_seconds', "Seconds since the last message from each websocket server.",
+            lambda: health.as_dict()['last_message_age'], url=url
+        )
+        REGISTRY.gauge(
+            'xrpl_ws_connect_latency_seconds', "Time to connect and subscribe to each websocket server.",
+            lambda: health.latency, url=url
+        )
+
+    def start(self):
+        '''
+        Open the connection.
+        '''
+        if self.stopped:
+            return
+        self.task = asyncio.ensure_future(
+            websocket_subscribe(
+                self.url,
+                self.settings.WS_SUBSCRIPTION_COMMAND,
+                self.queue_receive,
+                self.raw,
+                self.health,
+            )
+        )
+        self.task.add_done_callback(self.restart)
+
+    def restart(self, task):
+        '''
+        Schedule a new connection after the current one closes.
+
+        :param asyncio.Task task: The connection's finished task
+        '''
+        if self.stopped:
+            return
+        self.health.disconnected()
+        if self.health.failures > self.settings.MAX_CONNECT_ATTEMPTS:
+            logging.error(f"Giving up on WS connection to: {self.url['url']} after: {self.health.failures - 1} failed attempts.")
+            return
+        self.health.reconnect_count += 1
+        delay = backoff_delay(
+            self.health.failures - 1, self.settings.WS_BACKOFF_MIN, self.settings.WS_BACKOFF_MAX
+        )
+        logging.warning(f"WS connection to {self.url['url']} closed. Reconnecting in: {delay:.2f} seconds. Reconnect count: {self.health.reconnect_count}")
+        asyncio.get_event_loop().call_later(delay, self.start)
+
+    def check_stale(self, timeout):
+        '''
+        Close the connection if it hasn't delivered a message within timeout seconds.
+        The connection then restarts.
+
+        :param float timeout: Seconds without a message before the stream is stale
+        '''
+        if (
+                self.health.connected
+                and self.task
+                and not self.task.done()
+                and not self.health.blocked
+                and time.monotonic() - self.health.last_message_time > timeout
+        ):
+            logging.warning(f"No messages from: {self.url['url']} in: {timeout} seconds. Reconnecting.")
+            self.task.cancel()
+
+    def stop(self):
+        '''
+        Close the connection without restarting it.
+        '''
+        self.stopped = True
+        if self.task:
+            self.task.cancel()
+
+class ConnectionSupervisor:
+    '''
+    Start and supervise connections to a list of websocket servers.
+
+    :param list urls: URLs and SSL certificate verification settings
+    :param asyncio.queues.Queue queue_receive: Queue for incoming websocket messages
+    :param settings: Configuration file
+    :param bool raw: Queue frames as RawMessages, rather than decoding them
+    '''
+    def __init__(self, urls, queue_receive, settings, raw=False):
+        self.settings = settings
+        self.connections = [SupervisedConnection(url, queue_receive, settings, raw) for url in urls]
+
+    async def watch_stale(self):
+        '''
+        Periodically restart connections that have stopped delivering messages.
+        '''
+        timeout = self.settings.WS_STALE_TIMEOUT
+        while True:
+            try:
+                await asyncio.sleep(max(timeout / 4, 1))
+                for connection in self.connections:
+                    connection.check_stale(timeout)
+            except KeyboardInterrupt:
+                break
+
+    def start(self):
+        '''
+        Open every connection.
+        '''
+        for connection in self.connections:
+            connection.start()
+        if self.settings.WS_STALE_TIMEOUT > 0:
+            asyncio.ensure_future(self.watch_stale())
+
+    def stop(self):
+        '''
+        Close every connection.
+        '''
+        for connection in self.connections:
+            connection.stop()
+
+    def health(self):
+        '''
+        :returns: Health state of each connection
+        :rtype: list
+        '''
+        return [connection.health.as_dict() for connection in self.connections]